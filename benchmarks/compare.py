@@ -0,0 +1,50 @@
+"""
+Compare two benchmark runs saved by pytest-benchmark, including the peak memory
+recorded by the benchmarks.
+
+Usage:
+    python -m benchmarks.compare .benchmarks/<machine>/0001_*.json \\
+        .benchmarks/<machine>/0002_*.json
+"""
+
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        b['fullname']: (b['stats']['mean'], b['extra_info'].get('peak_memory'))
+        for b in data['benchmarks']
+    }
+
+
+def ratio(old, new):
+    if not old or new is None:
+        return '-'
+    return '%.2fx' % (new / old)
+
+
+def compare(old_path, new_path, out=sys.stdout):
+    old, new = load(old_path), load(new_path)
+    out.write('%-60s %12s %12s %8s %12s %8s\n' % (
+        'benchmark', 'old mean', 'new mean', 'time', 'new peak', 'memory',
+    ))
+    for name in sorted(set(old) | set(new)):
+        old_mean, old_peak = old.get(name, (None, None))
+        new_mean, new_peak = new.get(name, (None, None))
+        out.write('%-60s %12s %12s %8s %12s %8s\n' % (
+            name[-60:],
+            '%.1fus' % (old_mean * 1e6) if old_mean else '-',
+            '%.1fus' % (new_mean * 1e6) if new_mean else '-',
+            ratio(old_mean, new_mean),
+            new_peak if new_peak is not None else '-',
+            ratio(old_peak, new_peak),
+        ))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    compare(sys.argv[1], sys.argv[2])
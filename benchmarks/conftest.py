@@ -0,0 +1,34 @@
+import tracemalloc
+
+import pytest
+
+from .generators import create_readings
+
+
+ROWS = 5000
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    # Populate the database once for all benchmarks, instead of in each test
+    with django_db_blocker.unblock():
+        create_readings(ROWS)
+
+
+@pytest.fixture()
+def measure(benchmark):
+    """
+    Benchmark the given function, and record the peak memory allocated during
+    a single (separate) call in the benchmark's extra info.
+    """
+    def run(func, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info['peak_memory'] = peak
+        return benchmark(func, *args, **kwargs)
+
+    return run
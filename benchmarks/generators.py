@@ -0,0 +1,118 @@
+"""
+Generators for synthetic query documents and data used by the benchmarks.
+
+All generators are deterministic for a given seed, so results are comparable
+between runs and commits.
+"""
+
+import random
+
+from datetime import date, datetime, timedelta, timezone
+
+from .models import Reading, Site
+
+
+# Lookups and value factories for the fields declared on ReadingQuery
+LEAVES = [
+    ('sensor', 'exact', lambda r: 'sensor-%d' % r.randint(0, 99)),
+    ('sensor', 'istartswith', lambda r: 'sensor-%d' % r.randint(0, 9)),
+    ('channel', 'gte', lambda r: r.randint(0, 15)),
+    ('value', 'lt', lambda r: r.uniform(0, 100)),
+    ('valid', 'exact', lambda r: r.choice([True, False])),
+    ('day', 'gte', lambda r: '2017-%02d-01' % r.randint(1, 12)),
+    ('day__year', 'exact', lambda r: r.randint(2015, 2018)),
+    ('measured', 'lt', lambda r: '2017-%02d-01T12:00:00Z' % r.randint(1, 12)),
+    ('measured__month', 'exact', lambda r: r.randint(1, 12)),
+    ('measured__hour', 'lte', lambda r: r.randint(0, 23)),
+    ('site__name', 'exact', lambda r: 'Site %d' % r.randint(0, 9)),
+    ('site__region', 'in', lambda r: ['north', 'south']),
+]
+
+
+def leaf(rand, index):
+    field, lookup, value = LEAVES[index % len(LEAVES)]
+    return {
+        'kind': 'lookup',
+        'field': field,
+        'lookup': lookup,
+        'value': value(rand),
+    }
+
+
+def wide_query(width, seed=0):
+    """
+    A single 'or' node with the given number of lookup conditions.
+    """
+    rand = random.Random(seed)
+    return {
+        'kind': 'or',
+        'conditions': [leaf(rand, i) for i in range(width)],
+    }
+
+
+def deep_query(depth, seed=0):
+    """
+    Alternating 'and' and 'or' nodes nested to the given depth, each with a
+    lookup condition and the next level as children.
+    """
+    rand = random.Random(seed)
+    query = leaf(rand, depth)
+    for i in range(depth):
+        query = {
+            'kind': 'and' if i % 2 else 'or',
+            'conditions': [leaf(rand, i), query],
+        }
+    return query
+
+
+def in_list_query(size, seed=0):
+    """
+    An 'and' node with 'in' lookups of the given size on an integer and a
+    string field.
+    """
+    rand = random.Random(seed)
+    return {
+        'kind': 'and',
+        'conditions': [
+            {
+                'kind': 'lookup',
+                'field': 'channel',
+                'lookup': 'in',
+                'value': [rand.randint(0, 10 * size) for i in range(size)],
+            },
+            {
+                'kind': 'lookup',
+                'field': 'sensor',
+                'lookup': 'in',
+                'value': ['sensor-%d' % rand.randint(0, 10 * size)
+                          for i in range(size)],
+            },
+        ],
+    }
+
+
+def create_readings(count, seed=0):
+    """
+    Create the given number of readings spread over ten sites.
+    """
+    rand = random.Random(seed)
+    sites = [
+        Site.objects.create(
+            name='Site %d' % i,
+            region=['north', 'south', 'east', 'west'][i % 4],
+        )
+        for i in range(10)
+    ]
+    start = datetime(2017, 1, 1, tzinfo=timezone.utc)
+    Reading.objects.bulk_create([
+        Reading(
+            site=rand.choice(sites),
+            sensor='sensor-%d' % rand.randint(0, 99),
+            channel=rand.randint(0, 15),
+            value=rand.uniform(0, 100),
+            valid=rand.random() > 0.1,
+            day=date(2017, 1, 1) + timedelta(days=rand.randint(0, 729)),
+            measured=start + timedelta(minutes=rand.randint(0, 1051200)),
+        )
+        for i in range(count)
+    ])
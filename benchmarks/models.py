@@ -0,0 +1,20 @@
+from django.db import models
+
+
+class Site(models.Model):
+    name = models.CharField(max_length=128)
+    region = models.CharField(max_length=32)
+
+
+class Reading(models.Model):
+    """
+    Synthetic model with a wide set of field types used by the benchmarks.
+    """
+    site = models.ForeignKey(Site, on_delete=models.CASCADE)
+    sensor = models.CharField(max_length=64, db_index=True)
+    channel = models.IntegerField()
+    value = models.FloatField()
+    valid = models.BooleanField(default=True)
+    day = models.DateField()
+    measured = models.DateTimeField(db_index=True)
+    note = models.TextField(blank=True)
@@ -0,0 +1,45 @@
+from django_json_queries import Query
+
+from .models import Reading, Site
+
+
+READING_FIELDS = [
+    'sensor',
+    'channel',
+    'value',
+    'valid',
+    'day',
+    'day__year',
+    'measured',
+    'measured__month',
+    'measured__hour',
+    'note',
+    'site__name',
+    'site__region',
+]
+
+
+class ReadingQuery(Query):
+    class Meta:
+        model = Reading
+        fields = READING_FIELDS
+
+
+class CachedReadingQuery(Query):
+    class Meta:
+        model = Reading
+        fields = READING_FIELDS
+        sql_cache_size = 128
+
+
+class SiteQuery(Query):
+    class Meta:
+        model = Site
+        fields = ['name', 'region']
+
+
+class ReplicatedSiteQuery(Query):
+    class Meta:
+        model = Site
+        fields = ['name', 'region']
+        replica_max_rows = 1000
@@ -0,0 +1,6 @@
+from tests.settings import *  # NOQA
+
+
+INSTALLED_APPS += (
+    'benchmarks',
+)
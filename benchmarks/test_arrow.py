@@ -0,0 +1,48 @@
+"""
+Benchmarks comparing exporting the matching objects as CSV written row by row
+with streaming Arrow IPC and writing Parquet. The size of each export and the
+peak memory are stored in the benchmark's extra info.
+"""
+
+import csv
+import io
+
+import pytest
+
+from .queries import READING_FIELDS, ReadingQuery
+
+
+DOCUMENT = {
+    'kind': 'lookup',
+    'field': 'channel',
+    'lookup': 'gte',
+    'value': 0,
+}
+
+
+def export_csv():
+    query = ReadingQuery(DOCUMENT)
+    sink = io.StringIO()
+    writer = csv.writer(sink)
+    writer.writerow(READING_FIELDS)
+    rows = query.get_queryset().values_list(*READING_FIELDS)
+    writer.writerows(rows.iterator(chunk_size=2000))
+    return sink.getvalue().encode('utf-8')
+
+
+def export_arrow():
+    return b''.join(ReadingQuery(DOCUMENT).stream_arrow(chunk_size=2000))
+
+
+def export_parquet():
+    sink = io.BytesIO()
+    ReadingQuery(DOCUMENT).write_parquet(sink, chunk_size=2000)
+    return sink.getvalue()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('method', [export_csv, export_arrow, export_parquet],
+                         ids=['csv', 'arrow', 'parquet'])
+def test_export(benchmark, measure, method):
+    benchmark.extra_info['size'] = len(method())
+    measure(method)
@@ -0,0 +1,53 @@
+"""
+Benchmarks comparing the throughput of many concurrent requests using the
+async query API with running the same requests sequentially.
+"""
+
+import asyncio
+
+import pytest
+
+from asgiref.sync import async_to_sync
+
+from .generators import wide_query, in_list_query
+from .queries import ReadingQuery
+
+
+REQUESTS = 50
+
+DOCUMENTS = [
+    wide_query(5, seed=i) if i % 2 else in_list_query(20, seed=i)
+    for i in range(REQUESTS)
+]
+
+
+@pytest.mark.django_db
+def test_sequential(benchmark):
+    def run():
+        return [ReadingQuery(d).get_queryset().count() for d in DOCUMENTS]
+
+    benchmark.extra_info['requests'] = REQUESTS
+    benchmark(run)
+
+
+@pytest.mark.django_db
+def test_concurrent_acount(benchmark):
+    async def run():
+        return await asyncio.gather(*[
+            ReadingQuery(d).acount() for d in DOCUMENTS
+        ])
+
+    benchmark.extra_info['requests'] = REQUESTS
+    benchmark(async_to_sync(run))
+
+
+@pytest.mark.django_db
+def test_concurrent_astream(benchmark):
+    async def fetch(document):
+        return [r.pk async for r in ReadingQuery(document).astream()]
+
+    async def run():
+        return await asyncio.gather(*[fetch(d) for d in DOCUMENTS])
+
+    benchmark.extra_info['requests'] = REQUESTS
+    benchmark(async_to_sync(run))
@@ -0,0 +1,46 @@
+"""
+Benchmarks comparing fetching columns of the matching objects as NumPy arrays
+directly from the cursor with converting the rows of values_list to arrays.
+The peak memory of each approach is stored in the benchmark's extra info.
+"""
+
+import numpy
+import pytest
+
+from .queries import ReadingQuery
+
+
+DOCUMENT = {
+    'kind': 'lookup',
+    'field': 'channel',
+    'lookup': 'gte',
+    'value': 0,
+}
+
+COLUMNS = ['channel', 'value', 'valid', 'day', 'measured']
+
+DTYPES = ['int64', 'float64', 'bool', 'datetime64[D]', 'datetime64[us]']
+
+
+def values_list():
+    query = ReadingQuery(DOCUMENT)
+    rows = list(query.get_queryset().values_list(*COLUMNS))
+    return {
+        name: numpy.array(
+            [r[i].replace(tzinfo=None) if dtype == 'datetime64[us]' else r[i]
+             for r in rows],
+            dtype=dtype,
+        )
+        for i, (name, dtype) in enumerate(zip(COLUMNS, DTYPES))
+    }
+
+
+def fetch_columns():
+    return ReadingQuery(DOCUMENT).fetch_columns(COLUMNS)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('method', [values_list, fetch_columns],
+                         ids=['values_list', 'fetch_columns'])
+def test_fetch_columns(measure, method):
+    measure(method)
@@ -0,0 +1,41 @@
+"""
+Benchmarks of the memory retained by resolved condition trees. The memory per
+node is stored in the benchmark's extra info.
+"""
+
+import tracemalloc
+
+import pytest
+
+from .generators import wide_query, deep_query, in_list_query
+from .queries import ReadingQuery
+
+
+SHAPES = {
+    'wide-100': wide_query(100),
+    'wide-1000': wide_query(1000),
+    'deep-25': deep_query(25),
+    'in-1000': in_list_query(1000),
+}
+
+
+def retained_memory(document, count=10):
+    """
+    Get the memory retained by resolving the document, per query.
+    """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        queries = [ReadingQuery(document) for i in range(count)]
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (after - before) / count, queries[0].node_count
+
+
+@pytest.mark.parametrize('shape', sorted(SHAPES))
+def test_resolved_tree_memory(benchmark, shape):
+    memory, nodes = retained_memory(SHAPES[shape])
+    benchmark.extra_info['memory_per_query'] = memory
+    benchmark.extra_info['memory_per_node'] = memory / nodes
+    benchmark(ReadingQuery, SHAPES[shape])
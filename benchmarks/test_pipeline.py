@@ -0,0 +1,80 @@
+"""
+Benchmarks for each stage of the query pipeline: value parsing, field
+validation, field lookup, condition resolution, validation, SQL compilation
+and execution against SQLite.
+"""
+
+import pytest
+
+from django.db import DEFAULT_DB_ALIAS
+
+from django_json_queries import utils
+
+from .generators import wide_query, deep_query, in_list_query
+from .queries import ReadingQuery
+
+
+SHAPES = {
+    'wide-10': wide_query(10),
+    'wide-100': wide_query(100),
+    'deep-10': deep_query(10),
+    'deep-25': deep_query(25),
+    'in-100': in_list_query(100),
+    'in-1000': in_list_query(1000),
+}
+
+DATETIMES = [
+    '2017-01-%02dT%02d:30:15.123+02:00' % (i % 28 + 1, i % 24)
+    for i in range(100)
+]
+
+
+def test_parse_datetime(measure):
+    def parse():
+        for value in DATETIMES:
+            utils.parse_datetime(value)
+
+    measure(parse)
+
+
+def test_field_validate(measure):
+    field = ReadingQuery.measured
+    measure(field.validate, DATETIMES, 'in')
+
+
+@pytest.mark.parametrize('field_name', [
+    'sensor', 'measured__hour', 'site__region',
+])
+def test_get_field(measure, field_name):
+    measure(ReadingQuery.get_field, field_name)
+
+
+@pytest.mark.parametrize('shape', sorted(SHAPES))
+def test_resolve(measure, shape):
+    measure(ReadingQuery, SHAPES[shape])
+
+
+@pytest.mark.parametrize('shape', sorted(SHAPES))
+def test_validate(measure, shape):
+    query = ReadingQuery(SHAPES[shape])
+    assert query.is_valid
+
+    measure(lambda: query.is_valid)
+
+
+@pytest.mark.parametrize('shape', sorted(SHAPES))
+def test_compile(measure, shape):
+    query = ReadingQuery(SHAPES[shape])
+
+    def compile():
+        queryset = query.get_queryset()
+        return queryset.query.get_compiler(DEFAULT_DB_ALIAS).as_sql()
+
+    measure(compile)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('shape', sorted(SHAPES))
+def test_execute(measure, shape):
+    query = ReadingQuery(SHAPES[shape])
+    measure(lambda: list(query.get_queryset()))
@@ -0,0 +1,35 @@
+"""
+Benchmarks comparing queries of a small reference table answered by the
+database with queries answered from an in-memory replica of the table.
+"""
+
+import itertools
+
+import pytest
+
+from .queries import ReplicatedSiteQuery, SiteQuery
+
+
+DOCUMENTS = [
+    {'kind': 'lookup', 'field': 'name', 'lookup': 'exact', 'value': 'Site 3'},
+    {'kind': 'lookup', 'field': 'region', 'lookup': 'in',
+     'value': ['north', 'east']},
+    {'kind': 'or', 'conditions': [
+        {'kind': 'lookup', 'field': 'name', 'lookup': 'startswith',
+         'value': 'Site 1'},
+        {'kind': 'lookup', 'field': 'region', 'lookup': 'exact',
+         'value': 'west'},
+    ]},
+]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query_class', [SiteQuery, ReplicatedSiteQuery],
+                         ids=['database', 'replica'])
+def test_reference_table(benchmark, query_class):
+    documents = itertools.cycle(DOCUMENTS)
+
+    def run():
+        return list(query_class(next(documents)).get_results())
+
+    benchmark(run)
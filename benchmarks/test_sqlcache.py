@@ -0,0 +1,40 @@
+"""
+Benchmarks comparing small, frequently repeated queries compiled normally with
+queries bound to a cached SQL template of the same shape. Each round uses new
+values, so the cached template is bound rather than reused as is.
+"""
+
+import itertools
+
+import pytest
+
+from .generators import wide_query, deep_query, in_list_query
+from .queries import CachedReadingQuery, ReadingQuery
+
+
+SHAPES = {
+    'wide-10': wide_query,
+    'deep-10': deep_query,
+    'in-10': in_list_query,
+}
+
+SIZES = {'wide-10': 10, 'deep-10': 10, 'in-10': 10}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query_class', [ReadingQuery, CachedReadingQuery])
+@pytest.mark.parametrize('shape', sorted(SHAPES))
+def test_repeated_shape(benchmark, query_class, shape):
+    # Seeds only change the values, not the shape of the generated queries
+    documents = [SHAPES[shape](SIZES[shape], seed=i) for i in range(100)]
+    seeds = itertools.cycle(documents)
+
+    def run():
+        query = query_class(next(seeds))
+        return list(query.get_results())
+
+    benchmark(run)
+    cache = query_class._meta.sql_cache
+    if cache is not None:
+        benchmark.extra_info['hits'] = cache.hits
+        benchmark.extra_info['misses'] = cache.misses
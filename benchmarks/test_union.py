@@ -0,0 +1,39 @@
+"""
+Benchmarks comparing 'or' conditions compiled as a single WHERE clause with the
+UNION ALL rewrite, for branches on differently indexed columns. The query plan
+of each strategy is stored in the benchmark's extra info.
+"""
+
+import pytest
+
+from .queries import ReadingQuery
+
+
+DOCUMENT = {
+    'kind': 'or',
+    'conditions': [
+        {
+            'kind': 'lookup',
+            'field': 'sensor',
+            'lookup': 'exact',
+            'value': 'sensor-42',
+        },
+        {
+            'kind': 'lookup',
+            'field': 'measured',
+            'lookup': 'gt',
+            'value': '2018-12-30T00:00:00Z',
+        },
+    ],
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('or_strategy', ['or', 'union', 'auto'])
+def test_or_strategy(benchmark, or_strategy):
+    query = ReadingQuery(DOCUMENT, or_strategy=or_strategy)
+    queryset = query.get_queryset()
+
+    benchmark.extra_info['union'] = query.condition.use_union()
+    benchmark.extra_info['plan'] = queryset.explain()
+    benchmark(lambda: list(query.get_queryset().values_list('pk', flat=True)))
@@ -0,0 +1,189 @@
+import re
+
+from django.db import models
+from django.db.models import F, Count, Sum, Avg, Min, Max, Value
+from django.db.models.constants import LOOKUP_SEP
+
+from . import fields
+
+
+__all__ = [
+    'Aggregation',
+]
+
+
+# Aggregate functions, and the value types of the fields they may be applied to
+FUNCTIONS = {
+    'count': (Count, None),
+    'sum': (Sum, ('int', 'float')),
+    'avg': (Avg, ('int', 'float')),
+    'min': (Min, ('int', 'float', 'date', 'datetime')),
+    'max': (Max, ('int', 'float', 'date', 'datetime')),
+}
+
+NAME_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9]*(_[a-zA-Z0-9]+)*$')
+
+
+def get_expression(field):
+    """
+    Get an expression for the value of a query field, applying its transforms
+    to the underlying model field.
+    """
+    if not field.transforms:
+        return F(field.model_name)
+
+    path = field.model_name.rsplit(LOOKUP_SEP, len(field.transforms))[0]
+    expression = F(path)
+    output_field = field.model_field
+    for name in field.transforms:
+        transform = output_field.get_transform(name)
+        expression = transform(expression)
+        # Transforms with a fixed output field may be followed by transforms
+        # of that field
+        if isinstance(getattr(transform, 'output_field', None), models.Field):
+            output_field = transform.output_field
+    return expression
+
+
+class Aggregation:
+    """
+    Aggregation of the objects matching a query, optionally grouped by one or
+    more fields. The aggregation is specified in the 'aggregate' block of a
+    query document:
+
+        {
+            "kind": "lookup", ...,
+            "aggregate": {
+                "group_by": ["manufacturer__name", "released__year"],
+                "values": {
+                    "products": {"function": "count"},
+                    "average_price": {"function": "avg", "field": "price"}
+                }
+            }
+        }
+
+    Only fields declared on the query can be grouped by or aggregated.
+    """
+
+    def __init__(self, query, group_by=None, values=None):
+        group_by = [] if group_by is None else group_by
+        assert isinstance(group_by, list), \
+            'group_by must be a list of field names'
+        assert isinstance(values, dict) and len(values) > 0, \
+            'values must be a dict with at least one aggregate'
+
+        self.query = query
+        self.group_by = group_by
+        self.values = values
+
+    def is_valid(self):
+        """
+        Validate that the provided data is valid.
+        """
+        try:
+            self.validate()
+        except (ValueError, TypeError, AttributeError):
+            return False
+        return True
+
+    def validate(self):
+        """
+        Validate the aggregation against the fields declared on the query.
+        """
+        for name in self.group_by:
+            self._get_field(name)
+        if len(set(self.group_by)) != len(self.group_by):
+            raise ValueError('Duplicate group_by field')
+
+        # Aggregate names must not conflict with the names of model fields
+        model = self.query._meta.model
+        reserved = set(self.group_by)
+        for field in model._meta.get_fields():
+            reserved.add(field.name)
+            reserved.add(getattr(field, 'attname', field.name))
+
+        for alias, spec in self.values.items():
+            if not NAME_RE.match(alias) or alias in reserved:
+                raise ValueError('Invalid aggregate name: %s' % alias)
+            if not isinstance(spec, dict):
+                raise ValueError('Invalid aggregate: %s' % alias)
+
+            function = spec.get('function')
+            if function not in FUNCTIONS:
+                raise ValueError('Unsupported aggregate function: %s' % function)
+            value_types = FUNCTIONS[function][1]
+
+            field_name = spec.get('field')
+            if field_name is None:
+                if value_types is not None:
+                    raise ValueError('Aggregate %s requires a field' % alias)
+                continue
+            field = self._get_field(field_name)
+            if value_types is not None and field.value_type not in value_types:
+                raise ValueError('Cannot compute %s of %s' % (
+                    function, field_name
+                ))
+
+    def get_queryset(self, queryset):
+        """
+        Get the queryset of the rows aggregate() computes, e.g. to explain it.
+
+        :param queryset: The (filtered) queryset to aggregate
+        """
+        aggregates = self._get_aggregates()
+        if not self.group_by:
+            # Grouped by a constant, which is left out of the GROUP BY clause
+            # like for QuerySet.aggregate()
+            queryset = queryset.annotate(_all=Value(1)).values('_all')
+            return queryset.annotate(**aggregates).values(*aggregates)
+
+        group_by = self._get_group_by()
+        queryset = queryset.annotate(**group_by).values(*group_by)
+        queryset = queryset.annotate(**aggregates)
+        return queryset.order_by(*group_by)
+
+    def aggregate(self, queryset):
+        """
+        Group and aggregate the given queryset in a single query.
+
+        :param queryset: The (filtered) queryset to aggregate
+        :returns: A list with one dict per group, with the group fields keyed
+                  by their names on the query
+        """
+        if not self.group_by:
+            return [queryset.aggregate(**self._get_aggregates())]
+
+        rows = []
+        for row in self.get_queryset(queryset):
+            for i, name in enumerate(self.group_by):
+                row[name] = row.pop('_group_%d' % i)
+            rows.append(row)
+        return rows
+
+    #
+    # "Private" methods
+    #
+
+    def _get_group_by(self):
+        return {
+            '_group_%d' % i: get_expression(self._get_field(name))
+            for i, name in enumerate(self.group_by)
+        }
+
+    def _get_field(self, name):
+        field = getattr(self.query, name, None)
+        if not isinstance(field, fields.Field):
+            raise ValueError('Unknown field: %s' % name)
+        return field
+
+    def _get_aggregates(self):
+        aggregates = {}
+        for alias, spec in self.values.items():
+            function = FUNCTIONS[spec['function']][0]
+            field_name = spec.get('field')
+            if field_name is None:
+                aggregates[alias] = function('pk')
+            else:
+                field = self._get_field(field_name)
+                aggregates[alias] = function(get_expression(field))
+        return aggregates
@@ -0,0 +1,231 @@
+"""
+This file contains the export of query results as Apache Arrow record batches,
+streamed in the Arrow IPC format or written to Parquet files.
+
+The rows are read from a chunked cursor, and each chunk is converted to a
+record batch, so the memory used is bounded by the chunk size regardless of
+the number of results. The schema is derived from the value types of the
+query's declared fields:
+
+    int (and date parts)    int64
+    float                   float64
+    boolean                 bool
+    date                    date32
+    time                    time64[us]
+    datetime                timestamp[us, tz=UTC] (without time zone if
+                            USE_TZ is disabled)
+    string                  string
+    json                    string, with the values encoded as JSON
+"""
+
+import io
+import json
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.db.models.sql.constants import MULTI
+
+from . import fields
+from .aggregates import get_expression
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+__all__ = [
+    'get_schema', 'iter_batches', 'stream_ipc', 'write_ipc', 'write_parquet',
+]
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise RuntimeError('pyarrow is required for Arrow and Parquet export')
+
+
+def _get_type(field):
+    value_type = field.value_type
+    if value_type in fields.INTEGER_TYPES:
+        return pyarrow.int64()
+    if value_type == 'float':
+        return pyarrow.float64()
+    if value_type == 'boolean':
+        return pyarrow.bool_()
+    if value_type == 'date':
+        return pyarrow.date32()
+    if value_type == 'time':
+        return pyarrow.time64('us')
+    if value_type == 'datetime':
+        return pyarrow.timestamp('us', tz='UTC' if settings.USE_TZ else None)
+    return pyarrow.string()
+
+
+def _encode_json(column):
+    return [None if v is None else json.dumps(v) for v in column]
+
+
+def _get_fields(query, names):
+    """
+    Get the name, expression, Arrow type and value encoder (if any) of each
+    exported field.
+    """
+    if names is None:
+        names = getattr(query._meta, 'fields', [])
+    result = []
+    for name in names:
+        if name == 'pk':
+            result.append((name, F('pk'), pyarrow.int64(), None))
+            continue
+        field = getattr(query, name, None)
+        if not isinstance(field, fields.Field):
+            raise ValueError('Unknown field: %s' % name)
+        encode = _encode_json if field.value_type == 'json' else None
+        result.append((name, get_expression(field), _get_type(field), encode))
+    return result
+
+
+def get_schema(query, names=None):
+    """
+    Get the Arrow schema of exported query results.
+
+    :param query: The query to export
+    :param names: The names of the fields (declared on the query) to export,
+                  or 'pk' for the primary key. Defaults to all declared fields.
+    """
+    _require_pyarrow()
+    return pyarrow.schema([
+        pyarrow.field(name, type_) for name, _, type_, _ in
+        _get_fields(query, names)
+    ])
+
+
+def iter_batches(query, names=None, chunk_size=10000, using=None):
+    """
+    Iterate over the objects matching a query as Arrow record batches.
+
+    :param query: The query to export
+    :param names: The names of the fields to export, defaulting to all declared
+                  fields
+    :param chunk_size: The maximum number of rows per record batch
+    :param using: The database alias to query
+    """
+    _require_pyarrow()
+    queryset = query.get_queryset()
+    if using is not None:
+        queryset = queryset.using(using)
+    using = queryset.db
+
+    export_fields = _get_fields(query, names)
+    schema = pyarrow.schema([
+        pyarrow.field(name, type_) for name, _, type_, _ in export_fields
+    ])
+    encoders = [encode for _, _, _, encode in export_fields]
+    aliases = {
+        '_export_%d' % i: expression
+        for i, (_, expression, _, _) in enumerate(export_fields)
+    }
+    queryset = queryset.annotate(**aliases).values(*aliases)
+
+    compiler = queryset.query.get_compiler(using=using)
+    chunks = compiler.execute_sql(
+        MULTI, chunked_fetch=connections[using].features.can_use_chunked_reads,
+        chunk_size=chunk_size,
+    )
+    # The compiler's select is only set up once the query has been compiled
+    converters = None
+    for rows in chunks:
+        if converters is None:
+            converters = compiler.get_converters([
+                s[0] for s in compiler.select[:len(aliases)]
+            ])
+        if converters:
+            rows = compiler.apply_converters(rows, converters)
+        columns = list(zip(*rows))
+        yield pyarrow.RecordBatch.from_arrays([
+            pyarrow.array(encode(column) if encode else column, type=f.type)
+            for column, f, encode in zip(columns, schema, encoders)
+        ], schema=schema)
+
+
+def write_ipc(query, sink, names=None, chunk_size=10000, using=None):
+    """
+    Write the objects matching a query to a sink in the Arrow IPC streaming
+    format.
+
+    :param query: The query to export
+    :param sink: A path or writable file-like object
+    :param names: The names of the fields to export, defaulting to all declared
+                  fields
+    :param chunk_size: The maximum number of rows per record batch
+    :param using: The database alias to query
+    :returns: The number of rows written
+    """
+    rows = 0
+    schema = get_schema(query, names)
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        for batch in iter_batches(query, names, chunk_size, using):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def stream_ipc(query, names=None, chunk_size=10000, using=None):
+    """
+    Iterate over the objects matching a query encoded in the Arrow IPC
+    streaming format, e.g. for the content of a StreamingHttpResponse. Each
+    item is the encoding of a single record batch, preceded by the schema for
+    the first item and followed by the end of stream marker for the last.
+
+    :param query: The query to export
+    :param names: The names of the fields to export, defaulting to all declared
+                  fields
+    :param chunk_size: The maximum number of rows per record batch
+    :param using: The database alias to query
+    """
+    buffer = io.BytesIO()
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer = pyarrow.ipc.new_stream(buffer, get_schema(query, names))
+    batches = iter_batches(query, names, chunk_size, using)
+    # Responses may not be consumed entirely, e.g. when the client
+    # disconnects, in which case the cursor must still be closed
+    try:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield flush()
+    finally:
+        batches.close()
+        writer.close()
+    yield flush()
+
+
+def write_parquet(query, sink, names=None, chunk_size=10000, using=None,
+                  **kwargs):
+    """
+    Write the objects matching a query to a Parquet file, with one row group
+    per record batch.
+
+    :param query: The query to export
+    :param sink: A path or writable file-like object
+    :param names: The names of the fields to export, defaulting to all declared
+                  fields
+    :param chunk_size: The maximum number of rows per record batch
+    :param using: The database alias to query
+    :param kwargs: Options for pyarrow.parquet.ParquetWriter, e.g. compression
+    :returns: The number of rows written
+    """
+    rows = 0
+    schema = get_schema(query, names)
+    with pyarrow.parquet.ParquetWriter(sink, schema, **kwargs) as writer:
+        for batch in iter_batches(query, names, chunk_size, using):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
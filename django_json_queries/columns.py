@@ -0,0 +1,139 @@
+"""
+This file contains the fetching of query results as columns of NumPy arrays.
+
+The projected query is run through a chunked cursor, and each chunk of rows is
+converted to typed arrays column by column, without creating model instances
+or dicts. The values are first converted by the converters of the database
+backend, like the ORM does. The dtype of each column is chosen from the value
+type of its query field:
+
+    int (and date parts)    int64, or float64 with NaN if there are nulls
+    float                   float64, with NaN for nulls
+    boolean                 bool, or object with None if there are nulls
+    date                    datetime64[D], with NaT for nulls
+    datetime                datetime64[us] in UTC, with NaT for nulls
+    string, time            object
+"""
+
+import datetime
+
+from django.db import connections
+from django.db.models import F
+from django.db.models.sql.constants import MULTI
+
+from . import fields
+from .aggregates import get_expression
+from .vectorized import numpy, _require_numpy
+
+
+__all__ = [
+    'fetch_columns',
+]
+
+
+def _to_integers(values):
+    try:
+        return numpy.array(values, dtype='int64')
+    except TypeError:
+        # Nulls can not be represented in integer arrays
+        return numpy.array(values, dtype='float64')
+
+
+def _to_booleans(values):
+    if None not in values:
+        return numpy.array(values, dtype=bool)
+    return numpy.array(
+        [None if v is None else bool(v) for v in values], dtype=object,
+    )
+
+
+def _to_datetimes(values):
+    # Aware datetimes are converted to naive UTC, like vectorized evaluation
+    # expects
+    converted = [
+        v.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        if isinstance(v, datetime.datetime) and v.tzinfo is not None else v
+        for v in values
+    ]
+    return numpy.array(converted, dtype='datetime64[us]')
+
+
+def _to_objects(values):
+    array = numpy.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _get_converter(field):
+    value_type = field.value_type
+    if value_type in fields.INTEGER_TYPES:
+        return _to_integers, 'int64'
+    if value_type == 'float':
+        return (lambda v: numpy.array(v, dtype='float64')), 'float64'
+    if value_type == 'boolean':
+        return _to_booleans, 'bool'
+    if value_type == 'date':
+        return (lambda v: numpy.array(v, dtype='datetime64[D]')), \
+            'datetime64[D]'
+    if value_type == 'datetime':
+        return _to_datetimes, 'datetime64[us]'
+    return _to_objects, 'object'
+
+
+def fetch_columns(query, names, chunk_size=2000, using=None):
+    """
+    Fetch the given fields of the objects matching a query as NumPy arrays.
+
+    :param query: The query to fetch objects for
+    :param names: The names of the fields (declared on the query) to fetch, or
+                  'pk' for the primary key
+    :param chunk_size: The number of rows to convert at a time
+    :param using: The database alias to query
+    :returns: A dict mapping each field name to an array
+    """
+    _require_numpy()
+    queryset = query.get_queryset()
+    if using is not None:
+        queryset = queryset.using(using)
+    using = queryset.db
+
+    expressions = {}
+    converters = []
+    for i, name in enumerate(names):
+        if name == 'pk':
+            expressions['_column_%d' % i] = F('pk')
+            converters.append((_to_integers, 'int64'))
+            continue
+        field = getattr(query, name, None)
+        if not isinstance(field, fields.Field):
+            raise ValueError('Unknown field: %s' % name)
+        expressions['_column_%d' % i] = get_expression(field)
+        converters.append(_get_converter(field))
+
+    queryset = queryset.annotate(**expressions).values(*expressions)
+
+    chunks = [[] for name in names]
+    compiler = queryset.query.get_compiler(using=using)
+    results = compiler.execute_sql(
+        MULTI, chunked_fetch=connections[using].features.can_use_chunked_reads,
+        chunk_size=chunk_size,
+    )
+    # The compiler's select is only set up once the query has been compiled
+    backend_converters = None
+    for rows in results:
+        if backend_converters is None:
+            backend_converters = compiler.get_converters([
+                s[0] for s in compiler.select[:len(expressions)]
+            ])
+        if backend_converters:
+            rows = compiler.apply_converters(rows, backend_converters)
+        for i, values in enumerate(zip(*rows)):
+            chunks[i].append(converters[i][0](values))
+
+    columns = {}
+    for name, column, (_, dtype) in zip(names, chunks, converters):
+        if column:
+            columns[name] = numpy.concatenate(column)
+        else:
+            columns[name] = numpy.empty(0, dtype=dtype)
+    return columns
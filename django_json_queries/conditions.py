@@ -1,16 +1,42 @@
+import sys
+
 from functools import reduce
 
 from django.db.models import Q
 
+from . import predicates
+from . import sqlcache
+from . import subqueries
+from . import vectorized
+
 
 __all__ = [
     'Condition',
     'AndCondition', 'OrCondition',
     'LookupCondition',
+    'SubqueryCondition',
 ]
 
 
+def _to_json(value):
+    """
+    Convert a query value to JSON types. Typed arrays, such as those decoded
+    from CBOR or MessagePack documents, are converted to lists.
+    """
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_json(v) for k, v in value.items()}
+    return value
+
+
 class Condition:
+    # Conditions are created for every node of every query, so they don't
+    # have an instance dict. Subclasses without __slots__ still get one.
+    __slots__ = ('query', )
+
     def __init__(self, query, *args, **kwargs):
         self.query = query
 
@@ -38,8 +64,53 @@ class Condition:
         """
         return self.annotate(queryset).filter(self.get_filter())
 
+    def get_predicate(self):
+        """
+        Get a function that checks whether an object in memory matches this
+        condition, without querying the database.
+
+        :returns: A function taking an object and returning a boolean
+        """
+        raise NotImplementedError(
+            'Condition %s does not support evaluation in Python' % self.kind
+        )
+
+    def get_mask(self):
+        """
+        Get a function that computes which rows of a set of columns match this
+        condition, using vectorized operations over the whole columns.
+
+        :returns: A function taking a vectorized.Columns object and returning
+                  a boolean NumPy array
+        """
+        raise NotImplementedError(
+            'Condition %s does not support vectorized evaluation' % self.kind
+        )
+
+    def get_shape(self):
+        """
+        Get the shape of this condition: a hashable description of the
+        condition without its values, such that conditions of the same shape
+        compile to the same SQL. Conditions that can not be described by their
+        shape return None.
+        """
+        return None
+
+    def to_dict(self):
+        """
+        Get the normalized query document of this condition.
+        """
+        return {'kind': self.kind}
+
+    def walk(self):
+        """
+        Iterate over this condition and all its sub-conditions, depth first.
+        """
+        yield self
+
 
 class AndCondition(Condition):
+    __slots__ = ('conditions', )
     kind = 'and'
 
     def __init__(self, *args, conditions=None, **kwargs):
@@ -74,8 +145,45 @@ class AndCondition(Condition):
         # Return filtered queryset
         return reduce(reduce_and, [c.get_filter() for c in self.conditions])
 
+    def get_predicate(self):
+        predicates = [c.get_predicate() for c in self.conditions]
+
+        def predicate(obj):
+            return all(p(obj) for p in predicates)
+
+        return predicate
+
+    def get_mask(self):
+        return vectorized.compile_all([c.get_mask() for c in self.conditions])
+
+    def get_shape(self):
+        shapes = tuple(c.get_shape() for c in self.conditions)
+        if None in shapes:
+            return None
+        return (self.kind, ) + shapes
+
+    def to_dict(self):
+        # Nested conditions of the same kind are merged, and conditions with
+        # a single sub-condition are replaced by it
+        conditions = []
+        for c in self.conditions:
+            d = c.to_dict()
+            if d['kind'] == self.kind:
+                conditions.extend(d['conditions'])
+            else:
+                conditions.append(d)
+        if len(conditions) == 1:
+            return conditions[0]
+        return {'kind': self.kind, 'conditions': conditions}
+
+    def walk(self):
+        yield self
+        for c in self.conditions:
+            yield from c.walk()
+
 
 class OrCondition(Condition):
+    __slots__ = ('conditions', )
     kind = 'or'
 
     def __init__(self, *args, conditions=None, **kwargs):
@@ -107,11 +215,91 @@ class OrCondition(Condition):
         def reduce_or(a, b):
             return Q(a | b)
 
+        if self.use_union():
+            return self.get_union_filter()
+
         # Return filtered queryset
         return reduce(reduce_or, [c.get_filter() for c in self.conditions])
 
+    def use_union(self):
+        """
+        Check if this condition should be compiled as a union of subqueries,
+        based on the query's or_strategy.
+        """
+        strategy = self.query.or_strategy
+        if strategy != 'auto' or len(self.conditions) < 2:
+            return strategy == 'union' and len(self.conditions) > 1
+
+        # Only use a union when the branches filter on different columns, and
+        # every branch can use an index
+        columns = []
+        for branch in self.conditions:
+            fields = [
+                c.field for c in branch.walk()
+                if isinstance(c, LookupCondition)
+            ]
+            if not any(f.is_indexed for f in fields):
+                return False
+            columns.append(frozenset(id(f.model_field) for f in fields))
+        return len(set(columns)) > 1
+
+    def get_union_filter(self):
+        """
+        Get a filter selecting the primary keys returned by a UNION ALL of one
+        subquery per branch. Each subquery can be planned independently, so the
+        database may use a different index for each branch instead of scanning
+        the whole table. Duplicates are removed by the IN clause.
+        """
+        # Each branch is scoped, so that it can also be pruned to the
+        # partitions in scope. The ordering of the base queryset is cleared,
+        # as compound statements do not allow ordered subqueries.
+        queryset = self.query.get_base_queryset().order_by()
+        branches = [c.filter(queryset).values('pk') for c in self.conditions]
+        union = branches[0].union(*branches[1:], all=True)
+        return Q(pk__in=union)
+
+    def get_predicate(self):
+        predicates = [c.get_predicate() for c in self.conditions]
+
+        def predicate(obj):
+            return any(p(obj) for p in predicates)
+
+        return predicate
+
+    def get_mask(self):
+        return vectorized.compile_any([c.get_mask() for c in self.conditions])
+
+    def get_shape(self):
+        # Unions compile their branches into subqueries, which are not cached
+        if self.use_union():
+            return None
+        shapes = tuple(c.get_shape() for c in self.conditions)
+        if None in shapes:
+            return None
+        return (self.kind, ) + shapes
+
+    def to_dict(self):
+        # Nested conditions of the same kind are merged, and conditions with
+        # a single sub-condition are replaced by it
+        conditions = []
+        for c in self.conditions:
+            d = c.to_dict()
+            if d['kind'] == self.kind:
+                conditions.extend(d['conditions'])
+            else:
+                conditions.append(d)
+        if len(conditions) == 1:
+            return conditions[0]
+        return {'kind': self.kind, 'conditions': conditions}
+
+    def walk(self):
+        yield self
+        for c in self.conditions:
+            yield from c.walk()
+
 
 class LookupCondition(Condition):
+    __slots__ = ('field', 'lookup', 'value')
     kind = 'lookup'
 
     def __init__(self, *args, field=None, lookup=None, value=None, **kwargs):
@@ -123,7 +311,9 @@ class LookupCondition(Condition):
             'lookup must be specified'
 
         self.field = getattr(self.query, field)
-        self.lookup = lookup
+        # Lookups may be rewritten to cheaper ones by the query's policy
+        lookup = self.field.rewrites.get(lookup, lookup)
+        self.lookup = sys.intern(lookup)
         self.value = value
 
     def is_valid(self):
@@ -137,5 +327,98 @@ class LookupCondition(Condition):
         return True
 
     def get_filter(self):
-        field = '%s__%s' % (self.field.model_name, self.lookup)
-        return Q(**{field: self.field.prepare(self.value, self.lookup)})
+        return self.field.get_filter(self.value, self.lookup)
+
+    def get_predicate(self):
+        value = self.field.to_python(self.value, self.lookup)
+        return predicates.compile_lookup(self.field, self.lookup, value)
+
+    def get_mask(self):
+        value = self.field.to_python(self.value, self.lookup)
+        return vectorized.compile_lookup(self.field, self.lookup, value)
+
+    def get_shape(self):
+        def value_shape(value):
+            # Booleans may be compiled into the SQL instead of as parameters
+            if isinstance(value, bool):
+                return value
+            return type(value).__name__
+
+        value = self.field.prepare(self.value, self.lookup)
+        if self.lookup == 'in':
+            # Like the database, 'in' lookups ignore duplicates and None
+            try:
+                value = [v for v in dict.fromkeys(value) if v is not None]
+            except TypeError:
+                pass
+            # Lists of values of the same type share templates of a size
+            # bucket, padded when bound
+            types = {type(v) for v in value}
+            if len(types) == 1 and bool not in types:
+                bucket = sqlcache.get_in_bucket(len(value))
+                shape = (types.pop().__name__, bucket)
+                return (self.kind, self.field.name, self.lookup, shape)
+        if isinstance(value, (list, tuple)):
+            shape = tuple(value_shape(v) for v in value)
+        else:
+            shape = value_shape(value)
+        return (self.kind, self.field.name, self.lookup, shape)
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'field': self.field.name,
+            'lookup': self.lookup,
+            'value': _to_json(self.value),
+        }
+
+
+class SubqueryCondition(Condition):
+    """
+    Condition on a relation, embedding a document for the Query class of the
+    related model declared in Meta.subqueries. The document is validated by
+    that class, and compiled into a subquery of the query's statement.
+    """
+    __slots__ = ('field', 'subquery')
+    kind = 'subquery'
+
+    def __init__(self, *args, field=None, condition=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        assert isinstance(field, str), \
+            'field must be specified'
+        assert isinstance(condition, dict), \
+            'condition must be a document'
+
+        subquery_class = self.query._meta.subqueries.get(field, None)
+        if subquery_class is None:
+            raise ValueError('Unsupported subquery relation: %s' % field)
+
+        self.field = field
+        # Subqueries share the scope values of the outer query
+        self.subquery = subquery_class(
+            condition, copy=self.query._copy, scope=self.query.scope,
+        )
+        if self.subquery.condition is None:
+            raise ValueError('Invalid subquery document')
+        if self.subquery.aggregation is not None:
+            raise ValueError('Subqueries can not be aggregated')
+
+    def is_valid(self):
+        """
+        Validate that the provided data is valid. The scope of the subquery is
+        checked with the scope of the outer query.
+        """
+        return self.subquery._validate_document()
+
+    def get_filter(self):
+        return subqueries.get_subquery_filter(
+            self.query, self.field, self.subquery,
+        )
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'field': self.field,
+            'condition': self.subquery.to_dict(),
+        }
@@ -0,0 +1,133 @@
+"""
+This file contains decoders for query documents sent in request bodies. Each
+decoder turns the body into the nested dicts and lists of a query document.
+
+The fastest available implementation is used for each format. Typed arrays in
+CBOR documents (RFC 8746) are decoded to NumPy arrays when NumPy is available,
+so large 'in' lists are not converted into lists of Python objects.
+"""
+
+import json
+import struct
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+__all__ = [
+    'register_decoder', 'get_decoder', 'decode',
+]
+
+
+# CBOR typed array tags (RFC 8746) and the NumPy dtype of their elements
+CBOR_TYPED_ARRAYS = {
+    64: '|u1', 65: '>u2', 66: '>u4', 67: '>u8',
+    68: '|u1', 69: '<u2', 70: '<u4', 71: '<u8',
+    72: '|i1', 73: '>i2', 74: '>i4', 75: '>i8',
+    77: '<i2', 78: '<i4', 79: '<i8',
+    80: '>f2', 81: '>f4', 82: '>f8',
+    84: '<f2', 85: '<f4', 86: '<f8',
+}
+
+# Struct formats used for typed arrays when NumPy is not available
+STRUCT_FORMATS = {
+    'u1': 'B', 'u2': 'H', 'u4': 'I', 'u8': 'Q',
+    'i1': 'b', 'i2': 'h', 'i4': 'i', 'i8': 'q',
+    'f2': 'e', 'f4': 'f', 'f8': 'd',
+}
+
+
+def _decode_typed_array(tag, data):
+    dtype = CBOR_TYPED_ARRAYS[tag]
+    if numpy is not None:
+        return numpy.frombuffer(data, dtype=dtype)
+    order = '<' if dtype[0] == '|' else dtype[0]
+    fmt = order + STRUCT_FORMATS[dtype[1:]]
+    return [v[0] for v in struct.iter_unpack(fmt, data)]
+
+
+def _cbor_tag_hook(*args):
+    # cbor2 5 calls the hook with (decoder, tag), later versions with
+    # (tag, immutable)
+    tag = next(a for a in args if isinstance(a, cbor2.CBORTag))
+    if tag.tag in CBOR_TYPED_ARRAYS and isinstance(tag.value, bytes):
+        return _decode_typed_array(tag.tag, tag.value)
+    return tag
+
+
+def decode_json(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    if isinstance(body, (bytes, bytearray)):
+        body = body.decode('utf-8')
+    return json.loads(body)
+
+
+def decode_msgpack(body):
+    if msgpack is None:
+        raise RuntimeError('msgpack is required to decode MessagePack')
+    return msgpack.unpackb(body, raw=False)
+
+
+def decode_cbor(body):
+    if cbor2 is None:
+        raise RuntimeError('cbor2 is required to decode CBOR')
+    return cbor2.loads(body, tag_hook=_cbor_tag_hook)
+
+
+DECODERS = {
+    'application/json': decode_json,
+    'application/msgpack': decode_msgpack,
+    'application/x-msgpack': decode_msgpack,
+    'application/vnd.msgpack': decode_msgpack,
+    'application/cbor': decode_cbor,
+}
+
+
+def register_decoder(content_type, decoder):
+    """
+    Register a decoder for a content type.
+
+    :param content_type: The content type, e.g. 'application/json'
+    :param decoder: A function taking the body and returning the document
+    """
+    DECODERS[content_type.lower()] = decoder
+
+
+def get_decoder(content_type):
+    """
+    Get the decoder for a content type, ignoring any parameters.
+
+    :param content_type: The content type, e.g. 'application/json'
+    """
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    if media_type not in DECODERS:
+        raise ValueError('Unsupported content type: %s' % content_type)
+    return DECODERS[media_type]
+
+
+def decode(body, content_type='application/json'):
+    """
+    Decode a query document.
+
+    :param body: The encoded document
+    :param content_type: The content type of the body
+    """
+    return get_decoder(content_type)(body)
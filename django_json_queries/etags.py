@@ -0,0 +1,268 @@
+"""
+This file contains conditional GET support for query endpoints: ETags computed
+from the fingerprint of a query and a cheap version of the data it reads, so
+that clients polling an unchanged query get a 304 Not Modified response
+without the query being run.
+
+The data version is by default made of one generation token per model the
+query reads (its model and the models of related fields and subqueries),
+stored in the cache named by Meta.etag_cache (the default cache by default) and
+replaced whenever an object of the model is saved or deleted. The cache must be
+shared by all processes serving the queries (e.g. Redis or Memcached): with a
+per-process cache such as LocMemCache, changes made by one process do not
+change the ETags served by the others. Changes not sending signals, such as
+QuerySet.update() or bulk_create(), must be followed by a call to bump().
+Alternatively, setting Meta.etag_version_field to a timestamp field updated on
+every change (e.g. an auto_now field) versions the data by the count and
+latest timestamp of the rows in the query's scope.
+
+The results of documents with relative dates (durations) change as time
+passes, so their ETags also include the current time, truncated to the
+smallest unit of their durations (or to the day for longer units).
+"""
+
+import datetime
+import hashlib
+import json
+import uuid
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max, Model
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from . import conditions
+from . import fields
+from .utils import ISO8601_DURATION_RE, is_duration
+
+
+__all__ = [
+    'bump', 'get_fingerprint', 'get_data_version', 'get_time_version',
+    'get_etag', 'conditional_response',
+]
+
+
+# The default Cache-Control directives of responses
+DEFAULT_CACHE_CONTROL = {'private': True, 'no_cache': True}
+
+CACHE_KEY = 'django_json_queries:generation:%s'
+
+# The aliases of the caches storing generation tokens
+_cache_aliases = {DEFAULT_CACHE_ALIAS}
+
+# The fields truncated from the current time for the smallest unit of the
+# durations of a document, from the smallest unit up
+_TRUNCATED = (
+    ('seconds', ('microsecond', )),
+    ('minutes', ('microsecond', 'second')),
+    ('hours', ('microsecond', 'second', 'minute')),
+)
+_TRUNCATED_DAY = ('microsecond', 'second', 'minute', 'hour')
+
+
+def bump(model):
+    """
+    Replace the generation token of a model, changing the ETags of all queries
+    reading it.
+
+    :param model: The model class
+    """
+    key = CACHE_KEY % model._meta.label_lower
+    token = uuid.uuid4().hex
+    for alias in _cache_aliases:
+        caches[alias].set(key, token, None)
+
+
+def _on_change(sender, **kwargs):
+    bump(sender)
+
+
+def _get_generation(model, alias):
+    key = CACHE_KEY % model._meta.label_lower
+    cache = caches[alias]
+    token = cache.get(key)
+    if token is None:
+        # Tokens are random, so a token lost from the cache is never reused
+        token = uuid.uuid4().hex
+        if not cache.add(key, token, None):
+            token = cache.get(key) or token
+    return token
+
+
+def setup(query, meta):
+    """
+    Validate the conditional GET options of a query's Meta class, set their
+    defaults, and track changes to the models the query reads.
+
+    :param query: The query class
+    :param meta: The Meta class of the query
+    """
+    version_field = getattr(meta, 'etag_version_field', None)
+    if version_field is not None:
+        try:
+            meta.model._meta.get_field(version_field)
+        except FieldDoesNotExist:
+            raise RuntimeError(
+                'Query %s.%s.Meta.etag_version_field refers to an unknown '
+                'field: %s' % (query.__module__, query.__name__, version_field)
+            )
+    setattr(meta, 'etag_version_field', version_field)
+
+    cache_alias = getattr(meta, 'etag_cache', DEFAULT_CACHE_ALIAS)
+    if cache_alias not in settings.CACHES:
+        raise RuntimeError(
+            'Query %s.%s.Meta.etag_cache refers to an unknown cache: %s' % (
+                query.__module__, query.__name__, cache_alias
+            )
+        )
+    setattr(meta, 'etag_cache', cache_alias)
+
+    cache_control = getattr(meta, 'cache_control', DEFAULT_CACHE_CONTROL)
+    setattr(meta, 'cache_control', dict(cache_control))
+
+    models = {meta.model}
+    for value in vars(query).values():
+        if isinstance(value, fields.Field) and value.model_field is not None:
+            models.add(value.model_field.model)
+    for subquery in meta.subqueries.values():
+        models.update(subquery._meta.etag_models)
+    models = sorted(models, key=lambda m: m._meta.label_lower)
+    setattr(meta, 'etag_models', models)
+
+    if version_field is None:
+        _cache_aliases.add(cache_alias)
+        for model in models:
+            uid = 'django_json_queries.etags:%s' % model._meta.label_lower
+            post_save.connect(_on_change, sender=model, dispatch_uid=uid)
+            post_delete.connect(_on_change, sender=model, dispatch_uid=uid)
+
+
+def _default(value):
+    # Scope and extra values that are not JSON types. The document itself is
+    # normalized to JSON types by to_dict().
+    if isinstance(value, Model):
+        return value.pk
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, (datetime.date, datetime.time, uuid.UUID, Decimal)):
+        return str(value)
+    raise TypeError(
+        'Object of type %s can not be fingerprinted' % type(value).__name__
+    )
+
+
+def get_fingerprint(query, extra=None):
+    """
+    Get a fingerprint of a query: a hash of its class, normalized document and
+    scope values, which is the same for equivalent query documents.
+
+    :param query: The query
+    :param extra: Other parameters the response depends on (e.g. paging), as a
+                  value that can be serialized as JSON
+    """
+    data = {
+        'query': '%s.%s' % (type(query).__module__, type(query).__name__),
+        'document': query.to_dict(),
+        'scope': query.scope,
+        'extra': extra,
+    }
+    encoded = json.dumps(data, sort_keys=True, default=_default)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def get_data_version(query):
+    """
+    Get the version of the data a query reads.
+
+    :param query: The query
+    """
+    meta = query._meta
+    if meta.etag_version_field is None:
+        return ':'.join(
+            _get_generation(m, meta.etag_cache) for m in meta.etag_models
+        )
+
+    version = query.get_base_queryset().aggregate(
+        count=Count('pk'), latest=Max(meta.etag_version_field),
+    )
+    latest = version['latest']
+    return '%s:%s' % (version['count'], '' if latest is None else latest)
+
+
+def _get_durations(query):
+    """
+    Get the durations of the relative date values of a query and its
+    subqueries.
+    """
+    durations = []
+    for condition in query.condition.walk():
+        if isinstance(condition, conditions.SubqueryCondition):
+            durations.extend(_get_durations(condition.subquery))
+        elif isinstance(condition, conditions.LookupCondition) and \
+                condition.field.value_type in ('date', 'datetime'):
+            value = condition.value
+            values = value if isinstance(value, (list, tuple)) else [value]
+            durations.extend(v for v in values if is_duration(v))
+    return durations
+
+
+def get_time_version(query):
+    """
+    Get the current time truncated to the precision of the relative date
+    values of a query, or None if it has none.
+
+    :param query: The query
+    """
+    durations = [
+        ISO8601_DURATION_RE.fullmatch(str(d)) for d in _get_durations(query)
+    ]
+    if not durations:
+        return None
+    truncated = _TRUNCATED_DAY
+    for unit, names in _TRUNCATED:
+        if any(d.group(unit) for d in durations):
+            truncated = names
+            break
+    now = timezone.now().replace(**{name: 0 for name in truncated})
+    return now.isoformat()
+
+
+def get_etag(query, extra=None):
+    """
+    Get the ETag of the results of a query.
+
+    :param query: The query
+    :param extra: Other parameters the response depends on
+    """
+    data = '%s:%s' % (get_fingerprint(query, extra), get_data_version(query))
+    time_version = get_time_version(query)
+    if time_version is not None:
+        data += ':%s' % time_version
+    return '"%s"' % hashlib.sha256(data.encode('utf-8')).hexdigest()[:32]
+
+
+def conditional_response(request, query, render, extra=None):
+    """
+    Respond to a request for the results of a query, answering with 304 Not
+    Modified (or 412 Precondition Failed) from the ETag before the query is
+    run if the request's preconditions allow it.
+
+    :param request: The request
+    :param query: The (valid) query
+    :param render: A function taking the query and returning the response
+    :param extra: Other parameters the response depends on
+    :returns: The response, with ETag and Cache-Control headers
+    """
+    etag = get_etag(query, extra)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render(query)
+    if 200 <= response.status_code < 300 or response.status_code == 304:
+        response['ETag'] = etag
+        patch_cache_control(response, **query._meta.cache_control)
+    return response
@@ -0,0 +1,189 @@
+"""
+This file contains the explanation of how a query is executed: the normalized
+query document, the compiled SQL and the database's query plan, parsed into a
+structure listing the sequential scans and indexes used.
+"""
+
+import datetime
+import decimal
+import json
+import re
+import uuid
+
+from django.db import connections
+
+
+__all__ = [
+    'explain',
+]
+
+
+def _jsonable(value):
+    """
+    Convert a query parameter to a value that can be serialized as JSON.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID, datetime.timedelta)):
+        return str(value)
+    return repr(value)
+
+
+def _node(operation, relation=None, index=None, detail=None):
+    return {
+        'operation': operation,
+        'relation': relation,
+        'index': index,
+        'detail': detail,
+        'children': [],
+    }
+
+
+def parse_postgresql(plan):
+    """
+    Parse a PostgreSQL plan in JSON format into a list of plan nodes.
+
+    :param plan: The plan, as returned by EXPLAIN (FORMAT JSON)
+    """
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    def parse(data):
+        node = _node(
+            data.get('Node Type'),
+            relation=data.get('Relation Name'),
+            index=data.get('Index Name'),
+            detail=data.get('Index Cond') or data.get('Filter'),
+        )
+        for key in ('Actual Total Time', 'Actual Rows', 'Total Cost',
+                    'Plan Rows'):
+            if key in data:
+                node[key.lower().replace(' ', '_')] = data[key]
+        node['children'] = [parse(p) for p in data.get('Plans', [])]
+        return node
+
+    return [parse(p['Plan']) for p in plan]
+
+
+SQLITE_LINE_RE = re.compile(r'^(?P<id>\d+) (?P<parent>\d+) \d+ (?P<detail>.*)$')
+SQLITE_DETAIL_RE = re.compile(
+    r'^(?P<operation>SCAN|SEARCH)( TABLE)? (?P<relation>\S+)'
+    r'( AS \S+)?'
+    r'( USING (COVERING )?INDEX (?P<index>\S+)'
+    r'| USING (?P<primary>INTEGER PRIMARY KEY))?'
+)
+
+
+def parse_sqlite(plan):
+    """
+    Parse a SQLite plan into a list of plan nodes.
+
+    :param plan: The plan, as returned by EXPLAIN QUERY PLAN, with one row per
+                 line formatted as 'id parent notused detail'
+    """
+    roots = []
+    nodes = {}
+    for line in plan.splitlines():
+        match = SQLITE_LINE_RE.match(line.strip())
+        if not match:
+            continue
+        detail = match.group('detail')
+        scan = SQLITE_DETAIL_RE.match(detail)
+        if scan:
+            index = scan.group('index')
+            if scan.group('primary'):
+                index = 'INTEGER PRIMARY KEY'
+            node = _node(
+                scan.group('operation'), relation=scan.group('relation'),
+                index=index, detail=detail,
+            )
+        else:
+            node = _node(detail, detail=detail)
+
+        nodes[match.group('id')] = node
+        parent = nodes.get(match.group('parent'))
+        if parent is None:
+            roots.append(node)
+        else:
+            parent['children'].append(node)
+    return roots
+
+
+def _walk(nodes):
+    for node in nodes:
+        yield node
+        yield from _walk(node['children'])
+
+
+def _is_sequential_scan(node):
+    if node['index'] is not None or node['relation'] is None:
+        return False
+    return node['operation'] in ('Seq Scan', 'SCAN')
+
+
+def _supports_analyze(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    return getattr(connection.features, 'supports_explain_analyze', False)
+
+
+def explain(query, analyze=False, using=None):
+    """
+    Explain how a query is executed.
+
+    :param query: The query to explain
+    :param analyze: Whether to execute the query to get actual run times
+                    (only supported by PostgreSQL, and MySQL 8.0.18 or later
+                    and MariaDB)
+    :param using: The database alias to explain the query on
+    :returns: A dict that can be serialized as JSON
+    """
+    queryset = query.get_queryset()
+    if using is not None:
+        queryset = queryset.using(using)
+    using = queryset.db
+    connection = connections[using]
+    if analyze and not _supports_analyze(connection):
+        raise ValueError(
+            'EXPLAIN ANALYZE is not supported on %s' % connection.vendor
+        )
+    # Queries with an aggregate block run their aggregation
+    if query.aggregation is not None:
+        queryset = query.aggregation.get_queryset(queryset)
+
+    sql, params = queryset.query.get_compiler(using=using).as_sql()
+    annotations = [
+        {'name': name, 'expression': str(annotation)}
+        for name, annotation in queryset.query.annotations.items()
+    ]
+
+    options = {'analyze': True} if analyze else {}
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        raw = queryset.explain(format='json', **options)
+        nodes = parse_postgresql(raw)
+    else:
+        raw = queryset.explain(**options)
+        nodes = parse_sqlite(raw) if vendor == 'sqlite' else []
+
+    return {
+        'query': query.to_dict(),
+        'sql': sql,
+        'params': _jsonable(list(params)),
+        'annotations': annotations,
+        'plan': {
+            'vendor': vendor,
+            'raw': raw,
+            'nodes': nodes,
+            'sequential_scans': sorted({
+                n['relation'] for n in _walk(nodes) if _is_sequential_scan(n)
+            }),
+            'indexes': sorted({
+                n['index'] for n in _walk(nodes) if n['index'] is not None
+            }),
+        },
+    }
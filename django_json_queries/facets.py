@@ -0,0 +1,153 @@
+"""
+This file contains the computation of facet counts: the number of objects
+matching a query for each value of a set of fields.
+
+On backends supporting GROUPING SETS, all facets are counted in a single
+statement. Otherwise, one GROUP BY query is run per facet, concurrently when
+the queries are not part of a transaction.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.db.models import Count
+
+from . import fields
+from .aggregates import get_expression
+
+
+__all__ = [
+    'get_facets',
+]
+
+
+# Vendors supporting GROUPING SETS and the GROUPING function
+GROUPING_SETS_VENDORS = ('postgresql', )
+
+
+def _get_columns(query, names):
+    columns = {}
+    for i, name in enumerate(names):
+        field = getattr(query, name, None)
+        if not isinstance(field, fields.Field):
+            raise ValueError('Unknown field: %s' % name)
+        columns['_facet_%d' % i] = get_expression(field)
+    return columns
+
+
+def _get_grouping_sets_sql(queryset, columns, limit, using):
+    """
+    Get a statement counting all facets, grouping the matching rows by one
+    grouping set per facet. The GROUPING function tells which facet a row
+    belongs to, and a window function ranks the values within each facet.
+    """
+    connection = connections[using]
+    inner = queryset.annotate(**columns).values(*columns)
+    inner_sql, params = inner.query.get_compiler(using=using).as_sql()
+
+    quote = connection.ops.quote_name
+    names = [quote(c) for c in columns]
+    groupings = [quote('_grouping_%d' % i) for i in range(len(names))]
+    count, rank = quote('_count'), quote('_rank')
+    sql = (
+        'SELECT * FROM ('
+        'SELECT *, ROW_NUMBER() OVER ('
+        'PARTITION BY %(groupings)s ORDER BY %(count)s DESC, %(names)s'
+        ') AS %(rank)s FROM ('
+        'SELECT %(names)s, %(grouping_functions)s, COUNT(*) AS %(count)s '
+        'FROM (%(inner)s) AS %(facets)s '
+        'GROUP BY GROUPING SETS (%(sets)s)'
+        ') AS %(grouped)s'
+        ') AS %(ranked)s'
+    ) % {
+        'names': ', '.join(names),
+        'groupings': ', '.join(groupings),
+        'grouping_functions': ', '.join(
+            'GROUPING(%s) AS %s' % (n, g) for n, g in zip(names, groupings)
+        ),
+        'inner': inner_sql,
+        'sets': ', '.join('(%s)' % n for n in names),
+        'count': count,
+        'rank': rank,
+        'facets': quote('_facets'),
+        'grouped': quote('_grouped'),
+        'ranked': quote('_ranked'),
+    }
+    params = tuple(params)
+    if limit is not None:
+        sql += ' WHERE %s <= %%s' % rank
+        params += (limit, )
+    sql += ' ORDER BY %s' % rank
+    return sql, params
+
+
+def _count_grouping_sets(queryset, columns, limit, using):
+    sql, params = _get_grouping_sets_sql(queryset, columns, limit, using)
+
+    width = len(columns)
+    counts = [[] for c in columns]
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        for row in cursor.fetchall():
+            # Exactly one column is grouped in each row
+            i = row[width:2 * width].index(0)
+            counts[i].append({'value': row[i], 'count': row[2 * width]})
+    return counts
+
+
+def _count_one(queryset, column, expression, limit, using):
+    queryset = queryset.annotate(**{column: expression}).values(column)
+    queryset = queryset.annotate(_count=Count('pk'))
+    queryset = queryset.order_by('-_count', column).using(using)
+    if limit is not None:
+        queryset = queryset[:limit]
+    return [{'value': r[column], 'count': r['_count']} for r in queryset]
+
+
+def _count_concurrently(queryset, columns, limit, using):
+    """
+    Count the facets with one GROUP BY query each, run concurrently in a
+    thread pool. Each thread uses its own database connection.
+    """
+    def count(column):
+        try:
+            return _count_one(queryset, column, columns[column], limit, using)
+        finally:
+            connections[using].close()
+
+    with ThreadPoolExecutor(max_workers=len(columns)) as executor:
+        return list(executor.map(count, columns))
+
+
+def get_facets(query, names, limit=None, using=None):
+    """
+    Count the objects matching a query for each value of the given fields.
+
+    :param query: The query to count objects for
+    :param names: The names of the fields (declared on the query) to count
+    :param limit: The maximum number of values to return per field
+    :param using: The database alias to query
+    :returns: A dict mapping each field name to a list of dicts with the value
+              and count, ordered by descending count
+    """
+    queryset = query.get_queryset().order_by()
+    if using is not None:
+        queryset = queryset.using(using)
+    using = queryset.db
+    connection = connections[using]
+    columns = _get_columns(query, names)
+
+    if not columns:
+        counts = []
+    elif connection.vendor in GROUPING_SETS_VENDORS:
+        counts = _count_grouping_sets(queryset, columns, limit, using)
+    elif connection.in_atomic_block or len(columns) == 1:
+        # Other connections can not see the changes of the current
+        # transaction, so the queries must run on this connection
+        counts = [
+            _count_one(queryset, c, e, limit, using)
+            for c, e in columns.items()
+        ]
+    else:
+        counts = _count_concurrently(queryset, columns, limit, using)
+    return dict(zip(names, counts))
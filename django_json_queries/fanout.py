@@ -0,0 +1,278 @@
+"""
+This file contains the execution of a query against several databases at the
+same time, merging the results into a single stream as they arrive.
+
+Timeouts are enforced by the databases where possible: statements are aborted
+at the deadline of their alias with statement_timeout on PostgreSQL,
+max_execution_time on MySQL (which only applies to SELECT statements) and a
+progress handler on SQLite. On other databases, the timeout only bounds the
+time spent waiting for the results of an alias, and its worker thread keeps
+running the statement until it finishes.
+"""
+
+import heapq
+import math
+import queue
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+from django.db import connections
+
+from .predicates import get_value
+
+
+class _Done:
+    pass
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+def _limit_duration(connection, deadline):
+    """
+    Make the database abort statements on a connection running past a
+    deadline, where supported. The limit lasts until the connection is closed.
+    """
+    milliseconds = max(math.ceil((deadline - monotonic()) * 1000), 1)
+    connection.ensure_connection()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('statement_timeout', %s, false)",
+                [str(milliseconds)],
+            )
+    elif connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SET SESSION max_execution_time = %d' % milliseconds
+            )
+    elif connection.vendor == 'sqlite':
+        # Called every 1000 virtual machine instructions, a true value aborts
+        # the statement
+        connection.connection.set_progress_handler(
+            lambda: monotonic() >= deadline, 1000,
+        )
+
+
+def _reset_duration(connection):
+    # In-memory SQLite connections are not closed, and are kept by the thread
+    if connection.vendor == 'sqlite' and connection.connection is not None:
+        connection.connection.set_progress_handler(None, 0)
+
+
+class _Ordered:
+    """
+    Sort key for a single value, supporting descending order and ordering of
+    missing values like the database does.
+    """
+    __slots__ = ('value', 'descending', 'nulls_largest')
+
+    def __init__(self, value, descending, nulls_largest):
+        self.value = value
+        self.descending = descending
+        self.nulls_largest = nulls_largest
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        a, b = self.value, other.value
+        if self.descending:
+            a, b = b, a
+        if a is None or b is None:
+            if a is b:
+                return False
+            # None is smaller than anything, unless NULLs are ordered largest
+            return (a is None) != self.nulls_largest
+        return a < b
+
+
+def _order_key(order_by, nulls_largest):
+    fields = [(f.lstrip('-'), f.startswith('-')) for f in order_by]
+
+    def key(obj):
+        return tuple(
+            _Ordered(get_value(obj, path), descending, nulls_largest)
+            for path, descending in fields
+        )
+
+    return key
+
+
+class FanOutResults:
+    """
+    The results of running a queryset against several database aliases. The
+    querysets are evaluated concurrently in a thread pool, and the results are
+    streamed in chunks as they arrive. If order_by is given, the streams are
+    merged keeping the ordering, otherwise chunks are returned in the order
+    they arrive (even if the queryset or its model has a default ordering).
+
+    Failures are reported per alias instead of failing the whole request. After
+    iterating, `errors` maps each failed alias to its exception (a TimeoutError
+    if the alias did not finish within its timeout), and `completed` contains
+    the aliases whose results were all returned. The statements of aliases
+    that time out are aborted by the database where supported (see above).
+    """
+
+    def __init__(self, queryset, using, order_by=None, timeout=None,
+                 chunk_size=2000, max_buffered_chunks=4):
+        """
+        :param queryset: The (filtered) queryset to run on each alias
+        :param using: A list of database aliases
+        :param order_by: Field names to order by, prefixed with '-' for
+                         descending order
+        :param timeout: Seconds each alias may spend, either a number or a dict
+                        mapping aliases to numbers, from the start of the
+                        iteration
+        :param chunk_size: The number of objects to fetch at a time
+        :param max_buffered_chunks: The number of chunks fetched from an alias
+                                    before waiting for them to be consumed
+        """
+        self.using = list(using)
+        if not self.using:
+            raise ValueError('At least one database alias is required')
+        self.order_by = list(order_by or [])
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.max_buffered_chunks = max_buffered_chunks
+        self.errors = {}
+        self.completed = set()
+
+        if self.order_by:
+            queryset = queryset.order_by(*self.order_by)
+        self.queryset = queryset
+
+    def __iter__(self):
+        cancelled = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(self.using))
+        deadlines = self._deadlines(monotonic())
+        try:
+            if self.order_by:
+                streams = []
+                for alias in self.using:
+                    q = queue.Queue(self.max_buffered_chunks)
+                    executor.submit(
+                        self._fetch, alias, q, cancelled, deadlines[alias],
+                    )
+                    streams.append(self._stream(
+                        {alias: q}, deadlines, cancelled,
+                    ))
+                nulls_largest = connections[
+                    self.using[0]
+                ].features.nulls_order_largest
+                key = _order_key(self.order_by, nulls_largest)
+                yield from heapq.merge(*streams, key=key)
+            else:
+                # Without ordering, all aliases share a queue and chunks are
+                # returned as soon as they arrive.
+                q = queue.Queue(self.max_buffered_chunks * len(self.using))
+                for alias in self.using:
+                    executor.submit(
+                        self._fetch, alias, q, cancelled, deadlines[alias],
+                    )
+                yield from self._stream(
+                    {alias: q for alias in self.using}, deadlines, cancelled,
+                )
+        finally:
+            cancelled.set()
+            executor.shutdown(wait=False)
+
+    def _deadlines(self, start):
+        deadlines = {}
+        for alias in self.using:
+            if isinstance(self.timeout, dict):
+                timeout = self.timeout.get(alias)
+            else:
+                timeout = self.timeout
+            deadlines[alias] = start + timeout if timeout else None
+        return deadlines
+
+    def _stream(self, queues, deadlines, cancelled):
+        """
+        Yield the objects from the given alias queues until all aliases have
+        finished, failed or timed out.
+        """
+        pending = set(queues)
+        while pending:
+            # Wait for the next item until the earliest pending deadline
+            now = monotonic()
+            expired = {
+                a for a in pending
+                if deadlines[a] is not None and deadlines[a] <= now
+            }
+            for alias in expired:
+                self.errors[alias] = TimeoutError(
+                    'Query on %s timed out' % alias
+                )
+            pending -= expired
+            if not pending:
+                break
+            waits = [deadlines[a] - now for a in pending if deadlines[a]]
+
+            q = queues[next(iter(pending))]
+            try:
+                alias, item = q.get(timeout=min(waits) if waits else None)
+            except queue.Empty:
+                continue
+            if alias not in pending:
+                # Late results from an alias that has already timed out
+                continue
+
+            if isinstance(item, _Done):
+                self.completed.add(alias)
+                pending.discard(alias)
+            elif isinstance(item, _Failed):
+                self.errors[alias] = item.error
+                pending.discard(alias)
+            else:
+                yield from item
+
+    def _fetch(self, alias, q, cancelled, deadline):
+        """
+        Evaluate the queryset on an alias in a worker thread, putting chunks of
+        objects on the queue. The database aborts the statement at the
+        deadline, if any and where supported.
+        """
+        def put(item):
+            while not cancelled.is_set():
+                try:
+                    q.put((alias, item), timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            connection = connections[alias]
+        except Exception as e:
+            put(_Failed(e))
+            return
+
+        try:
+            if deadline is not None:
+                if monotonic() >= deadline:
+                    raise TimeoutError('Query on %s timed out' % alias)
+                _limit_duration(connection, deadline)
+            chunk = []
+            queryset = self.queryset.using(alias)
+            for obj in queryset.iterator(chunk_size=self.chunk_size):
+                chunk.append(obj)
+                if len(chunk) >= self.chunk_size:
+                    if not put(chunk):
+                        return
+                    chunk = []
+            if chunk and not put(chunk):
+                return
+            put(_Done())
+        except Exception as e:
+            if deadline is not None and monotonic() >= deadline:
+                e = TimeoutError('Query on %s timed out' % alias)
+            put(_Failed(e))
+        finally:
+            # Worker threads get their own connections, which must be closed
+            _reset_duration(connection)
+            connection.close()
@@ -2,20 +2,33 @@ from collections import Iterable
 
 from datetime import date, time, datetime
 
+from django.conf import settings
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
 from django.db.models.functions import Now
+from django.utils import timezone
 from django.utils.dateparse import parse_date, parse_time, parse_datetime
 
-from .utils import is_duration, is_datetime, is_date, is_time
+from .utils import is_duration, is_datetime, is_date, is_time, add_duration
+from .utils import typed_array_kind
+from .lookups import JSONContains
 
 
 __all__ = [
     'IntegerField', 'FloatField', 'StringField', 'BooleanField',
     'DateField', 'TimeField', 'DateTimeField',
     'YearField', 'MonthField', 'WeekField', 'DayField', 'WeekDayField',
-    'HourField', 'MinuteField', 'SecondField',
+    'HourField', 'MinuteField', 'SecondField', 'JSONField',
 ]
 
 
+# The value types of fields with integer values, including date parts
+INTEGER_TYPES = (
+    'int', 'year', 'month', 'week_day', 'week', 'day', 'hour', 'minute',
+    'second',
+)
+
+
 class FieldBase(type):
     def __new__(cls, name, bases, attrs):
         super_new = super().__new__
@@ -33,7 +46,7 @@ class Field(metaclass=FieldBase):
     """Base class for all fields types"""
 
     def __init__(self, verbose_name=None, name=None, model_name=None,
-                 lookups=None):
+                 lookups=None, model_field=None, transforms=()):
         # Perform some basic validation
         assert isinstance(lookups, dict), \
             'Lookups must be a dict with name and lookup classes'
@@ -42,6 +55,10 @@ class Field(metaclass=FieldBase):
         self.model_name = model_name
         self.name = name
         self.lookups = lookups
+        self.model_field = model_field
+        self.transforms = tuple(transforms)
+        # Lookups rewritten to other lookups, as set by the query's policy
+        self.rewrites = {}
 
     def __repr__(self):
         """Display the module, class, and name of the field."""
@@ -69,6 +86,30 @@ class Field(metaclass=FieldBase):
             value_type=self.value_type,
         )
 
+    @property
+    def is_indexed(self):
+        """
+        Whether the model field this field queries is the first column of a
+        database index (including unique constraints and foreign keys).
+        """
+        field = self.model_field
+        if field is None:
+            return False
+        if field.primary_key or field.unique or field.db_index:
+            return True
+
+        meta = field.model._meta
+        together = list(meta.unique_together)
+        together += list(getattr(meta, 'index_together', []))
+        for fields in together:
+            if fields and fields[0] == field.name:
+                return True
+        for index in meta.indexes:
+            names = [f.lstrip('-') for f in getattr(index, 'fields', [])]
+            if names and names[0] == field.name:
+                return True
+        return False
+
     def validate(self, value, lookup):
         """
         Basic field validation. This method checks that the input type is of the
@@ -88,6 +129,17 @@ class Field(metaclass=FieldBase):
             self.parse_value(value)
 
     def validate_in(self, value, lookup):
+        # Typed arrays (e.g. decoded from binary formats) are validated by
+        # their element type, without converting them to Python objects
+        kind = typed_array_kind(value)
+        if kind is not None:
+            if kind not in self.input_type:
+                raise ValueError('Please provide a valid value')
+            if type(self).parse_value is not Field.parse_value:
+                for item in value.tolist():
+                    self.parse_value(item)
+            return
+
         if not isinstance(value, list):
             raise ValueError('Value must be a list')
 
@@ -116,8 +168,34 @@ class Field(metaclass=FieldBase):
         :param value: The raw value being queried
         :param lookup: The current lookup.
         """
+        # Database drivers only accept lists of Python objects
+        if typed_array_kind(value) is not None:
+            return value.tolist()
         return value
 
+    def to_python(self, value, lookup):
+        """
+        Prepare the specified value for evaluation in Python instead of in the
+        database. By default this is the same value as used for querying,
+        except for typed arrays which are kept as is.
+
+        :param value: The raw value being queried
+        :param lookup: The current lookup.
+        """
+        if typed_array_kind(value) is not None:
+            return value
+        return self.prepare(value, lookup)
+
+    def get_filter(self, value, lookup):
+        """
+        Get a Q object filtering on the specified value with the lookup.
+
+        :param value: The raw value being queried
+        :param lookup: The current lookup.
+        """
+        name = '%s__%s' % (self.model_name, lookup)
+        return Q(**{name: self.prepare(value, lookup)})
+
     #
     # The methods below are "private" methods not generally used
     #
@@ -271,12 +349,30 @@ class DateField(Field):
         :param value: The raw value being queried
         :param lookup: The current lookup.
         """
+        if lookup in ('in', 'range'):
+            return [self.prepare(v, 'exact') for v in value]
 
         if is_duration(value):
             return Now() + value
         else:
             return parse_date(value)
 
+    def to_python(self, value, lookup):
+        """
+        Prepare the specified value as either a date object, or for relative
+        dates, the current time with the duration added.
+
+        :param value: The raw value being queried
+        :param lookup: The current lookup.
+        """
+        if lookup in ('in', 'range'):
+            return [self.to_python(v, 'exact') for v in value]
+
+        if is_duration(value):
+            return add_duration(timezone.now(), value)
+        else:
+            return parse_date(value)
+
 
 class TimeField(Field):
     value_type = 'time'
@@ -307,12 +403,34 @@ class DateTimeField(Field):
         :param value: The raw value being queried
         :param lookup: The current lookup.
         """
+        if lookup in ('in', 'range'):
+            return [self.prepare(v, 'exact') for v in value]
 
         if is_duration(value):
             return Now() + value
         else:
             return parse_datetime(value)
 
+    def to_python(self, value, lookup):
+        """
+        Prepare the specified value as a datetime object, either relative to
+        the current time or parsed. Naive datetimes are made aware in the
+        current time zone, like Django does when querying.
+
+        :param value: The raw value being queried
+        :param lookup: The current lookup.
+        """
+        if lookup in ('in', 'range'):
+            return [self.to_python(v, 'exact') for v in value]
+
+        if is_duration(value):
+            return add_duration(timezone.now(), value)
+
+        value = parse_datetime(value)
+        if settings.USE_TZ and value is not None and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
 
 class YearField(Field):
     value_type = 'year'
@@ -380,3 +498,101 @@ class SecondField(RangeField):
     value_type = 'second'
     value_range = range(0, 60)
     input_type = int
+
+
+def _check_json(value):
+    """
+    Check that a value only consists of JSON types.
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if not isinstance(key, str):
+                raise ValueError('Object keys must be strings')
+            _check_json(item)
+    elif isinstance(value, list):
+        for item in value:
+            _check_json(item)
+    elif isinstance(value, float):
+        if value != value or value in (float('inf'), float('-inf')):
+            raise ValueError('Please provide a valid value')
+    elif value is not None and not isinstance(value, (str, int, bool)):
+        raise ValueError('Please provide a valid value')
+
+
+class JSONField(Field):
+    """
+    Field for JSON columns. Keys within the documents are queried by declaring
+    the key path as the field name, e.g. 'metadata__color'. Array indexes are
+    not supported in key paths.
+    """
+    value_type = 'json'
+    input_type = (dict, list, str, int, float, bool)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for key in self.transforms:
+            if not key or key.isdigit():
+                raise ValueError('Invalid key in JSON key path: %r' % key)
+            if key in self.lookups:
+                raise ValueError(
+                    'Key %r in JSON key path is the name of a lookup' % key
+                )
+
+    def parse_value(self, value):
+        _check_json(value)
+
+    def validate_contains(self, value, lookup):
+        if not isinstance(value, (dict, list)) and not self.transforms:
+            raise ValueError('Please provide an object or array')
+        self._check_type(value)
+        _check_json(value)
+
+    def validate_has_key(self, value, lookup):
+        if not isinstance(value, str) or not value:
+            raise ValueError('Please provide a key')
+
+    def validate_has_keys(self, value, lookup):
+        if not isinstance(value, list) or not value:
+            raise ValueError('Please provide a list of keys')
+        for key in value:
+            self.validate_has_key(key, lookup)
+
+    validate_has_any_keys = validate_has_keys
+
+    def validate_isnull(self, value, lookup):
+        if not isinstance(value, bool):
+            raise ValueError('Please provide a boolean')
+
+    def prepare(self, value, lookup):
+        """
+        Prepare the specified value for querying. Values of 'contains' lookups
+        on key paths are nested in objects for the key path, so that they can
+        be compiled as containment in the whole document.
+
+        :param value: The raw value being queried
+        :param lookup: The current lookup.
+        """
+        if lookup == 'contains':
+            for key in reversed(self.transforms):
+                value = {key: value}
+        return value
+
+    def to_python(self, value, lookup):
+        return value
+
+    def get_filter(self, value, lookup):
+        """
+        Get a Q object filtering on the specified value with the lookup.
+        'contains' lookups, also on key paths, are compiled as containment in
+        the whole document, so that they can use GIN indexes (including with
+        the jsonb_path_ops operator class) on PostgreSQL.
+
+        :param value: The raw value being queried
+        :param lookup: The current lookup.
+        """
+        if lookup != 'contains':
+            return super().get_filter(value, lookup)
+        path = self.model_name
+        if self.transforms:
+            path = path.rsplit(LOOKUP_SEP, len(self.transforms))[0]
+        return Q(JSONContains(F(path), self.prepare(value, lookup)))
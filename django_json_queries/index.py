@@ -0,0 +1,420 @@
+"""
+This file contains an index over many queries of the same Query class, used to
+find which of the queries match a single object without evaluating all of them.
+
+Each query is split into its top-level branches (the conditions of an 'or', or
+the query itself), and one necessary lookup of each branch is chosen as the
+branch's anchor. Equality anchors ('exact' and 'in') are stored in inverted
+indexes from value to queries, and range anchors ('gt', 'gte', 'lt', 'lte' and
+'range', combined per field within a branch) in interval trees. To match an
+object, only the queries with an anchor hit (and queries that could not be
+anchored) are evaluated in full.
+"""
+
+import bisect
+
+from . import conditions
+from . import predicates
+
+
+class _Infinity:
+    """
+    Interval bound that compares as larger (or smaller) than any other value.
+    """
+
+    def __init__(self, sign):
+        self.sign = sign
+
+    def __lt__(self, other):
+        return self is not other and self.sign < 0
+
+    def __gt__(self, other):
+        return self is not other and self.sign > 0
+
+    def __le__(self, other):
+        return self is other or self.sign < 0
+
+    def __ge__(self, other):
+        return self is other or self.sign > 0
+
+    def __repr__(self):
+        return '-inf' if self.sign < 0 else 'inf'
+
+
+MIN = _Infinity(-1)
+MAX = _Infinity(1)
+
+
+class Interval:
+    __slots__ = ('low', 'high', 'low_inclusive', 'high_inclusive', 'key')
+
+    def __init__(self, low=MIN, high=MAX, low_inclusive=True,
+                 high_inclusive=True, key=None):
+        self.low = low
+        self.high = high
+        self.low_inclusive = low_inclusive
+        self.high_inclusive = high_inclusive
+        self.key = key
+
+    def above_low(self, value):
+        if self.low_inclusive:
+            return self.low <= value
+        return self.low < value
+
+    def below_high(self, value):
+        if self.high_inclusive:
+            return value <= self.high
+        return value < self.high
+
+    def is_empty(self):
+        if self.low is MIN or self.high is MAX:
+            return False
+        if self.low_inclusive and self.high_inclusive:
+            return self.low > self.high
+        return self.low >= self.high
+
+    def restrict(self, lookup, value):
+        """
+        Narrow this interval by a range lookup.
+        """
+        if lookup in ('gt', 'gte') or lookup == 'range':
+            low = value[0] if lookup == 'range' else value
+            if self.low is MIN or low > self.low:
+                self.low, self.low_inclusive = low, lookup != 'gt'
+        if lookup in ('lt', 'lte') or lookup == 'range':
+            high = value[1] if lookup == 'range' else value
+            if self.high is MAX or high < self.high:
+                self.high, self.high_inclusive = high, lookup != 'lt'
+
+
+class IntervalTree:
+    """
+    A static centered interval tree, answering which intervals contain a value
+    in O(log n + k) time. The tree is rebuilt on the first search after it has
+    been modified.
+    """
+
+    def __init__(self):
+        self.intervals = []
+        self.root = None
+
+    def add(self, interval):
+        # Empty intervals never contain any values, so they are not stored
+        if interval.is_empty():
+            return
+        self.intervals.append(interval)
+        self.root = None
+
+    def remove(self, key):
+        self.intervals = [i for i in self.intervals if i.key != key]
+        self.root = None
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def search(self, value):
+        """
+        Get the keys of all intervals containing the given value.
+        """
+        if self.root is None and self.intervals:
+            self.root = self._build(self.intervals)
+
+        keys = set()
+        node = self.root
+        while node is not None:
+            center, by_low, lows, by_high, highs, left, right = node
+            if value < center:
+                # All intervals in this node end after the value, so only
+                # check their start
+                for interval in by_low[:bisect.bisect_right(lows, value)]:
+                    if interval.above_low(value):
+                        keys.add(interval.key)
+                node = left
+            elif value > center:
+                # All intervals in this node start before the value, so only
+                # check their end
+                start = bisect.bisect_left(highs, value)
+                for interval in by_high[start:]:
+                    if interval.below_high(value):
+                        keys.add(interval.key)
+                node = right
+            else:
+                for interval in by_low:
+                    if interval.above_low(value) and \
+                            interval.below_high(value):
+                        keys.add(interval.key)
+                node = None
+        return keys
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+
+        # Use the median of the finite bounds as the center of the node. All
+        # intervals have at least one finite bound.
+        bounds = sorted(
+            b for i in intervals for b in (i.low, i.high)
+            if b is not MIN and b is not MAX
+        )
+        center = bounds[len(bounds) // 2]
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval.high < center:
+                left.append(interval)
+            elif interval.low > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+
+        by_low = sorted(here, key=lambda i: _Key(i.low))
+        by_high = sorted(here, key=lambda i: _Key(i.high))
+        return (
+            center,
+            by_low, [_Key(i.low) for i in by_low],
+            by_high, [_Key(i.high) for i in by_high],
+            self._build(left), self._build(right),
+        )
+
+
+class _Key:
+    """
+    Sort key wrapper allowing the infinite bounds to be compared with values
+    from either side.
+    """
+    __slots__ = ('value', )
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        other = other.value if isinstance(other, _Key) else other
+        if self.value is MIN or other is MAX:
+            return self.value is not other
+        if self.value is MAX or other is MIN:
+            return False
+        return self.value < other
+
+    def __gt__(self, other):
+        other = other.value if isinstance(other, _Key) else other
+        if self.value is MAX or other is MIN:
+            return self.value is not other
+        if self.value is MIN or other is MAX:
+            return False
+        return self.value > other
+
+
+RANGE_LOOKUPS = ('gt', 'gte', 'lt', 'lte', 'range')
+
+
+class QueryIndex:
+    """
+    Index of many queries of the same Query class, finding the queries matching
+    a model instance or dict in time proportional to the number of candidate
+    queries rather than the number of indexed queries.
+
+    NOTE:
+        Relative dates and datetimes are resolved when a query is added.
+    """
+
+    def __init__(self, query_class):
+        self.query_class = query_class
+        self.predicates = {}
+        self.unanchored = set()
+        self.equal = {}
+        self.ranges = {}
+        self.fields = {}
+        self.anchors = {}
+
+    def __len__(self):
+        return len(self.predicates)
+
+    def __contains__(self, key):
+        return key in self.predicates
+
+    def add(self, key, query):
+        """
+        Add a query to the index. The query can be a query document or an
+        instance of the index's Query class.
+
+        :param key: The id to return for the query when it matches
+        :param query: The query to add
+        """
+        if not isinstance(query, self.query_class):
+            query = self.query_class(query)
+        if not query.is_valid:
+            raise ValueError('Invalid query: %s' % key)
+
+        if key in self.predicates:
+            self.remove(key)
+        self.predicates[key] = query.compile_predicate()
+
+        anchors = [self._get_anchor(b) for b in self._get_branches(query)]
+        if None in anchors:
+            self.unanchored.add(key)
+            return
+
+        self.anchors[key] = anchors
+        for field, lookup, value in anchors:
+            if field.model_name not in self.fields:
+                self.fields[field.model_name] = self._compile_values(field)
+            if lookup == 'in':
+                values = self.equal.setdefault(field.model_name, {})
+                for v in value:
+                    values.setdefault(v, set()).add(key)
+            else:
+                tree = self.ranges.setdefault(
+                    field.model_name, IntervalTree(),
+                )
+                tree.add(Interval(
+                    value.low, value.high,
+                    value.low_inclusive, value.high_inclusive, key,
+                ))
+
+    def remove(self, key):
+        """
+        Remove a query from the index.
+
+        :param key: The id of the query to remove
+        """
+        del self.predicates[key]
+        self.unanchored.discard(key)
+        for field, lookup, value in self.anchors.pop(key, []):
+            if lookup == 'in':
+                values = self.equal[field.model_name]
+                for v in value:
+                    values[v].discard(key)
+                    if not values[v]:
+                        del values[v]
+            else:
+                self.ranges[field.model_name].remove(key)
+
+    def candidates(self, obj):
+        """
+        Get the keys of the queries that may match the given object. These are
+        the queries that must be evaluated in full.
+
+        :param obj: A model instance or dict
+        """
+        keys = set(self.unanchored)
+        for name, get_values in self.fields.items():
+            for value in get_values(obj):
+                if value is None:
+                    continue
+                if name in self.equal:
+                    try:
+                        keys.update(self.equal[name].get(value, ()))
+                    except TypeError:
+                        pass
+                if name in self.ranges:
+                    tree = self.ranges[name]
+                    try:
+                        # Dates are promoted like the bounds of the tree
+                        value = predicates._to_datetime(value)
+                        keys.update(tree.search(value))
+                    except TypeError:
+                        # Not comparable with the indexed bounds, so let the
+                        # full evaluation decide
+                        keys.update(i.key for i in tree.intervals)
+        return keys
+
+    def match(self, obj):
+        """
+        Get the keys of all queries matching the given object.
+
+        :param obj: A model instance or dict
+        """
+        return {
+            key for key in self.candidates(obj) if self.predicates[key](obj)
+        }
+
+    #
+    # "Private" methods
+    #
+
+    def _get_branches(self, query):
+        if isinstance(query.condition, conditions.OrCondition):
+            return query.condition.conditions
+        return [query.condition]
+
+    def _get_anchor(self, branch):
+        """
+        Choose the most selective indexable lookup that must be true for the
+        branch to match. Returns None if no such lookup exists.
+        """
+        lookups = []
+        stack = [branch]
+        while stack:
+            condition = stack.pop()
+            if isinstance(condition, conditions.AndCondition):
+                stack.extend(condition.conditions)
+            elif isinstance(condition, conditions.LookupCondition):
+                lookups.append(condition)
+
+        equal = None
+        intervals = {}
+        for condition in lookups:
+            field, lookup = condition.field, condition.lookup
+            if lookup not in ('exact', 'in') + RANGE_LOOKUPS:
+                continue
+            # Only lookups evaluated the same way in Python are indexed on
+            # JSON fields
+            if field.value_type == 'json' and \
+                    lookup not in predicates.JSON_LOOKUPS:
+                continue
+            value = field.to_python(condition.value, lookup)
+            if value is None:
+                continue
+            if lookup in ('exact', 'in'):
+                values = [value] if lookup == 'exact' else value
+                try:
+                    values = frozenset(values)
+                except TypeError:
+                    continue
+                if equal is None or len(values) < len(equal[2]):
+                    equal = (field, 'in', values)
+            else:
+                # Dates are compared like the database does, as datetimes at
+                # midnight, so that they can be sorted with datetime bounds
+                # (e.g. of relative dates)
+                if lookup == 'range':
+                    value = [predicates._to_datetime(v) for v in value]
+                else:
+                    value = predicates._to_datetime(value)
+                name = field.model_name
+                if name not in intervals:
+                    intervals[name] = (field, 'range', Interval())
+                intervals[name][2].restrict(lookup, value)
+
+        if equal is not None:
+            return equal
+        if intervals:
+            # Prefer intervals bounded on both sides
+            return max(
+                intervals.values(),
+                key=lambda a: (a[2].low is not MIN) + (a[2].high is not MAX),
+            )
+        return None
+
+    def _compile_values(self, field):
+        """
+        Compile a function getting the (transformed) values of a field from an
+        object, as a list.
+        """
+        get = predicates.compile_getter(field)
+        if field.value_type == 'json':
+            # The transforms of JSON fields are the keys of a key path
+            transform = predicates.compile_key_path(field.transforms)
+        else:
+            transform = predicates.compile_transform(field.transforms)
+
+        def get_values(obj):
+            value, needs_transform = get(obj)
+            if isinstance(value, predicates.Many):
+                values = value
+            else:
+                values = [value]
+            if needs_transform and field.transforms:
+                values = [transform(v) for v in values]
+            return values
+
+        return get_values
@@ -0,0 +1,62 @@
+"""
+This file contains custom database lookups used by query fields.
+"""
+
+import json
+import sys
+
+from django.db.backends.signals import connection_created
+from django.db.models.fields.json import DataContains
+
+from .predicates import json_contains
+
+
+SQLITE_CONTAINS_FUNCTION = 'django_json_queries_contains'
+
+
+def _sqlite_contains(document, value):
+    if document is None or value is None:
+        return None
+    return json_contains(json.loads(document), json.loads(value))
+
+
+def _register_sqlite_functions(connection):
+    # Deterministic functions can be used in indexes, but the flag is only
+    # supported on Python 3.8 and later
+    kwargs = {'deterministic': True} if sys.version_info >= (3, 8) else {}
+    connection.connection.create_function(
+        SQLITE_CONTAINS_FUNCTION, 2, _sqlite_contains, **kwargs
+    )
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        _register_sqlite_functions(connection)
+
+
+connection_created.connect(_on_connection_created)
+
+
+class JSONContains(DataContains):
+    """
+    Containment of a JSON value in a JSON column. On PostgreSQL this compiles
+    to the @> operator, which can use GIN indexes. SQLite has no containment
+    operator, so a function with the same semantics is registered on each
+    connection and evaluated per row instead.
+    """
+
+    def get_prep_lookup(self):
+        # The left hand side may be unresolved when the lookup is created, so
+        # the value is only prepared for its field when compiled
+        return self.rhs
+
+    def as_sqlite(self, compiler, connection):
+        # Connections opened before this module was imported did not get the
+        # function registered when they were created
+        connection.ensure_connection()
+        _register_sqlite_functions(connection)
+
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        params = tuple(lhs_params) + tuple(rhs_params)
+        return '%s(%s, %s)' % (SQLITE_CONTAINS_FUNCTION, lhs, rhs), params
@@ -0,0 +1,84 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_json_queries import recorder
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay queries recorded by a Recorder against a database, and report '
+        'throughput, latency percentiles, errors and slowdowns compared with '
+        'a previous run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The file with the recorded queries')
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='The number of queries to run at the same time',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=1,
+            help='The number of times to replay the recorded queries',
+        )
+        parser.add_argument(
+            '--database', default=None,
+            help='The database alias to run the queries on',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the summary of this run to a JSON file',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Compare with the summary of a previous run',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=1.2,
+            help='The minimum slowdown per fingerprint to report',
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        try:
+            records = list(recorder.read_records(options['path']))
+        except (OSError, ValueError) as e:
+            raise CommandError('Could not read %s: %s' % (options['path'], e))
+        records *= options['repeat']
+
+        results, elapsed = recorder.replay(
+            records, options['concurrency'], options['database'],
+        )
+        summary = recorder.summarize(results, elapsed)
+
+        self.stdout.write('Queries:    %d' % summary['queries'])
+        self.stdout.write('Elapsed:    %.3f s' % summary['elapsed'])
+        self.stdout.write('Throughput: %.1f queries/s' % summary['throughput'])
+        for name, value in summary['latency'].items():
+            self.stdout.write('Latency %-4s %.2f ms' % (name, value * 1000))
+        self.stdout.write('Errors:     %d' % summary['errors'])
+        for message in summary['error_messages']:
+            self.stdout.write('  %s' % message)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(summary, f, indent=2)
+
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(
+                    'Could not read %s: %s' % (options['baseline'], e)
+                )
+            slowdowns = recorder.compare(
+                baseline, summary, options['threshold'],
+            )
+            self.stdout.write('Slowdowns:  %d' % len(slowdowns))
+            for fingerprint, before, after, ratio in slowdowns:
+                self.stdout.write('  %s %.2f ms -> %.2f ms (%.2fx)' % (
+                    fingerprint[:16], before * 1000, after * 1000, ratio,
+                ))
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedQuery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('query_class', models.CharField(max_length=255)),
+                ('document', models.JSONField()),
+                ('normalized', models.JSONField()),
+                ('fingerprint', models.CharField(db_index=True, max_length=64)),
+                ('class_version', models.CharField(max_length=64)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('execution_count', models.PositiveIntegerField(default=0)),
+                ('mean_duration', models.FloatField(default=0.0)),
+                ('max_duration', models.FloatField(default=0.0)),
+                ('last_row_count', models.IntegerField(blank=True, null=True)),
+                ('last_executed', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'saved queries',
+            },
+        ),
+    ]
@@ -0,0 +1,186 @@
+import hashlib
+import json
+
+from time import monotonic
+
+from django.db import models
+from django.db.models import ExpressionWrapper, F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import etags
+from . import fields
+
+
+__all__ = [
+    'SavedQuery', 'get_class_version',
+]
+
+
+def _path(obj):
+    return '%s.%s' % (obj.__module__, obj.__qualname__)
+
+
+def get_class_version(query_class):
+    """
+    Get a hash of the definition of a Query class: its model, fields, lookups,
+    conditions, subqueries and scope. Documents validated against one version
+    of a class are valid for all classes with the same version.
+
+    :param query_class: The Query class
+    """
+    meta = query_class._meta
+    definition = {
+        'model': meta.model._meta.label_lower,
+        'fields': sorted(
+            [
+                name, _path(type(field)), field.model_name,
+                list(field.transforms), sorted(field.lookups),
+                sorted(field.rewrites.items()),
+            ]
+            for name, field in vars(query_class).items()
+            if isinstance(field, fields.Field)
+        ),
+        'conditions': sorted(
+            (kind, _path(condition))
+            for kind, condition in meta.conditions.items()
+        ),
+        'subqueries': sorted(
+            (name, _path(subquery), get_class_version(subquery))
+            for name, subquery in meta.subqueries.items()
+        ),
+        'or_strategy': meta.or_strategy,
+        'scope': meta.scope,
+        'time_window': meta.time_window,
+    }
+    encoded = json.dumps(definition, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class SavedQuery(models.Model):
+    """
+    A query document stored together with its Query class, normalized form,
+    fingerprint and running statistics of its executions.
+
+    Saved queries are validated when they are created, and are not validated
+    again when loaded, unless the definition of their Query class has changed
+    since. They require django_json_queries in INSTALLED_APPS.
+    """
+    name = models.CharField(max_length=255, blank=True)
+    query_class = models.CharField(max_length=255)
+    document = models.JSONField()
+    normalized = models.JSONField()
+    fingerprint = models.CharField(max_length=64, db_index=True)
+    class_version = models.CharField(max_length=64)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    # Running statistics of the executions
+    execution_count = models.PositiveIntegerField(default=0)
+    mean_duration = models.FloatField(default=0.0)
+    max_duration = models.FloatField(default=0.0)
+    last_row_count = models.IntegerField(null=True, blank=True)
+    last_executed = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'saved queries'
+
+    def __str__(self):
+        return self.name or self.fingerprint[:16]
+
+    @classmethod
+    def create(cls, query_class, document, name=''):
+        """
+        Validate and save a query document.
+
+        :param query_class: The Query class of the document
+        :param document: The query document
+        :param name: A name for the saved query
+        :returns: The saved query
+        """
+        query = query_class(document)
+        if query.condition is None or not query._validate_document():
+            raise ValueError('Invalid query document')
+        return cls.objects.create(
+            name=name,
+            query_class=_path(query_class),
+            document=document,
+            normalized=query.to_dict(),
+            fingerprint=etags.get_fingerprint(query),
+            class_version=get_class_version(query_class),
+        )
+
+    def get_query_class(self):
+        """
+        Get the Query class of this saved query.
+        """
+        return import_string(self.query_class)
+
+    def get_query(self, **kwargs):
+        """
+        Get a query for this saved query. The normalized document is resolved,
+        and is only validated again if the Query class has changed since this
+        query was saved.
+
+        :param kwargs: Arguments for the Query class, e.g. scope
+        """
+        query_class = self.get_query_class()
+        query = query_class(self.normalized, **kwargs)
+        if query.condition is not None:
+            query._trusted = (
+                self.class_version == get_class_version(query_class)
+            )
+        return query
+
+    def execute(self, using=None, **kwargs):
+        """
+        Get the results of this saved query, and update its statistics.
+
+        :param using: The database alias to query
+        :param kwargs: Arguments for the Query class, e.g. scope
+        :returns: A list of the matching objects, or for queries with an
+                  aggregate block, a list of dicts with the aggregated values
+        """
+        query = self.get_query(**kwargs)
+        if not query.is_valid:
+            raise ValueError('Invalid query')
+
+        start = monotonic()
+        queryset = query.get_queryset()
+        if using is not None:
+            queryset = queryset.using(using)
+        if query.aggregation is not None:
+            results = query.aggregation.aggregate(queryset)
+        else:
+            results = list(queryset)
+        self.record_execution(monotonic() - start, len(results))
+        return results
+
+    def record_execution(self, duration, rows):
+        """
+        Update the running statistics with an execution, atomically in the
+        database.
+
+        :param duration: The duration of the execution in seconds
+        :param rows: The number of rows returned
+        """
+        count = F('execution_count')
+        SavedQuery.objects.filter(pk=self.pk).update(
+            execution_count=count + 1,
+            mean_duration=ExpressionWrapper(
+                F('mean_duration') +
+                (Value(duration) - F('mean_duration')) / (count + 1.0),
+                output_field=models.FloatField(),
+            ),
+            max_duration=Greatest(
+                F('max_duration'), Value(duration),
+                output_field=models.FloatField(),
+            ),
+            last_row_count=rows,
+            last_executed=timezone.now(),
+        )
+        self.refresh_from_db(fields=[
+            'execution_count', 'mean_duration', 'max_duration',
+            'last_row_count', 'last_executed',
+        ])
@@ -0,0 +1,171 @@
+"""
+This file contains lookup policies: which lookups a query exposes on each of
+its fields, and which lookups are rewritten into cheaper ones.
+
+Policies are declared on the Meta class of a query, with keys that are either
+the name of a query field or a value type (e.g. 'string'), the field name
+taking precedence:
+
+    class Meta:
+        lookups = {
+            'string': ['exact', 'in', 'istartswith'],
+            'name': ['exact', 'istartswith'],
+        }
+        lookup_rewrites = {
+            'name': {'icontains': 'istartswith'},
+        }
+
+They are checked when the query class is created, and lookups that can not
+use an ordinary index are reported with a warning when allowed on fields
+that are not the first column of any index. The kind of index is not checked,
+so a lookup (or the target of a rewrite) allowed on an indexed field may still
+need a scan when the index can not serve it.
+"""
+
+import warnings
+
+from . import fields
+
+
+__all__ = [
+    'INDEX', 'PREFIX', 'SCAN', 'LOOKUP_COSTS', 'ExpensiveLookupWarning',
+    'get_cost', 'apply_policy', 'apply_policies',
+]
+
+
+# Cost tiers of lookups:
+#   INDEX:  Can use an ordinary (B-tree) index on the column
+#   PREFIX: Can only use an index built for prefix matching (e.g. with
+#           varchar_pattern_ops on PostgreSQL) or for case folding
+#   SCAN:   Needs to examine the value of every row
+INDEX = 0
+PREFIX = 1
+SCAN = 2
+
+LOOKUP_COSTS = {
+    'startswith': PREFIX,
+    'istartswith': PREFIX,
+    'iexact': PREFIX,
+    'contains': SCAN,
+    'icontains': SCAN,
+    'endswith': SCAN,
+    'iendswith': SCAN,
+    'regex': SCAN,
+    'iregex': SCAN,
+}
+
+# Lookups of JSON fields that can use GIN indexes
+JSON_INDEX_LOOKUPS = ('contains', 'has_key', 'has_keys', 'has_any_keys')
+
+
+class ExpensiveLookupWarning(UserWarning):
+    """
+    Warning for lookups that can not use an ordinary index, allowed on a
+    field that is not the first column of any index.
+    """
+
+
+def get_cost(field, lookup):
+    """
+    Get the cost tier of a lookup on a field.
+
+    :param field: The query field
+    :param lookup: The name of the lookup
+    """
+    if field.value_type == 'json' and lookup in JSON_INDEX_LOOKUPS:
+        return INDEX
+    return LOOKUP_COSTS.get(lookup, INDEX)
+
+
+def _get_rule(rules, field):
+    if field.name in rules:
+        return rules[field.name]
+    return rules.get(field.value_type, None)
+
+
+def apply_policy(query, field, lookups=None, rewrites=None):
+    """
+    Restrict the lookups of a query field to the ones allowed by a policy, and
+    set its lookup rewrites. Lookups of the policy that the field does not
+    support raise an error, whether the policy is declared for the field name
+    or its value type.
+
+    A warning is issued for lookups that can not use an ordinary index when
+    the field is not the first column of any index. Fields that are indexed
+    are not checked further: whether their index can serve a lookup, such as
+    the target of an icontains to istartswith rewrite, depends on its kind.
+
+    :param query: The query class the field belongs to
+    :param field: The query field
+    :param lookups: A dict mapping field names and value types to the allowed
+                    lookups
+    :param rewrites: A dict mapping field names and value types to dicts
+                     mapping lookups to the lookups they are rewritten to
+    """
+    path = '%s.%s' % (query.__module__, query.__name__)
+
+    allowed = _get_rule(lookups or {}, field)
+    if allowed is not None:
+        unknown = set(allowed) - set(field.lookups)
+        if unknown:
+            raise RuntimeError(
+                'Query %s.Meta allows unsupported lookups on %s: %s' % (
+                    path, field.name, ', '.join(sorted(unknown))
+                )
+            )
+        field.lookups = {
+            name: lookup for name, lookup in field.lookups.items()
+            if name in allowed
+        }
+
+    field.rewrites = dict(_get_rule(rewrites or {}, field) or {})
+    for source, target in field.rewrites.items():
+        if target not in field.lookups:
+            raise RuntimeError(
+                'Query %s.Meta rewrites %s to a lookup not allowed on %s: '
+                '%s' % (path, source, field.name, target)
+            )
+
+    # Only fields with a policy are checked, as the default exposes all
+    # lookups of the model field
+    if allowed is None or field.is_indexed:
+        return
+    expensive = sorted(
+        name for name in field.lookups if get_cost(field, name) > INDEX
+    )
+    if expensive:
+        warnings.warn(
+            'Query %s allows lookups that can not use an index on the '
+            'unindexed field %s: %s' % (path, field.name, ', '.join(expensive)),
+            ExpensiveLookupWarning,
+        )
+
+
+def apply_policies(query, meta):
+    """
+    Apply the lookup policy declared on the Meta class of a query to all its
+    fields.
+
+    :param query: The query class
+    :param meta: The Meta class of the query
+    """
+    lookups = getattr(meta, 'lookups', None) or {}
+    rewrites = getattr(meta, 'lookup_rewrites', None) or {}
+
+    fields_by_name = {
+        name: value for name, value in vars(query).items()
+        if isinstance(value, fields.Field)
+    }
+    value_types = {
+        getattr(fields, name).value_type for name in fields.__all__
+    }
+    for rules, option in ((lookups, 'lookups'), (rewrites, 'lookup_rewrites')):
+        for key in rules:
+            if key not in fields_by_name and key not in value_types:
+                raise RuntimeError(
+                    'Query %s.%s.Meta.%s refers to an unknown field or value '
+                    'type: %s' % (query.__module__, query.__name__, option, key)
+                )
+
+    for field in fields_by_name.values():
+        apply_policy(query, field, lookups, rewrites)
@@ -0,0 +1,384 @@
+"""
+This file contains the Python implementations of lookups and transforms used to
+evaluate conditions against objects in memory instead of in the database.
+
+The implementations mirror the semantics of the database lookups as closely as
+possible: comparisons against missing (NULL) values never match, dates are
+promoted to datetimes when compared with datetimes, and datetime transforms are
+evaluated in the current time zone.
+"""
+
+import datetime
+import re
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.manager import BaseManager
+from django.utils import timezone
+
+
+class Many(list):
+    """
+    The values of a multi-valued relation. A lookup matches if it matches any
+    of the values, like a join in the database would.
+    """
+
+
+def _local(value):
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.localtime(value)
+    return value
+
+
+TRANSFORMS = {
+    'year': lambda v: _local(v).year,
+    'iso_year': lambda v: _local(v).isocalendar()[0],
+    'quarter': lambda v: (_local(v).month - 1) // 3 + 1,
+    'month': lambda v: _local(v).month,
+    'week': lambda v: _local(v).isocalendar()[1],
+    'week_day': lambda v: _local(v).isoweekday() % 7 + 1,
+    'iso_week_day': lambda v: _local(v).isoweekday(),
+    'day': lambda v: _local(v).day,
+    'hour': lambda v: _local(v).hour,
+    'minute': lambda v: _local(v).minute,
+    'second': lambda v: _local(v).second,
+    'date': lambda v: _local(v).date(),
+    'time': lambda v: _local(v).time(),
+}
+
+
+def _exact(value):
+    return lambda a: a == value
+
+
+def _iexact(value):
+    value = str(value).lower()
+    return lambda a: str(a).lower() == value
+
+
+def _in(value):
+    try:
+        value = frozenset(value)
+    except TypeError:
+        value = list(value)
+    return lambda a: a in value
+
+
+def _contains(value):
+    value = str(value)
+    return lambda a: value in str(a)
+
+
+def _icontains(value):
+    value = str(value).lower()
+    return lambda a: value in str(a).lower()
+
+
+def _startswith(value):
+    value = str(value)
+    return lambda a: str(a).startswith(value)
+
+
+def _istartswith(value):
+    value = str(value).lower()
+    return lambda a: str(a).lower().startswith(value)
+
+
+def _endswith(value):
+    value = str(value)
+    return lambda a: str(a).endswith(value)
+
+
+def _iendswith(value):
+    value = str(value).lower()
+    return lambda a: str(a).lower().endswith(value)
+
+
+def _range(value):
+    low, high = value
+    return lambda a: low <= a <= high
+
+
+def _regex(value):
+    pattern = re.compile(value)
+    return lambda a: pattern.search(str(a)) is not None
+
+
+def _iregex(value):
+    pattern = re.compile(value, re.IGNORECASE)
+    return lambda a: pattern.search(str(a)) is not None
+
+
+# Factories creating a test function from the query value for each lookup
+LOOKUPS = {
+    'exact': _exact,
+    'iexact': _iexact,
+    'gt': lambda value: lambda a: a > value,
+    'gte': lambda value: lambda a: a >= value,
+    'lt': lambda value: lambda a: a < value,
+    'lte': lambda value: lambda a: a <= value,
+    'in': _in,
+    'contains': _contains,
+    'icontains': _icontains,
+    'startswith': _startswith,
+    'istartswith': _istartswith,
+    'endswith': _endswith,
+    'iendswith': _iendswith,
+    'range': _range,
+    'regex': _regex,
+    'iregex': _iregex,
+}
+
+
+def json_contains(document, value):
+    """
+    Check whether a JSON document contains a value, like the @> operator of
+    PostgreSQL: objects contain objects with a subset of their keys and
+    contained values, arrays contain arrays of contained elements (in any
+    order), and other values contain equal values. At the top level, an array
+    also contains a single value it has as an element.
+    """
+    if isinstance(document, list) and not isinstance(value, (dict, list)):
+        return value in document
+    return _json_contains(document, value)
+
+
+def _json_contains(document, value):
+    if isinstance(value, dict):
+        if not isinstance(document, dict):
+            return False
+        return all(
+            key in document and _json_contains(document[key], item)
+            for key, item in value.items()
+        )
+    if isinstance(value, list):
+        if not isinstance(document, list):
+            return False
+        return all(
+            any(_json_contains(d, item) for d in document) for item in value
+        )
+    if isinstance(document, (dict, list)):
+        return False
+    # Unlike in Python, JSON booleans are not numbers
+    return document == value and isinstance(document, bool) == \
+        isinstance(value, bool)
+
+
+# Factories creating a test function from the query value for each lookup on
+# JSON fields
+JSON_LOOKUPS = {
+    'exact': _exact,
+    'contains': lambda value: lambda a: json_contains(a, value),
+    'has_key': lambda value: lambda a: isinstance(a, dict) and value in a,
+    'has_keys': lambda value: lambda a: (
+        isinstance(a, dict) and all(k in a for k in value)
+    ),
+    'has_any_keys': lambda value: lambda a: (
+        isinstance(a, dict) and any(k in a for k in value)
+    ),
+}
+
+
+def _is_datetime(value):
+    if isinstance(value, (list, tuple)):
+        return any(_is_datetime(v) for v in value)
+    return isinstance(value, datetime.datetime)
+
+
+def _to_datetime(value):
+    """
+    Promote a date to a datetime at midnight, like the database does when a
+    date column is compared with a timestamp.
+    """
+    if type(value) is datetime.date:
+        value = datetime.datetime.combine(value, datetime.time())
+        if settings.USE_TZ:
+            value = timezone.make_aware(value)
+    return value
+
+
+def _attr(obj, name):
+    if isinstance(obj, dict):
+        return obj.get(name)
+    try:
+        return getattr(obj, name)
+    except AttributeError:
+        pass
+
+    # Reverse relations are accessed through their accessor name, which is not
+    # necessarily the same as the name used in queries.
+    meta = getattr(obj, '_meta', None)
+    if meta is None:
+        return None
+    try:
+        field = meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if hasattr(field, 'get_accessor_name'):
+        return getattr(obj, field.get_accessor_name(), None)
+    return None
+
+
+def _get(obj, parts):
+    for i, part in enumerate(parts):
+        if obj is None:
+            return None
+        obj = _attr(obj, part)
+        if isinstance(obj, BaseManager):
+            rest = parts[i + 1:]
+            values = Many()
+            for related in obj.all():
+                value = _get(related, rest)
+                if isinstance(value, Many):
+                    values.extend(value)
+                else:
+                    values.append(value)
+            return values
+    return obj
+
+
+def get_value(obj, path):
+    """
+    Get the value at the given lookup path (e.g. 'manufacturer__name') from a
+    model instance or dict. Multi-valued relations return a Many list.
+
+    :param obj: The model instance or dict
+    :param path: The path to the value
+    """
+    if isinstance(obj, dict) and path in obj:
+        return obj[path]
+    return _get(obj, path.split(LOOKUP_SEP))
+
+
+def compile_getter(field):
+    """
+    Compile a function that gets the value of the given query field from an
+    object. The object can be a model instance, a dict nested like the model
+    relations, or a flat dict as returned by QuerySet.values().
+
+    :param field: The query field to get values for
+    :returns: A function returning a tuple of the value and whether the value
+              still needs to have the field's transforms applied
+    """
+    name = field.model_name
+    parts = name.split(LOOKUP_SEP)
+    if field.transforms:
+        parts = parts[:-len(field.transforms)]
+    path = LOOKUP_SEP.join(parts)
+
+    def get(obj):
+        if isinstance(obj, dict):
+            if name in obj:
+                return obj[name], False
+            if path in obj:
+                return obj[path], True
+        return _get(obj, parts), True
+
+    return get
+
+
+def compile_transform(transforms):
+    """
+    Compile a function applying the given transforms in order.
+
+    :param transforms: The names of the transforms to apply
+    """
+    functions = []
+    for name in transforms:
+        if name not in TRANSFORMS:
+            raise ValueError(
+                'Unsupported transform for evaluation in Python: %s' % name
+            )
+        functions.append(TRANSFORMS[name])
+
+    def transform(value):
+        for function in functions:
+            if value is None:
+                return None
+            value = function(value)
+        return value
+
+    return transform
+
+
+def compile_key_path(keys):
+    """
+    Compile a function getting the value at the given key path of a JSON
+    document, or None if it does not exist.
+
+    :param keys: The keys of the path
+    """
+    def get(value):
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    return get
+
+
+def compile_test(lookup, value, lookups=LOOKUPS):
+    """
+    Compile a function testing a (transformed) object value against the query
+    value with the given lookup. Missing values only match 'isnull' lookups.
+
+    :param lookup: The name of the lookup
+    :param value: The query value, as returned by Field.to_python
+    :param lookups: The lookup implementations to use
+    """
+    # Like Django, treat exact lookups against None as 'isnull'
+    if lookup in ('exact', 'iexact') and value is None:
+        lookup, value = 'isnull', True
+
+    if lookup == 'isnull':
+        expected = bool(value)
+        return lambda a: (a is None) == expected
+
+    if lookup not in lookups:
+        raise ValueError(
+            'Unsupported lookup for evaluation in Python: %s' % lookup
+        )
+    test = lookups[lookup](value)
+
+    if _is_datetime(value):
+        def test_value(a):
+            return a is not None and test(_to_datetime(a))
+    else:
+        def test_value(a):
+            return a is not None and test(a)
+    return test_value
+
+
+def compile_lookup(field, lookup, value):
+    """
+    Compile a predicate checking whether an object matches a lookup on the
+    given field.
+
+    :param field: The query field to look up
+    :param lookup: The name of the lookup
+    :param value: The query value, as returned by Field.to_python
+    :returns: A function taking an object and returning True if it matches
+    """
+    get = compile_getter(field)
+    if field.value_type == 'json':
+        # The transforms of JSON fields are the keys of a key path
+        transform = compile_key_path(field.transforms)
+        test = compile_test(lookup, value, JSON_LOOKUPS)
+    else:
+        transform = compile_transform(field.transforms)
+        test = compile_test(lookup, value)
+
+    def check(value, needs_transform):
+        if needs_transform:
+            value = transform(value)
+        return test(value)
+
+    def predicate(obj):
+        value, needs_transform = get(obj)
+        if isinstance(value, Many):
+            return any(check(v, needs_transform) for v in value)
+        return check(value, needs_transform)
+
+    return predicate
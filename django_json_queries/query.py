@@ -1,16 +1,34 @@
 import inspect
 
+from itertools import islice
+from time import monotonic
 from distutils.version import StrictVersion
 
 import django
 from django.db import models
+from django.db.models import BooleanField, Case, Q, Value, When
 from django.db.models import functions
 from django.db.models.constants import LOOKUP_SEP
 from django.db.models.expressions import Expression
 from django.db.models.lookups import Lookup, Transform
 
+from . import aggregates
+from . import arrow
+from . import columns
+from . import facets
+from . import explain
+from . import fanout
 from . import fields
+from . import policy
+from . import replica
 from . import conditions
+from . import decoders
+from . import etags
+from . import scope
+from . import signals
+from . import sqlcache
+from . import subqueries
+from . import vectorized
 
 
 DJANGO_20 = StrictVersion(django.get_version()) >= StrictVersion('2.0')
@@ -26,6 +44,43 @@ def _get_output_field(field, transform_name, query):
     return result.output_field
 
 
+def _instrument_iterable(iterable_class, query):
+    """
+    Create a subclass of the given queryset iterable class, which reports the
+    time spent compiling and executing the SQL and building the results to the
+    query_phase signal. The time is measured from the first row is requested
+    until the results are exhausted.
+    """
+    class InstrumentedIterable(iterable_class):
+        def __iter__(self):
+            start = monotonic()
+            rows = 0
+            try:
+                for row in super().__iter__():
+                    rows += 1
+                    yield row
+            finally:
+                query._send_phase('execute', start, rows)
+
+    return InstrumentedIterable
+
+
+def _instrument_iterator(iterator, query):
+    """
+    Wrap an iterator of results, such as one bound from a cached SQL template,
+    to report the time spent executing the SQL and building the results to the
+    query_phase signal, like _instrument_iterable does for querysets.
+    """
+    start = monotonic()
+    rows = 0
+    try:
+        for row in iterator:
+            rows += 1
+            yield row
+    finally:
+        query._send_phase('execute', start, rows)
+
+
 def _get_lookups(field, whitelist=None):
     lookups = {}
     for name, cls in field.get_lookups().items():
@@ -34,6 +89,10 @@ def _get_lookups(field, whitelist=None):
     return lookups
 
 
+# Lookups supported on JSON fields and key paths within them
+JSON_LOOKUPS = ('exact', 'isnull', 'contains', 'has_key', 'has_keys',
+                'has_any_keys')
+
 # Default mappings from model field to our query fields.
 FIELD_FOR_DBFIELD_DEFAULTS = {
     models.DateField:           {'field_class': fields.DateField},
@@ -45,6 +104,8 @@ FIELD_FOR_DBFIELD_DEFAULTS = {
     models.CharField:           {'field_class': fields.StringField},
     models.TextField:           {'field_class': fields.StringField},
     models.BooleanField:        {'field_class': fields.BooleanField},
+    models.JSONField:           {'field_class': fields.JSONField,
+                                 'lookups': JSON_LOOKUPS},
 }
 
 # Default mappings from database functions to our query fields
@@ -60,6 +121,19 @@ FIELD_FOR_DBFUNCTION_DEFAULTS = {
 }
 
 
+# Strategies for compiling 'or' conditions:
+#   or:    A single WHERE clause with OR between the branches
+#   union: A primary key subquery with UNION ALL between the branches, allowing
+#          each branch to use its own index
+#   auto:  Use 'union' when the branches filter on different columns, and each
+#          branch filters on at least one indexed column
+OR_STRATEGIES = ('or', 'union', 'auto')
+
+# The maximum number of documents evaluated with a single statement by
+# Query.evaluate_many
+MAX_BATCH_SIZE = 50
+
+
 class QueryBase(type):
     """
     Metaclass for queries. This validates that the required attributes are
@@ -101,6 +175,31 @@ class QueryBase(type):
         })
         setattr(meta, 'conditions', _conditions)
 
+        # Make sure the strategy for 'or' conditions is valid, or set it to the
+        # default
+        or_strategy = getattr(meta, 'or_strategy', 'or')
+        if or_strategy not in OR_STRATEGIES:
+            raise RuntimeError(
+                'Query %s.%s.Meta defines an unknown or_strategy: %s' % (
+                    new_class.__module__, name, or_strategy
+                )
+            )
+        setattr(meta, 'or_strategy', or_strategy)
+
+        # Set up the cache of compiled SQL per query shape, if enabled
+        sql_cache_size = getattr(meta, 'sql_cache_size', 0)
+        if not isinstance(sql_cache_size, int) or sql_cache_size < 0:
+            raise RuntimeError(
+                'Query %s.%s.Meta defines an invalid sql_cache_size: %s' % (
+                    new_class.__module__, name, sql_cache_size
+                )
+            )
+        setattr(meta, 'sql_cache_size', sql_cache_size)
+        setattr(meta, 'sql_cache', (
+            sqlcache.SQLTemplateCache(sql_cache_size)
+            if sql_cache_size else None
+        ))
+
         # Check that a model has been specified
         if not hasattr(meta, 'model'):
             raise RuntimeError(
@@ -139,6 +238,23 @@ class QueryBase(type):
             field = new_class.get_field(field_name)
             new_class.add_to_class(field_name, field)
 
+        # Restrict and rewrite the lookups of the fields according to the
+        # declared policy
+        policy.apply_policies(new_class, meta)
+
+        # Validate the predicates every query must be scoped by
+        scope.setup(new_class, meta)
+
+        # Validate the relations that can be filtered through the Query class
+        # of the related model
+        subqueries.setup(new_class, meta)
+
+        # Set up the in-memory replica of small tables, if enabled
+        replica.setup(new_class, meta)
+
+        # Set up the ETags and Cache-Control headers of conditional responses
+        etags.setup(new_class, meta)
+
         return new_class
 
     def add_to_class(cls, name, value):
@@ -171,9 +287,9 @@ class QueryBase(type):
             field_class = type(field)
             if field_class in FIELD_FOR_DBFIELD_DEFAULTS:
                 f = FIELD_FOR_DBFIELD_DEFAULTS[field_class]
-                lookups = _get_lookups(field)
+                lookups = _get_lookups(field, f.get('lookups'))
                 # TODO: Verbose name etc.
-                return f['field_class'](lookups=lookups)
+                return f['field_class'](lookups=lookups, model_field=field)
             else:
                 raise ValueError('Unsupported field: %s' % field)
 
@@ -191,6 +307,7 @@ class QueryBase(type):
 
         # It's not a relational field, so 'rest' must be one or more transforms
         query = queryset.query
+        model_field = field
         transforms = rest.split(LOOKUP_SEP)
         for i, transform_name in enumerate(transforms):
             transform = field.get_transform(transform_name)
@@ -208,9 +325,13 @@ class QueryBase(type):
         # Return query field based on transform class
         if transform in FIELD_FOR_DBFUNCTION_DEFAULTS:
             f = FIELD_FOR_DBFUNCTION_DEFAULTS[transform]
-            lookups = _get_lookups(field)
+            lookups = _get_lookups(field, f.get('lookups'))
             # TODO: Verbose name etc.
-            return f['field_class'](lookups=lookups)
+            return f['field_class'](
+                lookups=lookups,
+                model_field=model_field,
+                transforms=transforms,
+            )
         else:
             field_class = type(field)
             if field_class not in FIELD_FOR_DBFIELD_DEFAULTS:
@@ -218,9 +339,13 @@ class QueryBase(type):
                     transform, field
                 ))
             f = FIELD_FOR_DBFIELD_DEFAULTS[field_class]
-            lookups = _get_lookups(field)
+            lookups = _get_lookups(field, f.get('lookups'))
             # TODO: Verbose name etc.
-            return f['field_class'](lookups=lookups)
+            return f['field_class'](
+                lookups=lookups,
+                model_field=model_field,
+                transforms=transforms,
+            )
 
 
 class Query(metaclass=QueryBase):
@@ -239,25 +364,456 @@ class Query(metaclass=QueryBase):
     fields and operations are allowed to be queried.
     """
 
-    def __init__(self, query):
+    def __init__(self, query, or_strategy=None, copy=True, scope=None):
+        """
+        :param query: The query document
+        :param or_strategy: The strategy for compiling 'or' conditions
+                            (defaults to Meta.or_strategy)
+        :param copy: Whether to copy the nodes of the document while resolving
+                     it. Documents that are not used elsewhere, such as freshly
+                     decoded ones, do not need to be copied.
+        :param scope: The values of the fields in Meta.scope, e.g. the tenant
+                      of the current request
+        """
+        assert or_strategy is None or or_strategy in OR_STRATEGIES, \
+            'Unknown or_strategy: %s' % or_strategy
+        self.or_strategy = or_strategy or self._meta.or_strategy
+        self._copy = copy
+        self.scope = dict(scope or {})
+        # Whether the document is known to be valid, e.g. for saved queries
+        # validated when they were stored
+        self._trusted = False
+
+        timed = self._is_instrumented()
+        start = monotonic() if timed else None
         try:
+            self.aggregation = self.resolve_aggregation(query)
+            if self.aggregation is not None:
+                if copy:
+                    query = query.copy()
+                del query['aggregate']
             self.condition = self.resolve_condition(query)
         except:
+            self.aggregation = None
             self.condition = None
+        if timed:
+            self._send_phase('resolve', start)
+
+    @classmethod
+    def from_bytes(cls, body, content_type='application/json', **kwargs):
+        """
+        Create a query from an encoded query document, such as a request body.
+        The document is decoded with the fastest available decoder for the
+        content type (see the decoders module), and resolved without copying.
+        Bodies that can not be decoded result in an invalid query.
+
+        :param body: The encoded query document
+        :param content_type: The content type of the body
+        :returns: A new query
+        """
+        decoder = decoders.get_decoder(content_type)
+        try:
+            document = decoder(body)
+        except Exception:
+            document = None
+        return cls(document, copy=False, **kwargs)
+
+    @classmethod
+    def evaluate_many(cls, documents, batch_size=MAX_BATCH_SIZE, using=None,
+                      scope=None):
+        """
+        Get the objects matching each of many query documents, with a single
+        statement per batch of documents instead of one per document. The
+        statement selects the objects matching any of the documents, with one
+        boolean annotation per document telling whether the row matches it.
+
+        All documents are validated before any of them are evaluated. Objects
+        matching several documents are returned as the same instance. Documents
+        with an aggregate block are rejected, as they do not select objects.
+
+        :param documents: The query documents (or queries) to evaluate
+        :param batch_size: The maximum number of documents per statement, at
+                           most MAX_BATCH_SIZE
+        :param using: The database alias to query
+        :param scope: The scope values to create queries from documents with
+        :returns: A list with the list of matching objects for each document
+        """
+        if not isinstance(batch_size, int) or \
+                not 0 < batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(
+                'batch_size must be between 1 and %d: %s' % (
+                    MAX_BATCH_SIZE, batch_size
+                )
+            )
+        queries = [
+            d if isinstance(d, cls) else cls(d, scope=scope) for d in documents
+        ]
+        invalid = [i for i, q in enumerate(queries) if not q.is_valid]
+        if invalid:
+            raise ValueError('Invalid query documents: %s' % ', '.join(
+                str(i) for i in invalid
+            ))
+        aggregated = [
+            i for i, q in enumerate(queries) if q.aggregation is not None
+        ]
+        if aggregated:
+            raise ValueError(
+                'Query documents with an aggregate block: %s' % ', '.join(
+                    str(i) for i in aggregated
+                )
+            )
+
+        results = []
+        for start in range(0, len(queries), batch_size):
+            results.extend(cls._evaluate_batch(
+                queries[start:start + batch_size], using,
+            ))
+        return results
 
     @property
     def is_valid(self):
         """
         Check if this query is valid.
         """
-        return self.condition is not None and self.condition.is_valid()
+        if self.condition is None:
+            return False
+        if not self._is_instrumented():
+            return self._validate()
+
+        start = monotonic()
+        is_valid = self._validate()
+        self._send_phase('validate', start)
+        return is_valid
 
     def get_queryset(self):
         """
         Get a queryset of the objects that match this query.
         """
         assert self.is_valid, 'Cannot get queryset from invalid query'
-        return self.condition.filter(self._meta.queryset)
+        queryset = self.get_base_queryset()
+        if not self._is_instrumented():
+            return self.condition.filter(queryset)
+
+        # Perform the same steps as Condition.filter, but time each of them,
+        # and wrap the iterable class to time the evaluation of the queryset.
+        start = monotonic()
+        queryset = self.condition.annotate(queryset)
+        self._send_phase('annotate', start)
+        start = monotonic()
+        q = self.condition.get_filter()
+        self._send_phase('filter', start)
+        queryset = queryset.filter(q)
+        queryset._iterable_class = _instrument_iterable(
+            queryset._iterable_class, self
+        )
+        return queryset
+
+    def get_base_queryset(self):
+        """
+        Get the queryset this query filters, which is Meta.queryset filtered
+        on the scope values of this query.
+        """
+        queryset = self._meta.queryset
+        if self._meta.scope:
+            queryset = queryset.filter(scope.get_scope_filter(self))
+        return queryset
+
+    def get_results(self, using=None, order_by=None, timeout=None,
+                    chunk_size=2000):
+        """
+        Get the objects that match this query from one or more databases.
+
+        With a single database alias (or None for the default database), the
+        (ordered) queryset is returned. If the query class caches compiled SQL
+        (see Meta.sql_cache_size), an iterator of the objects is returned
+        instead, and queries of a previously seen shape are executed without
+        compiling them again. With a list of aliases, the query is
+        compiled once and run concurrently on all of them, and a FanOutResults
+        object streaming the merged results is returned. Failures and timeouts
+        are reported per alias in its `errors` attribute.
+
+        If the query class keeps an in-memory replica of its table (see
+        Meta.replica_max_rows), queries of the default database without an
+        order are answered from it when possible, and a list of the objects
+        is returned instead.
+
+        The results are always an iterable of model instances, but the kind
+        of iterable depends on the options above, so callers must not depend
+        on queryset methods; use get_queryset() for those.
+
+        :param using: A database alias, or a list of aliases
+        :param order_by: Field names to order by, prefixed with '-' for
+                         descending order
+        :param timeout: Seconds each alias may spend, either a number or a dict
+                        mapping aliases to numbers
+        :param chunk_size: The number of objects to fetch at a time
+        """
+        single = using is None or isinstance(using, str)
+        in_memory = using is None and not order_by and \
+            self._meta.replica is not None
+        if in_memory:
+            assert self.is_valid, 'Cannot get results from invalid query'
+            timed = self._is_instrumented()
+            start = monotonic() if timed else None
+            results = self._meta.replica.get_results(self)
+            if results is not None:
+                if timed:
+                    # Evaluating the conditions over the snapshot replaces
+                    # executing the SQL
+                    self._send_phase('execute', start, len(results))
+                return results
+
+        cache = self._meta.sql_cache
+        if single and cache is not None:
+            assert self.is_valid, 'Cannot get results from invalid query'
+            timed = self._is_instrumented()
+            start = monotonic() if timed else None
+            results = cache.get_results(self, using, order_by)
+            if results is not None:
+                if timed:
+                    # Binding the values to the template replaces building
+                    # the filter
+                    self._send_phase('filter', start)
+                    results = _instrument_iterator(results, self)
+                return results
+
+        queryset = self.get_queryset()
+        if single:
+            if using is not None:
+                queryset = queryset.using(using)
+            if order_by:
+                queryset = queryset.order_by(*order_by)
+            return queryset
+        return fanout.FanOutResults(
+            queryset, using, order_by=order_by, timeout=timeout,
+            chunk_size=chunk_size,
+        )
+
+    def get_aggregates(self):
+        """
+        Get the aggregates specified in the query's 'aggregate' block, computed
+        over the objects that match this query in a single database query.
+
+        :returns: A list with one dict per group, containing the group fields
+                  and the aggregated values
+        """
+        assert self.is_valid, 'Cannot get aggregates from invalid query'
+        assert self.aggregation is not None, 'Query has no aggregate block'
+        timed = self._is_instrumented()
+        start = monotonic() if timed else None
+        # Grouping replaces the instrumented iterable of the queryset, so the
+        # execution of the aggregates is timed here
+        results = self.aggregation.aggregate(self.get_queryset())
+        if timed:
+            self._send_phase('execute', start, len(results))
+        return results
+
+    def facets(self, names, limit=None, using=None):
+        """
+        Count the objects matching this query for each value of the given
+        fields, such as for showing facets next to search results. On
+        backends supporting GROUPING SETS, all facets are counted with a
+        single statement.
+
+        :param names: The names of the fields to count values of
+        :param limit: The maximum number of values to return per field
+        :param using: The database alias to query
+        :returns: A dict mapping each field name to a list of dicts with the
+                  value and count, ordered by descending count
+        """
+        assert self.is_valid, 'Cannot get facets from invalid query'
+        return facets.get_facets(self, names, limit=limit, using=using)
+
+    def fetch_columns(self, names, chunk_size=2000, using=None):
+        """
+        Fetch fields of the objects matching this query as NumPy arrays, one
+        per field. The rows are read from a cursor in chunks and converted
+        directly, without creating model instances, using a dtype chosen from
+        the value type of each field.
+
+        :param names: The names of the fields to fetch, or 'pk'
+        :param chunk_size: The number of rows to convert at a time
+        :param using: The database alias to query
+        :returns: A dict mapping each field name to an array
+        """
+        assert self.is_valid, 'Cannot fetch columns of invalid query'
+        return columns.fetch_columns(
+            self, names, chunk_size=chunk_size, using=using,
+        )
+
+    def arrow_batches(self, names=None, chunk_size=10000, using=None):
+        """
+        Iterate over the objects matching this query as Arrow record batches,
+        with a schema derived from the declared fields. Only one chunk of rows
+        is held in memory at a time.
+
+        :param names: The names of the fields to export, or 'pk', defaulting
+                      to all declared fields
+        :param chunk_size: The maximum number of rows per record batch
+        :param using: The database alias to query
+        """
+        assert self.is_valid, 'Cannot export invalid query'
+        return arrow.iter_batches(self, names, chunk_size, using)
+
+    def stream_arrow(self, names=None, chunk_size=10000, using=None):
+        """
+        Iterate over the objects matching this query encoded in the Arrow IPC
+        streaming format, one item per record batch, such as for the content
+        of a StreamingHttpResponse.
+
+        :param names: The names of the fields to export, or 'pk', defaulting
+                      to all declared fields
+        :param chunk_size: The maximum number of rows per record batch
+        :param using: The database alias to query
+        """
+        assert self.is_valid, 'Cannot export invalid query'
+        return arrow.stream_ipc(self, names, chunk_size, using)
+
+    def write_parquet(self, sink, names=None, chunk_size=10000, using=None,
+                      **kwargs):
+        """
+        Write the objects matching this query to a Parquet file, with one row
+        group per chunk of rows.
+
+        :param sink: A path or writable file-like object
+        :param names: The names of the fields to export, or 'pk', defaulting
+                      to all declared fields
+        :param chunk_size: The maximum number of rows per row group
+        :param using: The database alias to query
+        :param kwargs: Options for pyarrow.parquet.ParquetWriter
+        :returns: The number of rows written
+        """
+        assert self.is_valid, 'Cannot export invalid query'
+        return arrow.write_parquet(
+            self, sink, names, chunk_size, using, **kwargs
+        )
+
+    def explain(self, analyze=False, using=None):
+        """
+        Explain how this query is executed by the database: the normalized
+        query document, the compiled SQL and parameters, the annotations added
+        by the conditions, and the query plan with the sequential scans and
+        indexes used. Queries with an aggregate block explain their grouped
+        query.
+
+        :param analyze: Whether to execute the query to get actual run times
+                        (raises ValueError on backends not supporting it)
+        :param using: The database alias to explain the query on
+        :returns: A dict that can be serialized as JSON
+        """
+        assert self.is_valid, 'Cannot explain invalid query'
+        return explain.explain(self, analyze=analyze, using=using)
+
+    def get_etag(self, extra=None):
+        """
+        Get an ETag for the results of this query, from the fingerprint of the
+        query and a cheap version of the data it reads (see the etags module).
+
+        :param extra: Other parameters the response depends on (e.g. paging),
+                      as a value that can be serialized as JSON
+        """
+        assert self.is_valid, 'Cannot get ETag of invalid query'
+        return etags.get_etag(self, extra)
+
+    def conditional_response(self, request, render, extra=None):
+        """
+        Respond to a request for the results of this query. Requests with an
+        If-None-Match header matching the current ETag are answered with 304
+        Not Modified before the query is run. Other responses are rendered,
+        and get the ETag and the Cache-Control headers of Meta.cache_control.
+
+        :param request: The request
+        :param render: A function taking this query and returning a response
+        :param extra: Other parameters the response depends on
+        """
+        assert self.is_valid, 'Cannot respond with invalid query'
+        return etags.conditional_response(request, self, render, extra)
+
+    async def aget_queryset(self):
+        """
+        Get a queryset of the objects that match this query from async code.
+        Resolving and validating the query is cheap and done synchronously, and
+        the returned queryset is lazy, so no database access is performed until
+        it is evaluated with async iteration or any of the other async methods.
+        """
+        return self.get_queryset()
+
+    async def acount(self):
+        """
+        Count the objects that match this query from async code.
+        """
+        queryset = self.get_queryset()
+        if hasattr(queryset, 'acount'):
+            return await queryset.acount()
+
+        # Django < 4.1 has no async queryset methods
+        from asgiref.sync import sync_to_async
+        return await sync_to_async(queryset.count)()
+
+    async def astream(self, chunk_size=2000):
+        """
+        Stream the objects that match this query from async code. The objects
+        are fetched from the database in chunks of the given size, so only a
+        single chunk is held in memory at a time.
+
+        :param chunk_size: The number of objects to fetch at a time
+        """
+        queryset = self.get_queryset()
+        if hasattr(queryset, 'aiterator'):
+            async for obj in queryset.aiterator(chunk_size=chunk_size):
+                yield obj
+            return
+
+        # Django < 4.1 has no async queryset methods, so fetch each chunk in
+        # the thread used for synchronous database access instead.
+        from asgiref.sync import sync_to_async
+        iterator = queryset.iterator()
+        fetch = sync_to_async(lambda: list(islice(iterator, chunk_size)))
+        while True:
+            chunk = await fetch()
+            if not chunk:
+                break
+            for obj in chunk:
+                yield obj
+
+    def __aiter__(self):
+        """
+        Iterate over the objects that match this query from async code.
+        """
+        return self.astream()
+
+    def compile_predicate(self):
+        """
+        Compile this query into a function that checks whether an object in
+        memory matches it, without querying the database. The function accepts
+        model instances as well as dicts, either nested like the model's
+        relations or flat like the rows returned by QuerySet.values().
+
+        NOTE:
+            Relative dates and datetimes are resolved against the time the
+            predicate is compiled, not the time it is called.
+
+        :returns: A function taking an object and returning a boolean
+        """
+        assert self.is_valid, 'Cannot compile predicate from invalid query'
+        return self.condition.get_predicate()
+
+    def compile_mask(self):
+        """
+        Compile this query into a function that computes which rows of a set of
+        columns match it. The columns are given as a mapping of field path to
+        NumPy array, or as a pandas DataFrame, and are evaluated with vectorized
+        operations over whole columns instead of row by row.
+
+        :returns: A function taking the columns and returning a boolean array
+        """
+        assert self.is_valid, 'Cannot compile mask from invalid query'
+        mask = self.condition.get_mask()
+
+        def evaluate(columns):
+            return mask(vectorized.Columns(columns))
+
+        return evaluate
 
     @classmethod
     def register_condition(cls, condition):
@@ -282,11 +838,46 @@ class Query(metaclass=QueryBase):
     def specification(self):
         return self.fields
 
+    @property
+    def node_count(self):
+        """
+        The number of condition nodes in this query.
+        """
+        if self.condition is None:
+            return 0
+        return sum(1 for c in self.condition.walk())
+
+    def to_dict(self):
+        """
+        Get the normalized document of this query, including its aggregate
+        block, if any.
+        """
+        document = self.condition.to_dict()
+        if self.aggregation is not None:
+            document['aggregate'] = {
+                'group_by': self.aggregation.group_by,
+                'values': self.aggregation.values,
+            }
+        return document
+
 
     #
     # "Private" methods
     #
 
+    def resolve_aggregation(self, query):
+        """
+        Resolve the 'aggregate' block of the given query, if any.
+
+        :param query: The query to resolve
+        """
+        block = query.get('aggregate', None)
+        if block is None:
+            return None
+        if not isinstance(block, dict):
+            raise ValueError('Invalid aggregate block')
+        return aggregates.Aggregation(self, **block)
+
     def resolve_condition(self, query):
         """
         Resolve the given query into a condition.
@@ -294,7 +885,8 @@ class Query(metaclass=QueryBase):
         :param query: The query to resolve
         """
         # Copy the query, to make sure we don't modify the original query object
-        query = query.copy()
+        if self._copy:
+            query = query.copy()
 
         # Locate the query class
         kind = query.pop('kind', None)
@@ -306,3 +898,65 @@ class Query(metaclass=QueryBase):
 
         # Return query object
         return Condition(query=self, **query)
+
+    @classmethod
+    def _evaluate_batch(cls, queries, using):
+        queryset = cls._meta.queryset
+        if using is not None:
+            queryset = queryset.using(using)
+
+        matches = {}
+        any_match = Q()
+        for i, query in enumerate(queries):
+            queryset = query.condition.annotate(queryset)
+            q = query.condition.get_filter()
+            if cls._meta.scope:
+                q &= scope.get_scope_filter(query)
+            any_match |= q
+            matches['_matches_%d' % i] = Case(
+                When(q, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        queryset = queryset.filter(any_match).annotate(**matches)
+
+        # Joins on multi-valued relations may return an object more than
+        # once, possibly matching different documents on each row
+        results = [[] for q in queries]
+        seen = [set() for q in queries]
+        for obj in queryset:
+            for i in range(len(queries)):
+                if getattr(obj, '_matches_%d' % i) and obj.pk not in seen[i]:
+                    seen[i].add(obj.pk)
+                    results[i].append(obj)
+        return results
+
+    def _validate(self):
+        if not self._trusted and not self._validate_document():
+            return False
+        return scope.is_in_scope(self)
+
+    def _validate_document(self):
+        if self.aggregation is not None and not self.aggregation.is_valid():
+            return False
+        return self.condition.is_valid()
+
+    def _is_instrumented(self):
+        return signals.query_phase.has_listeners(self.__class__)
+
+    def _send_phase(self, phase, start, nodes=None):
+        """
+        Send the query_phase signal for a phase that started at the given time.
+
+        :param phase: The name of the phase
+        :param start: The monotonic time the phase started
+        :param nodes: The number of nodes processed (defaults to node_count)
+        """
+        duration = monotonic() - start
+        signals.query_phase.send(
+            sender=self.__class__,
+            query=self,
+            phase=phase,
+            duration=duration,
+            nodes=self.node_count if nodes is None else nodes,
+        )
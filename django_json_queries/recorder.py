@@ -0,0 +1,254 @@
+"""
+This file contains the recording of executed queries, and their replay for
+load testing.
+
+A Recorder samples the queries executed while it is started, and writes their
+Query class, normalized document, scope values and execution time to a file
+with one JSON document per line (gzip compressed if the path ends in '.gz'):
+
+    recorder = Recorder('queries.jsonl.gz', sample_rate=0.01)
+    recorder.start()
+
+The recorded queries can be replayed with the replay_queries management
+command, or the replay function.
+"""
+
+import gzip
+import io
+import json
+import queue
+import random
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from . import etags
+from . import signals
+
+
+__all__ = [
+    'Recorder', 'read_records', 'replay', 'summarize', 'compare',
+]
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, mode + 'b'), encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class Recorder:
+    """
+    Records a sample of the executed queries to a file. The execution time of
+    a query is the time from its first row was requested until the results
+    were exhausted, as reported by the query_phase signal.
+    """
+
+    def __init__(self, path, sample_rate=1.0, sender=None):
+        """
+        :param path: The file to append the records to
+        :param sample_rate: The fraction of the executed queries to record
+        :param sender: The Query class to record queries of (defaults to all)
+        """
+        assert 0 < sample_rate <= 1, 'sample_rate must be in (0, 1]'
+        self.path = path
+        self.sample_rate = sample_rate
+        self.sender = sender
+        self.recorded = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """
+        Start recording queries.
+        """
+        with self._lock:
+            if self._file is None:
+                self._file = _open(self.path, 'a')
+        signals.query_phase.connect(
+            self._on_phase, sender=self.sender, weak=False,
+        )
+
+    def stop(self):
+        """
+        Stop recording queries, and close the file.
+        """
+        signals.query_phase.disconnect(self._on_phase, sender=self.sender)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _on_phase(self, sender, query, phase, duration, nodes, **kwargs):
+        if phase != 'execute' or random.random() >= self.sample_rate:
+            return
+        record = {
+            'query': '%s.%s' % (sender.__module__, sender.__qualname__),
+            'document': query.to_dict(),
+            'scope': query.scope,
+            'fingerprint': etags.get_fingerprint(query),
+            'duration': duration,
+            'rows': nodes,
+            'time': time.time(),
+        }
+        # Scope values that are not JSON types, such as dates, are recorded as
+        # strings
+        line = json.dumps(record, separators=(',', ':'), default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + '\n')
+                self.recorded += 1
+
+
+def read_records(path):
+    """
+    Read the records of a file written by a Recorder.
+
+    :param path: The path of the file
+    """
+    with _open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _run(record, classes, using):
+    name = record['query']
+    if name not in classes:
+        classes[name] = import_string(name)
+    query = classes[name](record['document'], scope=record.get('scope'))
+    if not query.is_valid:
+        raise ValueError('Invalid query')
+
+    queryset = query.get_queryset()
+    if using is not None:
+        queryset = queryset.using(using)
+    if query.aggregation is not None:
+        return len(query.aggregation.aggregate(queryset))
+    return sum(1 for _ in queryset.iterator())
+
+
+def replay(records, concurrency=4, using=None):
+    """
+    Replay recorded queries with a pool of threads, each using its own
+    database connection.
+
+    :param records: The records to replay
+    :param concurrency: The number of queries to run at the same time
+    :param using: The database alias to run the queries on
+    :returns: A list with a dict per record, with the fingerprint, latency in
+              seconds and error (if any), in the order the queries finished,
+              and the total time in seconds
+    """
+    pending = queue.Queue()
+    for record in records:
+        pending.put(record)
+    results = []
+    lock = threading.Lock()
+
+    def work():
+        classes = {}
+        try:
+            while True:
+                try:
+                    record = pending.get_nowait()
+                except queue.Empty:
+                    return
+                error = None
+                start = monotonic()
+                try:
+                    _run(record, classes, using)
+                except Exception as e:
+                    error = '%s: %s' % (type(e).__name__, e)
+                latency = monotonic() - start
+                with lock:
+                    results.append({
+                        'fingerprint': record.get('fingerprint'),
+                        'query': record['query'],
+                        'latency': latency,
+                        'error': error,
+                    })
+        finally:
+            connections[using or 'default'].close()
+
+    start = monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(work) for i in range(concurrency)]:
+            future.result()
+    return results, monotonic() - start
+
+
+def _percentile(values, percent):
+    # Nearest rank percentile of sorted values
+    index = max(0, int(round(percent / 100 * len(values) + 0.5)) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def summarize(results, elapsed):
+    """
+    Summarize the results of a replay.
+
+    :param results: The results of each query, as returned by replay
+    :param elapsed: The total time of the replay in seconds
+    :returns: A dict with the throughput, latency percentiles, errors and
+              median latency per fingerprint
+    """
+    latencies = sorted(r['latency'] for r in results)
+    errors = [r for r in results if r['error'] is not None]
+
+    by_fingerprint = {}
+    for r in results:
+        if r['error'] is None:
+            by_fingerprint.setdefault(r['fingerprint'], []).append(r['latency'])
+
+    return {
+        'queries': len(results),
+        'elapsed': elapsed,
+        'throughput': len(results) / elapsed if elapsed else 0.0,
+        'latency': {
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p99': _percentile(latencies, 99),
+            'max': latencies[-1],
+        } if latencies else {},
+        'errors': len(errors),
+        'error_messages': sorted({r['error'] for r in errors}),
+        'fingerprints': {
+            fingerprint: _percentile(sorted(values), 50)
+            for fingerprint, values in by_fingerprint.items()
+        },
+    }
+
+
+def compare(baseline, current, threshold=1.0):
+    """
+    Compare the median latency per fingerprint of two replays.
+
+    :param baseline: The summary of the baseline replay
+    :param current: The summary of the current replay
+    :param threshold: The minimum ratio of current to baseline latency to
+                      report
+    :returns: A list of (fingerprint, baseline, current, ratio) tuples,
+              slowest first
+    """
+    slowdowns = []
+    for fingerprint, latency in current['fingerprints'].items():
+        before = baseline['fingerprints'].get(fingerprint)
+        if not before:
+            continue
+        ratio = latency / before
+        if ratio >= threshold:
+            slowdowns.append((fingerprint, before, latency, ratio))
+    return sorted(slowdowns, key=lambda s: s[3], reverse=True)
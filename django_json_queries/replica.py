@@ -0,0 +1,309 @@
+"""
+This file contains in-memory replicas of small, frequently queried tables
+(e.g. reference tables of manufacturers or countries), answering queries by
+evaluating their conditions with vectorized operations over a snapshot of the
+table, instead of querying the database.
+
+Replicas are enabled on the Meta class of a query, with the maximum number of
+rows to keep in memory, and optionally the number of seconds a snapshot may be
+used for:
+
+    class Meta:
+        replica_max_rows = 5000
+        replica_ttl = 60
+
+The snapshot holds the objects of Meta.queryset, and one column per model
+field path read by the query fields and the scope, converted once when the
+snapshot is loaded. It is marked stale when objects of the models it reads are
+saved or deleted in this process, or when its TTL expires, and loaded again by
+the next query. Changes not sending signals, made by other processes, or rolled
+back after the snapshot was loaded, are only picked up when the TTL expires,
+unless invalidate() is called.
+
+Queries fall back to the database while another thread loads the snapshot,
+while the table has more rows than the maximum, and for conditions that can
+not be evaluated with vectorized operations (e.g. subqueries).
+"""
+
+import copy
+import threading
+
+from time import monotonic
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import F
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.signals import post_delete, post_save
+
+from . import fields
+from . import vectorized
+from .vectorized import numpy
+
+
+__all__ = [
+    'Replica', 'invalidate',
+]
+
+
+# The replicas of all query classes, per model they read
+_replicas = {}
+
+
+def _get_models(model, path):
+    """
+    Get the models a model field path reads, raising ValueError for paths
+    following relations that may match several rows per row.
+    """
+    found = [model]
+    for part in path.split(LOOKUP_SEP):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            # Transforms, like the year of a date
+            break
+        if not field.is_relation:
+            break
+        if not field.concrete or not (field.many_to_one or field.one_to_one):
+            raise ValueError(path)
+        model = field.related_model
+        found.append(model)
+    return found
+
+
+def _to_array(values):
+    """
+    Convert the values of a column to an array. Numbers are converted to
+    numeric arrays, with NaN for nulls, and other values are converted by the
+    vectorized module.
+    """
+    array = numpy.empty(len(values), dtype=object)
+    array[:] = values
+    present = [v for v in values if v is not None]
+    numbers = all(
+        isinstance(v, (int, float)) and not isinstance(v, bool)
+        for v in present
+    )
+    if present and numbers:
+        if len(present) == len(values) and all(
+            isinstance(v, int) for v in present
+        ):
+            return numpy.array(values, dtype='int64')
+        return numpy.array(
+            [numpy.nan if v is None else v for v in values], dtype='float64',
+        )
+    return array
+
+
+class Snapshot:
+    """
+    The objects of a table and their columns at the time they were loaded.
+    """
+
+    def __init__(self, objects, arrays, scope, generation):
+        self.objects = objects
+        self.arrays = arrays
+        self.scope = scope
+        self.generation = generation
+        self.loaded = monotonic()
+
+
+class Replica:
+    """
+    The in-memory replica of the table a Query class reads.
+    """
+
+    def __init__(self, query, max_rows, ttl=None):
+        """
+        :param query: The query class
+        :param max_rows: The maximum number of rows to keep in memory
+        :param ttl: The number of seconds a snapshot may be used for, or None
+                    to only load it again when the table changes
+        """
+        meta = query._meta
+        self.query = query
+        self.max_rows = max_rows
+        self.ttl = ttl
+
+        self.paths = sorted({
+            value.model_name.rsplit(LOOKUP_SEP, len(value.transforms))[0]
+            if value.transforms else value.model_name
+            for value in vars(query).values()
+            if isinstance(value, fields.Field) and
+            value.model_field is not None and value.value_type != 'json'
+        })
+        self.models = set()
+        for path in self.paths + list(meta.scope):
+            self.models.update(_get_models(meta.model, path))
+
+        self.generation = 0
+        self.snapshot = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """
+        Mark the snapshot as stale, so that it is loaded again by the next
+        query.
+        """
+        self.generation += 1
+
+    def is_fresh(self, snapshot):
+        if snapshot is None or snapshot.generation != self.generation:
+            return False
+        return self.ttl is None or monotonic() - snapshot.loaded < self.ttl
+
+    def get_snapshot(self):
+        """
+        Get a fresh snapshot of the table, loading it if stale. Returns None if
+        the snapshot is being loaded by another thread, or if the table has
+        more rows than the maximum.
+        """
+        snapshot = self.snapshot
+        if self.is_fresh(snapshot):
+            return snapshot if snapshot.objects is not None else None
+
+        # Only one thread loads the snapshot, the others use the database
+        # meanwhile
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            snapshot = self.snapshot
+            if not self.is_fresh(snapshot):
+                snapshot = self.snapshot = self.load()
+        finally:
+            self._lock.release()
+        return snapshot if snapshot.objects is not None else None
+
+    def load(self):
+        """
+        Load a snapshot of the table with a single query.
+        """
+        generation = self.generation
+        names = {}
+        for path in self.paths + self.query._meta.scope:
+            names.setdefault(path, '_replica_%d' % len(names))
+
+        queryset = self.query._meta.queryset.annotate(
+            **{name: F(path) for path, name in names.items()}
+        )
+        objects = list(queryset[:self.max_rows + 1])
+        if len(objects) > self.max_rows:
+            # Checked again when the table changes, or the TTL expires
+            return Snapshot(None, None, None, generation)
+
+        values = {path: [] for path in names}
+        for obj in objects:
+            for path, name in names.items():
+                values[path].append(getattr(obj, name))
+                delattr(obj, name)
+
+        arrays = {
+            ('array', path): vectorized._as_array(_to_array(values[path]))
+            for path in self.paths
+        }
+        scope = {
+            path: _to_array(values[path]) for path in self.query._meta.scope
+        }
+        return Snapshot(objects, arrays, scope, generation)
+
+    def get_results(self, query):
+        """
+        Get the objects matching a (valid) query from the snapshot, in the
+        order of Meta.queryset. The objects are shallow copies of the objects
+        of the snapshot, so they can be modified, but related objects cached
+        on them (e.g. by select_related) are shared by all queries.
+
+        :param query: The query
+        :returns: A list of the matching objects, or None if the query must be
+                  answered by the database
+        """
+        try:
+            mask = query.condition.get_mask()
+        except (NotImplementedError, ValueError):
+            return None
+
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return None
+
+        # The arrays converted when loading the snapshot are shared by all
+        # evaluations, transformed arrays are computed per evaluation
+        columns = vectorized.Columns({})
+        columns.cache.update(snapshot.arrays)
+        try:
+            matches = numpy.asarray(mask(columns), dtype=bool)
+        except KeyError:
+            # Fields not read from a model field path
+            return None
+        for path, array in snapshot.scope.items():
+            value = query.scope[path]
+            if isinstance(value, models.Model):
+                value = value.pk
+            matches &= numpy.asarray(array == value, dtype=bool)
+
+        objects = snapshot.objects
+        return [copy.copy(objects[i]) for i in numpy.flatnonzero(matches)]
+
+
+def _on_change(sender, **kwargs):
+    invalidate(sender)
+
+
+def invalidate(model):
+    """
+    Mark the snapshots of all replicas reading a model as stale, such as after
+    changes that do not send signals, like QuerySet.update().
+
+    :param model: The model class
+    """
+    for replica in _replicas.get(model, ()):
+        replica.invalidate()
+
+
+def setup(query, meta):
+    """
+    Validate the replica options of a query's Meta class, set their defaults,
+    and set up the replica of the query if enabled.
+
+    :param query: The query class
+    :param meta: The Meta class of the query
+    """
+    path = '%s.%s' % (query.__module__, query.__name__)
+
+    max_rows = getattr(meta, 'replica_max_rows', None)
+    if max_rows is not None and (
+        not isinstance(max_rows, int) or max_rows <= 0
+    ):
+        raise RuntimeError(
+            'Query %s.Meta defines an invalid replica_max_rows: %s' % (
+                path, max_rows
+            )
+        )
+    setattr(meta, 'replica_max_rows', max_rows)
+
+    ttl = getattr(meta, 'replica_ttl', None)
+    if ttl is not None and (not isinstance(ttl, (int, float)) or ttl <= 0):
+        raise RuntimeError(
+            'Query %s.Meta defines an invalid replica_ttl: %s' % (path, ttl)
+        )
+    setattr(meta, 'replica_ttl', ttl)
+
+    if max_rows is None:
+        setattr(meta, 'replica', None)
+        return
+
+    vectorized._require_numpy()
+    try:
+        replica = Replica(query, max_rows, ttl)
+    except ValueError as e:
+        raise RuntimeError(
+            'Query %s can not be replicated, as it reads a relation that may '
+            'match several rows per row: %s' % (path, e)
+        )
+    setattr(meta, 'replica', replica)
+
+    for model in replica.models:
+        _replicas.setdefault(model, []).append(replica)
+        uid = 'django_json_queries.replica:%s' % model._meta.label_lower
+        post_save.connect(_on_change, sender=model, dispatch_uid=uid)
+        post_delete.connect(_on_change, sender=model, dispatch_uid=uid)
@@ -0,0 +1,166 @@
+"""
+This file contains the scoping of queries: predicates that every query of a
+class must include, so that the database can prune the partitions of tables
+partitioned by tenant or by time, and so that tenants only see their own rows.
+
+Two kinds of scope are declared on the Meta class of a query:
+
+    class Meta:
+        scope = ['tenant']
+        time_window = ('measured', datetime.timedelta(days=31))
+
+The model fields listed in `scope` are filtered on values given when creating
+the query (e.g. from the request), and are added to the top-level 'and' of
+every query. The query field of `time_window` must be bounded on both sides by
+the top-level lookups of the query document, to a window no longer than the
+given maximum. Queries missing a scope value or a bounded time window are
+invalid.
+"""
+
+import datetime
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+
+from . import conditions
+from . import fields
+from .predicates import _to_datetime
+
+
+__all__ = [
+    'get_scope_filter', 'get_time_window', 'is_in_scope',
+]
+
+
+LOWER_BOUNDS = ('gt', 'gte', 'exact')
+UPPER_BOUNDS = ('lt', 'lte', 'exact')
+
+
+def _check_path(model, path):
+    """
+    Check that a model field path exists, following relations.
+    """
+    parts = path.split(LOOKUP_SEP)
+    for i, part in enumerate(parts):
+        field = model._meta.get_field(part)
+        if i < len(parts) - 1:
+            if not field.is_relation:
+                raise FieldDoesNotExist(path)
+            model = field.related_model
+
+
+def setup(query, meta):
+    """
+    Validate the scope options of a query's Meta class, and set their
+    defaults.
+
+    :param query: The query class
+    :param meta: The Meta class of the query
+    """
+    path = '%s.%s' % (query.__module__, query.__name__)
+
+    scope = list(getattr(meta, 'scope', []))
+    for name in scope:
+        try:
+            _check_path(meta.model, name)
+        except FieldDoesNotExist:
+            raise RuntimeError(
+                'Query %s.Meta.scope refers to an unknown field: %s' % (
+                    path, name
+                )
+            )
+    setattr(meta, 'scope', scope)
+
+    time_window = getattr(meta, 'time_window', None)
+    if time_window is not None:
+        try:
+            name, maximum = time_window
+        except (TypeError, ValueError):
+            name, maximum = None, None
+        field = getattr(query, str(name), None)
+        if not isinstance(field, (fields.DateField, fields.DateTimeField)):
+            raise RuntimeError(
+                'Query %s.Meta.time_window must name a date or datetime '
+                'field' % path
+            )
+        if not isinstance(maximum, datetime.timedelta):
+            raise RuntimeError(
+                'Query %s.Meta.time_window must have a timedelta as maximum' %
+                path
+            )
+    setattr(meta, 'time_window', time_window)
+
+
+def get_scope_filter(query):
+    """
+    Get a filter on the scope values of a query.
+
+    :param query: The query
+    """
+    return Q(**{name: query.scope[name] for name in query._meta.scope})
+
+
+def _top_level_lookups(condition):
+    if isinstance(condition, conditions.LookupCondition):
+        return [condition]
+    if isinstance(condition, conditions.AndCondition):
+        return [
+            c for c in condition.conditions
+            if isinstance(c, conditions.LookupCondition)
+        ]
+    return []
+
+
+def get_time_window(query):
+    """
+    Get the window of time a query is bounded to by the top-level lookups on
+    the field of its time window.
+
+    :param query: The query
+    :returns: A tuple with the lower and upper bounds, either of which may be
+              None if the query is not bounded on that side
+    """
+    name, _ = query._meta.time_window
+    lower = upper = None
+    for condition in _top_level_lookups(query.condition):
+        if condition.field.name != name:
+            continue
+        value = condition.field.to_python(condition.value, condition.lookup)
+        if condition.lookup == 'range':
+            low, high = value
+        else:
+            low = value if condition.lookup in LOWER_BOUNDS else None
+            high = value if condition.lookup in UPPER_BOUNDS else None
+        # Dates are compared like the database does, as datetimes at midnight
+        if low is not None:
+            low = _to_datetime(low)
+            lower = low if lower is None else max(lower, low)
+        if high is not None:
+            high = _to_datetime(high)
+            upper = high if upper is None else min(upper, high)
+    return lower, upper
+
+
+def is_in_scope(query):
+    """
+    Check whether a query and its subqueries have all scope values, and are
+    bounded to their maximum time window.
+
+    :param query: The query
+    """
+    meta = query._meta
+    if any(name not in query.scope for name in meta.scope):
+        return False
+
+    if meta.time_window is not None:
+        lower, upper = get_time_window(query)
+        if lower is None or upper is None:
+            return False
+        if upper - lower > meta.time_window[1]:
+            return False
+
+    return all(
+        is_in_scope(c.subquery) for c in query.condition.walk()
+        if isinstance(c, conditions.SubqueryCondition)
+    )
@@ -0,0 +1,19 @@
+"""
+Signals sent by queries while they are being processed.
+
+The signals are only sent when at least one receiver is connected, so leaving
+them unconnected adds next to no overhead to the processing of a query.
+"""
+
+from django.dispatch import Signal
+
+
+# Sent after each instrumented phase of a query has finished. The sender is the
+# Query class, and the following arguments are provided:
+#
+#   query:    The Query instance being processed
+#   phase:    One of 'resolve', 'validate', 'annotate', 'filter' or 'execute'
+#   duration: The time spent in the phase in seconds (from a monotonic clock)
+#   nodes:    The number of condition nodes processed, or for the 'execute'
+#             phase, the number of rows returned by the database
+query_phase = Signal()
@@ -0,0 +1,363 @@
+"""
+This file contains a cache of compiled SQL per query shape, used to skip
+building the filter tree and compiling SQL for queries that only differ in
+their values.
+
+A query's shape is its condition tree with the fields, lookups and value types
+(and list sizes) of each lookup, but not the values themselves. The sizes of
+'in' lists are rounded up to the next power of two, and the lists are padded to
+that size by repeating their last value, so that lists of similar sizes share a
+template. The first time a shape is seen, the query is compiled normally, and
+the SQL is kept as a template together with the compiled lookups of the WHERE
+clause. Queries of the same shape then only compile their lookups, with the new
+values, against the template. Each lookup must compile to the same SQL as in
+the template, and the template is only stored if its parameters are exactly
+the parameters of its lookups, so any query that cannot be bound safely falls
+back to the normal compilation. The lookups of Meta.queryset and the scope of
+the query precede the lookups of the conditions, and are bound the same way.
+"""
+
+import copy
+import threading
+
+from collections import OrderedDict
+
+from django.core.exceptions import EmptyResultSet
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.lookups import Lookup
+from django.db.models.sql.where import WhereNode
+
+from . import conditions
+
+
+# Marker for shapes that can not be compiled to a template
+_UNCACHEABLE = object()
+
+
+def _get_lookups(node):
+    """
+    Get the lookups of a WHERE tree, depth first. Returns None if the tree
+    contains anything else than lookups.
+    """
+    lookups = []
+    for child in node.children:
+        if isinstance(child, WhereNode):
+            if child.negated:
+                return None
+            nested = _get_lookups(child)
+            if nested is None:
+                return None
+            lookups.extend(nested)
+        elif isinstance(child, Lookup):
+            lookups.append(child)
+        else:
+            return None
+    return lookups
+
+
+def _get_target(expression):
+    """
+    Get the model field of the column an expression is computed from.
+    """
+    while not hasattr(expression, 'target'):
+        sources = expression.get_source_expressions()
+        if len(sources) != 1:
+            return None
+        expression = sources[0]
+    return expression.target
+
+
+def get_in_bucket(size):
+    """
+    Get the number of parameters an 'in' lookup with the given number of
+    distinct values is padded to: the next power of two.
+    """
+    return 1 << max(size - 1, 0).bit_length()
+
+
+def _in_sql(lhs_sql, size):
+    return '%s IN (%s)' % (lhs_sql, ', '.join(['%s'] * size))
+
+
+def _compile_rhs(compiler, lookup, lhs_sql):
+    """
+    Compile a lookup reusing the already compiled left hand side, like
+    BuiltinLookup.as_sql does.
+    """
+    connection = compiler.connection
+    rhs_sql, rhs_params = lookup.process_rhs(compiler, connection)
+    rhs_sql = lookup.get_rhs_op(connection, rhs_sql)
+    return '%s %s' % (lhs_sql, rhs_sql), list(rhs_params)
+
+
+class SQLTemplate:
+    """
+    The compiled SQL of a query, with the compiled lookups that its parameters
+    are bound from.
+    """
+
+    def __init__(self, queryset, compiler, sql, prefix, prefix_params,
+                 lookups):
+        self.queryset = queryset
+        self.using = queryset.db
+        self.compiler = compiler
+        self.sql = sql
+        self.prefix = prefix
+        self.prefix_params = prefix_params
+        self.lookups = lookups
+
+    @classmethod
+    def compile(cls, query, using, order_by):
+        """
+        Compile a template from a query. Returns None if the parameters of the
+        query can not be bound from its lookups.
+        """
+        try:
+            return cls._compile(query, using, order_by)
+        except EmptyResultSet:
+            # Lookups that can never match (e.g. 'in' with an empty list) are
+            # left out of the SQL, so their values can not be bound
+            return None
+
+    @classmethod
+    def _compile(cls, query, using, order_by):
+        # The queryset is kept with the template, so it must not be
+        # instrumented for the query it is compiled from
+        queryset = query.condition.filter(query.get_base_queryset())
+        queryset = queryset.using(using)
+        if order_by:
+            queryset = queryset.order_by(*order_by)
+        compiler = queryset.query.get_compiler(using=using)
+        sql, params = compiler.as_sql()
+
+        lookups = _get_lookups(queryset.query.where)
+        leaves = [
+            c for c in query.condition.walk()
+            if isinstance(c, conditions.LookupCondition)
+        ]
+        if lookups is None or len(lookups) < len(leaves):
+            return None
+
+        # The lookups of the base queryset come first, and are compiled again
+        # when binding scoped queries, as their values depend on the scope
+        split = len(lookups) - len(leaves)
+        prefix = []
+        bound = []
+        for lookup in lookups[:split]:
+            lookup_sql, lookup_params = compiler.compile(lookup)
+            prefix.append(lookup_sql)
+            bound.extend(lookup_params)
+        prefix_params = list(bound)
+
+        # The SQL of each lookup is located in the WHERE clause, in order, so
+        # that 'in' lookups can be padded to their bucket
+        position = sql.find(' WHERE ')
+        if position < 0:
+            return None
+        for lookup_sql in prefix:
+            found = sql.find(lookup_sql, position)
+            position = position if found < 0 else found + len(lookup_sql)
+
+        compiled = []
+        for condition, lookup in zip(leaves, lookups[split:]):
+            # The WHERE clause must contain the lookups of the conditions, in
+            # the same order
+            if lookup.lookup_name != condition.lookup:
+                return None
+            target = _get_target(lookup.lhs)
+            if target is None or target != condition.field.model_field:
+                return None
+            lookup_sql, lookup_params = compiler.compile(lookup)
+            bound.extend(lookup_params)
+
+            # Most lookups are compiled from their column and value
+            # separately. For those, only the value has to be compiled when
+            # binding, which is checked by compiling it the same way here.
+            lhs_sql = None
+            if hasattr(lookup, 'process_rhs') and hasattr(lookup, 'get_rhs_op'):
+                try:
+                    lhs_sql, lhs_params = lookup.process_lhs(
+                        compiler, compiler.connection,
+                    )
+                    fast = _compile_rhs(compiler, lookup, lhs_sql)
+                except Exception:
+                    lhs_sql = None
+                else:
+                    if lhs_params or fast != (lookup_sql, list(lookup_params)):
+                        lhs_sql = None
+
+            found = sql.find(lookup_sql, position)
+            bucket = None
+            if condition.lookup == 'in':
+                size = len(lookup_params)
+                if lhs_sql is None or found < 0 or size == 0 or \
+                        lookup_sql != _in_sql(lhs_sql, size):
+                    return None
+                bucket = get_in_bucket(size)
+                padded = _in_sql(lhs_sql, bucket)
+                sql = sql[:found] + padded + sql[found + len(lookup_sql):]
+                lookup_sql = padded
+            if found >= 0:
+                position = found + len(lookup_sql)
+            compiled.append((lookup, lookup_sql, lhs_sql, bucket))
+
+        if list(bound) != list(params):
+            return None
+        return cls(queryset, compiler, sql, prefix, prefix_params, compiled)
+
+    def bind(self, query):
+        """
+        Get the parameters of the given query, which must have the same shape
+        as the query this template was compiled from. Returns None if the
+        values can not be bound to this template.
+        """
+        try:
+            return self._bind(query)
+        except EmptyResultSet:
+            return None
+
+    def _bind(self, query):
+        compiler = self.compiler
+        params = self._bind_prefix(query)
+        if params is None:
+            return None
+
+        leaves = [
+            c for c in query.condition.walk()
+            if isinstance(c, conditions.LookupCondition)
+        ]
+        for condition, (lookup, lookup_sql, lhs_sql, bucket) in zip(
+                leaves, self.lookups):
+            value = condition.field.prepare(condition.value, condition.lookup)
+            value = self._resolve(value)
+            bound = type(lookup)(lookup.lhs, value)
+            if lhs_sql is not None:
+                sql, lookup_params = _compile_rhs(compiler, bound, lhs_sql)
+            else:
+                sql, lookup_params = compiler.compile(bound)
+            if bucket is not None:
+                # Duplicates do not change the result of an 'in' lookup
+                size = len(lookup_params)
+                if get_in_bucket(size) != bucket or \
+                        sql != _in_sql(lhs_sql, size):
+                    return None
+                lookup_params = list(lookup_params)
+                lookup_params += lookup_params[-1:] * (bucket - size)
+            elif sql != lookup_sql:
+                return None
+            params.extend(lookup_params)
+        return params
+
+    def _bind_prefix(self, query):
+        if not self.prefix or not query._meta.scope:
+            return list(self.prefix_params)
+
+        lookups = _get_lookups(query.get_base_queryset().query.where)
+        if lookups is None or len(lookups) != len(self.prefix):
+            return None
+        params = []
+        for lookup, prefix_sql in zip(lookups, self.prefix):
+            sql, lookup_params = self.compiler.compile(lookup)
+            if sql != prefix_sql:
+                return None
+            params.extend(lookup_params)
+        return params
+
+    def _resolve(self, value):
+        # Relative dates are expressions, which must be resolved like Django
+        # does when adding a filter
+        if isinstance(value, (list, tuple)):
+            return type(value)(self._resolve(v) for v in value)
+        if hasattr(value, 'resolve_expression'):
+            return value.resolve_expression(self.queryset.query)
+        return value
+
+    def get_results(self, params):
+        """
+        Get an iterator of model instances for the template bound to the given
+        parameters.
+        """
+        # The template compiler holds the selected columns needed to build the
+        # instances, so a copy of it only has to return the bound SQL.
+        compiler = copy.copy(self.compiler)
+        compiler.connection = connections[self.using]
+        compiler.as_sql = lambda *args, **kwargs: (self.sql, tuple(params))
+
+        queryset = self.queryset._chain()
+        queryset.query.get_compiler = lambda *args, **kwargs: compiler
+        return iter(queryset._iterable_class(queryset))
+
+
+class SQLTemplateCache:
+    """
+    A thread safe LRU cache of SQL templates by query shape.
+    """
+
+    def __init__(self, size=128):
+        """
+        :param size: The maximum number of templates to keep
+        """
+        self.size = size
+        self.templates = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # The number of shapes that could not be compiled to a template
+        self.uncacheable = 0
+
+    def __len__(self):
+        return len(self.templates)
+
+    def clear(self):
+        with self.lock:
+            self.templates.clear()
+            self.hits = self.misses = self.uncacheable = 0
+
+    def get_results(self, query, using=None, order_by=None):
+        """
+        Get an iterator of the objects matching the given query, binding the
+        values of the query to a cached template when possible. Returns None
+        if the query can not be compiled to a template, in which case it
+        should be evaluated normally.
+
+        :param query: The query to get results for
+        :param using: The database alias to query
+        :param order_by: Field names to order by
+        """
+        shape = query.condition.get_shape()
+        if shape is None:
+            return None
+        using = using or DEFAULT_DB_ALIAS
+        key = (shape, query.or_strategy, using, tuple(order_by or ()))
+
+        with self.lock:
+            template = self.templates.get(key)
+            if template is not None:
+                self.templates.move_to_end(key)
+
+        if template is _UNCACHEABLE:
+            return None
+
+        params = None
+        if template is not None:
+            params = template.bind(query)
+        if params is None:
+            with self.lock:
+                self.misses += 1
+            template = SQLTemplate.compile(query, using, order_by)
+            with self.lock:
+                if template is None:
+                    self.uncacheable += 1
+                self.templates[key] = template or _UNCACHEABLE
+                self.templates.move_to_end(key)
+                while len(self.templates) > self.size:
+                    self.templates.popitem(last=False)
+            if template is None:
+                return None
+            params = template.bind(query)
+            if params is None:
+                return None
+        else:
+            with self.lock:
+                self.hits += 1
+        return template.get_results(params)
@@ -0,0 +1,125 @@
+"""
+This file contains the setup of subquery conditions: conditions embedding a
+document for the Query class of a related model, which are compiled into a
+single SQL subquery instead of being evaluated separately.
+
+The relations that can be filtered through subqueries are declared on the Meta
+class of a query, mapping model field paths to Query classes:
+
+    class Meta:
+        subqueries = {
+            'manufacturer': ManufacturerQuery,
+        }
+
+Paths following only forward many-to-one and one-to-one relations are compiled
+into `path IN (SELECT pk ...)`. Reverse and many-to-many relations, which may
+match several related rows per row, are compiled into a correlated `EXISTS`
+subquery, so that rows are not duplicated; these paths must be a single
+relation.
+"""
+
+import inspect
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.constants import LOOKUP_SEP
+
+from . import conditions
+
+
+__all__ = [
+    'get_subquery_filter',
+]
+
+
+def _is_forward(field):
+    return field.concrete and (field.many_to_one or field.one_to_one)
+
+
+def _get_relation(model, path):
+    """
+    Get the model at the end of a relation path, and the name of the relation
+    back to the first model if it is compiled into an EXISTS subquery (or None
+    for an IN subquery).
+    """
+    parts = path.split(LOOKUP_SEP)
+    forward = True
+    for part in parts:
+        field = model._meta.get_field(part)
+        if not field.is_relation:
+            raise FieldDoesNotExist(path)
+        forward = forward and _is_forward(field)
+        model = field.related_model
+
+    if forward:
+        return model, None
+    if len(parts) > 1:
+        raise ValueError(path)
+    if field.concrete:
+        return model, field.related_query_name()
+    return model, field.field.name
+
+
+def setup(query, meta):
+    """
+    Validate the subquery options of a query's Meta class, set their defaults,
+    and register the subquery condition if any are declared.
+
+    :param query: The query class
+    :param meta: The Meta class of the query
+    """
+    path = '%s.%s' % (query.__module__, query.__name__)
+    # Import here, as the query module imports this module
+    from .query import Query
+
+    subqueries = dict(getattr(meta, 'subqueries', {}))
+    relations = {}
+    for name, subquery in subqueries.items():
+        try:
+            model, reverse = _get_relation(meta.model, name)
+        except FieldDoesNotExist:
+            raise RuntimeError(
+                'Query %s.Meta.subqueries refers to an unknown relation: %s' % (
+                    path, name
+                )
+            )
+        except ValueError:
+            raise RuntimeError(
+                'Query %s.Meta.subqueries refers to a path with more than one '
+                'relation that is not a forward relation: %s' % (path, name)
+            )
+        if not inspect.isclass(subquery) or not issubclass(subquery, Query):
+            raise RuntimeError(
+                'Query %s.Meta.subqueries maps %s to a non-Query class' % (
+                    path, name
+                )
+            )
+        if subquery._meta.model is not model:
+            raise RuntimeError(
+                'Query %s.Meta.subqueries maps %s to a Query of another model: '
+                '%s' % (path, name, subquery._meta.model.__name__)
+            )
+        relations[name] = reverse
+    setattr(meta, 'subqueries', subqueries)
+    setattr(meta, 'subquery_relations', relations)
+
+    if subqueries:
+        meta.conditions.setdefault('subquery', conditions.SubqueryCondition)
+
+
+def get_subquery_filter(query, path, subquery):
+    """
+    Get a filter selecting the rows of a query related through a path to the
+    rows matching a subquery.
+
+    :param query: The query
+    :param path: The model field path of the relation
+    :param subquery: The (valid) query of the related model
+    """
+    # The condition of the subquery is added to its base queryset directly,
+    # as the subquery has already been validated with the outer query
+    queryset = subquery.condition.filter(subquery.get_base_queryset())
+    reverse = query._meta.subquery_relations[path]
+    if reverse is None:
+        return Q(**{'%s__in' % path: queryset.values('pk')})
+    return Q(Exists(queryset.filter(**{reverse: OuterRef('pk')})))
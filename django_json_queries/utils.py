@@ -7,6 +7,7 @@ the more complex validations with actual parsers over time.
 """
 
 import re
+import array
 import calendar
 import datetime
 import logging
@@ -109,6 +110,81 @@ def is_duration(value):
     return ISO8601_DURATION_RE.fullmatch(str(value)) is not None
 
 
+def parse_duration(value):
+    """
+    Parse an ISO8601 duration into its components. Years and months are kept
+    separate from the rest, as their length depends on the date they are added
+    to.
+
+    :param value: The duration string to parse
+    :returns: A tuple of the number of months and a timedelta
+    """
+    match = ISO8601_DURATION_RE.fullmatch(str(value))
+
+    if not match:
+        raise ValidationError(
+            '"%(value)s" is not a valid ISO8601 duration.',
+            params={'value': value},
+            code='invalid',
+        )
+
+    parts = {
+        name: int(part[:-1]) if part else 0
+        for name, part in match.groupdict().items()
+    }
+    months = parts['years'] * 12 + parts['months']
+    delta = datetime.timedelta(
+        weeks=parts['weeks'],
+        days=parts['days'],
+        hours=parts['hours'],
+        minutes=parts['minutes'],
+        seconds=parts['seconds'],
+    )
+    return months, delta
+
+
+def add_duration(value, duration):
+    """
+    Add an ISO8601 duration to a date or datetime. Like in PostgreSQL, the day
+    of month is clamped to the last day of the resulting month when adding
+    years or months.
+
+    :param value: The date or datetime to add the duration to
+    :param duration: The duration string to add
+    :returns: A new date or datetime
+    """
+    months, delta = parse_duration(duration)
+    if months:
+        month = value.month - 1 + months
+        year = value.year + month // 12
+        month = month % 12 + 1
+        _, days_in_month = calendar.monthrange(year, month)
+        value = value.replace(
+            year=year, month=month, day=min(value.day, days_in_month),
+        )
+    return value + delta
+
+
+def typed_array_kind(value):
+    """
+    Get the kind of elements in a typed array (a NumPy array or array.array),
+    as the Python type of the elements (int or float).
+
+    :param value: The value to check
+    :returns: int or float for typed arrays, or None for other values
+    """
+    if isinstance(value, array.array):
+        return float if value.typecode in 'fd' else int
+    dtype = getattr(value, 'dtype', None)
+    if dtype is None or getattr(value, 'ndim', None) != 1:
+        return None
+    if dtype.kind in 'iu':
+        return int
+    if dtype.kind == 'f':
+        return float
+    return None
+
+
 def is_date(value):
     """
     Check if the given value is a valid ISO 8601 formatted date string.
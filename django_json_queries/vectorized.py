@@ -0,0 +1,305 @@
+"""
+This file contains vectorized implementations of lookups and transforms used to
+evaluate conditions against columns of NumPy arrays or pandas DataFrames.
+
+Columns are looked up by the path of the model field they were exported from
+(e.g. 'released' or 'manufacturer__name'). Transformed columns, such as
+'released__year', are computed from the underlying column once per evaluation,
+but can also be provided directly.
+
+Datetime columns should be datetime64 arrays in UTC, or time zone aware pandas
+series. Like in the database, datetime transforms are evaluated in the current
+time zone, and missing values (None, NaN or NaT) only match 'isnull' lookups.
+"""
+
+import datetime
+
+from django.db.models.constants import LOOKUP_SEP
+from django.utils import timezone
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _require_numpy():
+    if numpy is None:
+        raise RuntimeError('NumPy is required for vectorized evaluation')
+
+
+def _as_array(column):
+    # Time zone aware pandas series are converted to UTC datetime64 arrays
+    dt = getattr(column, 'dt', None)
+    if dt is not None and getattr(dt, 'tz', None) is not None:
+        column = dt.tz_convert('UTC').dt.tz_localize(None)
+
+    array = numpy.asarray(column)
+    nulls = _isnull(array)
+    if array.dtype.kind == 'O':
+        array = _convert_objects(array, nulls)
+    return array, nulls
+
+
+def _convert_objects(array, nulls):
+    """
+    Convert object arrays of strings, dates or datetimes (as returned by the
+    database) to typed arrays. Other object arrays are returned as is.
+    """
+    present = array[~nulls]
+    sample = present[0] if len(present) else None
+    if isinstance(sample, str):
+        return numpy.where(nulls, '', array).astype(str)
+    if isinstance(sample, datetime.datetime):
+        return numpy.array([
+            numpy.datetime64('NaT') if null else _to_numpy(v)
+            for v, null in zip(array, nulls)
+        ], dtype='datetime64[us]')
+    if isinstance(sample, datetime.date):
+        return numpy.array([
+            numpy.datetime64('NaT') if null else v
+            for v, null in zip(array, nulls)
+        ], dtype='datetime64[D]')
+    return array
+
+
+def _to_numpy(value):
+    """
+    Convert a query value to a value comparable with the columns.
+    """
+    if isinstance(value, (list, tuple)):
+        return [_to_numpy(v) for v in value]
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = value.astimezone(datetime.timezone.utc)
+        return numpy.datetime64(value.replace(tzinfo=None), 'us')
+    if isinstance(value, datetime.date):
+        return numpy.datetime64(value, 'D')
+    return value
+
+
+def _isnull(array):
+    kind = array.dtype.kind
+    if kind in 'mM':
+        return numpy.isnat(array)
+    if kind == 'f':
+        return numpy.isnan(array)
+    if kind == 'O':
+        # Missing values may be None or NaN (which is not equal to itself)
+        return numpy.equal(array, None) | numpy.not_equal(array, array)
+    return numpy.zeros(array.shape, dtype=bool)
+
+
+def _localize(array):
+    """
+    Convert a UTC datetime64 array to the current time zone. The UTC offset is
+    computed once per distinct hour instead of once per value.
+    """
+    if array.dtype.kind != 'M' or numpy.datetime_data(array.dtype)[0] == 'D':
+        return array
+    tz = timezone.get_current_timezone()
+    hours, inverse = numpy.unique(
+        array.astype('datetime64[h]'), return_inverse=True,
+    )
+    offsets = numpy.array([
+        0 if numpy.isnat(h) else _utcoffset(h, tz) for h in hours
+    ], dtype='int64').astype('timedelta64[s]')
+    return array + offsets[inverse.reshape(array.shape)]
+
+
+def _utcoffset(value, tz):
+    value = value.astype('datetime64[s]').astype(datetime.datetime)
+    value = value.replace(tzinfo=datetime.timezone.utc).astimezone(tz)
+    return int(value.utcoffset().total_seconds())
+
+
+def _days(array):
+    return array.astype('datetime64[D]').astype('int64')
+
+
+def _iso_calendar(array):
+    """
+    Compute the ISO year and week for each value.
+    """
+    days = _days(array)
+    # The thursday in the same ISO week determines the ISO year
+    thursday = days - (days + 3) % 7 + 3
+    year = thursday.astype('datetime64[D]').astype('datetime64[Y]')
+    first = _days(year)
+    return year.astype('int64') + 1970, (thursday - first) // 7 + 1
+
+
+TRANSFORMS = {
+    'year': lambda a: a.astype('datetime64[Y]').astype('int64') + 1970,
+    'iso_year': lambda a: _iso_calendar(a)[0],
+    'quarter': lambda a: a.astype('datetime64[M]').astype('int64') % 12 // 3 + 1,
+    'month': lambda a: a.astype('datetime64[M]').astype('int64') % 12 + 1,
+    'week': lambda a: _iso_calendar(a)[1],
+    'week_day': lambda a: (_days(a) + 4) % 7 + 1,
+    'iso_week_day': lambda a: (_days(a) + 3) % 7 + 1,
+    'day': lambda a: (a.astype('datetime64[D]')
+                      - a.astype('datetime64[M]')).astype('int64') + 1,
+    'hour': lambda a: (a.astype('datetime64[h]')
+                       - a.astype('datetime64[D]')).astype('int64'),
+    'minute': lambda a: (a.astype('datetime64[m]')
+                         - a.astype('datetime64[h]')).astype('int64'),
+    'second': lambda a: (a.astype('datetime64[s]')
+                         - a.astype('datetime64[m]')).astype('int64'),
+    'date': lambda a: a.astype('datetime64[D]'),
+}
+
+
+def _strings(array, lower=False):
+    if array.dtype.kind != 'U':
+        array = array.astype(str)
+    return numpy.char.lower(array) if lower else array
+
+
+LOOKUPS = {
+    'exact': lambda a, v: a == v,
+    'iexact': lambda a, v: _strings(a, True) == str(v).lower(),
+    'gt': lambda a, v: a > v,
+    'gte': lambda a, v: a >= v,
+    'lt': lambda a, v: a < v,
+    'lte': lambda a, v: a <= v,
+    'in': lambda a, v: numpy.isin(a, v),
+    'contains': lambda a, v: numpy.char.find(_strings(a), str(v)) >= 0,
+    'icontains': lambda a, v: numpy.char.find(
+        _strings(a, True), str(v).lower()
+    ) >= 0,
+    'startswith': lambda a, v: numpy.char.startswith(_strings(a), str(v)),
+    'istartswith': lambda a, v: numpy.char.startswith(
+        _strings(a, True), str(v).lower()
+    ),
+    'endswith': lambda a, v: numpy.char.endswith(_strings(a), str(v)),
+    'iendswith': lambda a, v: numpy.char.endswith(
+        _strings(a, True), str(v).lower()
+    ),
+    'range': lambda a, v: (a >= v[0]) & (a <= v[1]),
+}
+
+
+class Columns:
+    """
+    Wrapper around a mapping of columns, caching the arrays, transformed arrays
+    and null masks computed during a single evaluation.
+    """
+
+    def __init__(self, columns):
+        _require_numpy()
+        self.columns = columns
+        self.cache = {}
+
+    def get(self, field):
+        """
+        Get the (transformed) values and null mask of the given query field.
+
+        :param field: The query field to get values for
+        :returns: A tuple of the values array and null mask array
+        """
+        name = field.model_name
+        if name not in self.cache:
+            if name in self.columns or not field.transforms:
+                self.cache[name] = self._get_array(name)
+            else:
+                path = LOOKUP_SEP.join(
+                    name.split(LOOKUP_SEP)[:-len(field.transforms)]
+                )
+                values, nulls = self._get_array(path)
+                values = _localize(values)
+                for transform in field.transforms:
+                    values = TRANSFORMS[transform](values)
+                self.cache[name] = (values, nulls)
+        return self.cache[name]
+
+    def _get_array(self, name):
+        key = ('array', name)
+        if key not in self.cache:
+            if name not in self.columns:
+                raise KeyError('Missing column: %s' % name)
+            self.cache[key] = _as_array(self.columns[name])
+        return self.cache[key]
+
+
+def compile_lookup(field, lookup, value):
+    """
+    Compile a function computing the mask of the rows matching a lookup on the
+    given field.
+
+    :param field: The query field to look up
+    :param lookup: The name of the lookup
+    :param value: The query value, as returned by Field.to_python
+    :returns: A function taking a Columns object and returning a boolean array
+    """
+    _require_numpy()
+
+    # JSON documents are not columns of scalars
+    if field.value_type == 'json':
+        raise ValueError('Unsupported field for vectorized evaluation: json')
+
+    for transform in field.transforms:
+        if transform not in TRANSFORMS:
+            raise ValueError(
+                'Unsupported transform for vectorized evaluation: %s' %
+                transform
+            )
+
+    # Like Django, treat exact lookups against None as 'isnull'
+    if lookup in ('exact', 'iexact') and value is None:
+        lookup, value = 'isnull', True
+
+    if lookup == 'isnull':
+        expected = bool(value)
+
+        def mask(columns):
+            _, nulls = columns.get(field)
+            return nulls.copy() if expected else ~nulls
+
+        return mask
+
+    if lookup not in LOOKUPS:
+        raise ValueError(
+            'Unsupported lookup for vectorized evaluation: %s' % lookup
+        )
+    test = LOOKUPS[lookup]
+    value = _to_numpy(value)
+
+    def mask(columns):
+        values, nulls = columns.get(field)
+        result = numpy.asarray(test(values, value), dtype=bool)
+        result &= ~nulls
+        return result
+
+    return mask
+
+
+def compile_all(masks):
+    """
+    Combine mask functions so that all of them must match. Evaluation stops as
+    soon as no rows are left.
+    """
+    def mask(columns):
+        result = masks[0](columns)
+        for m in masks[1:]:
+            if not result.any():
+                break
+            result &= m(columns)
+        return result
+
+    return mask
+
+
+def compile_any(masks):
+    """
+    Combine mask functions so that any of them must match. Evaluation stops as
+    soon as all rows match.
+    """
+    def mask(columns):
+        result = masks[0](columns)
+        for m in masks[1:]:
+            if result.all():
+                break
+            result |= m(columns)
+        return result
+
+    return mask
@@ -22,7 +22,7 @@ os.chdir(os.path.normpath(os.path.join(os.path.abspath(__file__), os.pardir)))
 setup(
     name='django-json-queries',
     version=version,
-    packages=find_packages(exclude=['tests*']),
+    packages=find_packages(exclude=['tests*', 'benchmarks*']),
     include_package_data=True,
     license='MIT License',
     description='A Django app for processing complex model queries from JSON.',
@@ -30,6 +30,8 @@ setup(
     url='https://github.com/mkonline/django-json-queries/',
     author='Sigurd Ljødal',
     author_email='slj@mkonline.com',
+    python_requires='>=3.6',
+    install_requires=['Django>=3.2'],
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
         'Environment :: Web Environment',
@@ -37,11 +39,13 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
         'Framework :: Django',
-        'Framework :: Django :: 1.11',
+        'Framework :: Django :: 3.2',
+        'Framework :: Django :: 4.2',
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
     ],
 )
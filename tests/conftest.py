@@ -16,16 +16,30 @@ def test_products(db):
     Product.objects.create(
         name='Green left sock',
         released=date(2017,1,1),
+        price=5.0,
+        attributes={
+            'color': 'green',
+            'sizes': [38, 40],
+            'material': {'cotton': 80},
+        },
         manufacturer=m1,
     )
     Product.objects.create(
         name='Blue right sock',
         released=date(2016,6,1),
+        price=5.0,
+        attributes={
+            'color': 'blue',
+            'sizes': [40],
+            'material': {'cotton': 100},
+        },
         manufacturer=m1,
     )
     Product.objects.create(
         name='Red sock pair',
         released=date(2017,6,1),
+        price=8.0,
+        attributes={'color': 'red', 'sizes': [38, 40, 42], 'pair': True},
         manufacturer=m1,
     )
 
@@ -33,5 +47,7 @@ def test_products(db):
     Product.objects.create(
         name='Blue pants',
         released=date(2017,6,1),
+        price=30.0,
+        attributes={'color': 'blue', 'sizes': [], 'material': {'denim': 100}},
         manufacturer=m2,
     )
@@ -6,6 +6,8 @@ class Manufacturer(models.Model):
 
 
 class Product(models.Model):
-    name = models.CharField(max_length=128)
+    name = models.CharField(max_length=128, db_index=True)
     released = models.DateField()
+    price = models.FloatField(null=True)
+    attributes = models.JSONField(default=dict)
     manufacturer = models.ForeignKey(Manufacturer, on_delete=models.CASCADE)
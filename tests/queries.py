@@ -10,5 +10,6 @@ class ProductQuery(Query):
             'name',
             'released',
             'released__year',
+            'price',
             'manufacturer__name',
         ]
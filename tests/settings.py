@@ -3,6 +3,10 @@ DATABASES = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
     },
+    'other': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
 }
 
 INSTALLED_APPS = (
@@ -13,6 +17,18 @@ INSTALLED_APPS = (
     'tests',
 )
 
+# A cache standing in for a cache shared by several processes (e.g. Redis),
+# accessed through separate instances
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+}
+
 MIDDLEWARE = []
 
 ROOT_URLCONF = 'tests.urls'
@@ -0,0 +1,91 @@
+import pytest
+
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+def aggregate(query, **block):
+    query = dict(query, aggregate=block)
+    return ProductQuery(query)
+
+
+ALL = lookup('released__year', 'gte', 2000)
+
+
+def test_aggregate_without_group_by(test_products):
+    q = aggregate(ALL, values={
+        'products': {'function': 'count'},
+        'total': {'function': 'sum', 'field': 'price'},
+        'cheapest': {'function': 'min', 'field': 'price'},
+    })
+    assert q.is_valid
+    assert q.get_aggregates() == [
+        {'products': 4, 'total': 48.0, 'cheapest': 5.0},
+    ]
+
+
+def test_aggregate_group_by_related_field(test_products):
+    q = aggregate(ALL, group_by=['manufacturer__name'], values={
+        'products': {'function': 'count'},
+        'average_price': {'function': 'avg', 'field': 'price'},
+    })
+    assert q.get_aggregates() == [
+        {'manufacturer__name': 'Manufacturer 1', 'products': 3,
+         'average_price': 6.0},
+        {'manufacturer__name': 'Manufacturer 2', 'products': 1,
+         'average_price': 30.0},
+    ]
+
+
+def test_aggregate_group_by_transform(test_products):
+    q = aggregate(
+        lookup('name', 'icontains', 'sock'),
+        group_by=['released__year', 'manufacturer__name'],
+        values={'most_expensive': {'function': 'max', 'field': 'price'}},
+    )
+    assert q.get_aggregates() == [
+        {'released__year': 2016, 'manufacturer__name': 'Manufacturer 1',
+         'most_expensive': 5.0},
+        {'released__year': 2017, 'manufacturer__name': 'Manufacturer 1',
+         'most_expensive': 8.0},
+    ]
+
+
+def test_aggregate_is_single_query(test_products, django_assert_num_queries):
+    q = aggregate(ALL, group_by=['released__year'], values={
+        'products': {'function': 'count'},
+    })
+    with django_assert_num_queries(1):
+        q.get_aggregates()
+
+
+def test_query_without_aggregate_block():
+    q = ProductQuery(ALL)
+    assert q.is_valid
+    assert q.aggregation is None
+
+
+@pytest.mark.parametrize('block', [
+    # Undeclared fields
+    {'group_by': ['manufacturer'], 'values': {'n': {'function': 'count'}}},
+    {'values': {'n': {'function': 'sum', 'field': 'id'}}},
+    # Non-numeric fields
+    {'values': {'n': {'function': 'sum', 'field': 'name'}}},
+    {'values': {'n': {'function': 'avg', 'field': 'released'}}},
+    # Unknown function, or missing field
+    {'values': {'n': {'function': 'median', 'field': 'price'}}},
+    {'values': {'n': {'function': 'sum'}}},
+    # Invalid or conflicting names
+    {'values': {'price': {'function': 'count'}}},
+    {'values': {'_n': {'function': 'count'}}},
+    {'values': {'a b': {'function': 'count'}}},
+    {'group_by': ['name'], 'values': {'name': {'function': 'count'}}},
+    # Malformed blocks
+    {'values': {}},
+    {'group_by': 'name', 'values': {'n': {'function': 'count'}}},
+    {'values': {'n': 'count'}},
+    {'values': {'n': {'function': 'count'}}, 'order_by': ['n']},
+])
+def test_invalid_aggregate(block):
+    assert not aggregate(ALL, **block).is_valid
+
@@ -0,0 +1,90 @@
+import io
+
+import pyarrow
+import pyarrow.parquet
+import pytest
+
+from django_json_queries import arrow
+
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+QUERY = lookup('released__year', 'gte', 2000)
+
+
+def test_schema():
+    schema = arrow.get_schema(ProductQuery(QUERY), ['pk', 'name', 'released',
+                                                    'released__year', 'price'])
+    assert schema.types == [
+        pyarrow.int64(), pyarrow.string(), pyarrow.date32(), pyarrow.int64(),
+        pyarrow.float64(),
+    ]
+
+
+def test_schema_defaults_to_declared_fields():
+    schema = arrow.get_schema(ProductQuery(QUERY))
+    assert schema.names == ProductQuery._meta.fields
+
+
+def test_schema_unknown_field():
+    with pytest.raises(ValueError):
+        arrow.get_schema(ProductQuery(QUERY), ['weight'])
+
+
+def test_arrow_batches(test_products):
+    q = ProductQuery(QUERY)
+    batches = list(q.arrow_batches(['name', 'price'], chunk_size=3))
+    assert [b.num_rows for b in batches] == [3, 1]
+    table = pyarrow.Table.from_batches(batches)
+    assert sorted(table.column('price').to_pylist()) == [5.0, 5.0, 8.0, 30.0]
+
+
+def test_stream_arrow(test_products):
+    q = ProductQuery(QUERY)
+    data = b''.join(q.stream_arrow(['released', 'manufacturer__name'],
+                                   chunk_size=2))
+    table = pyarrow.ipc.open_stream(data).read_all()
+    assert table.num_rows == 4
+    assert table.schema == arrow.get_schema(
+        q, ['released', 'manufacturer__name'],
+    )
+    assert sorted(set(table.column('manufacturer__name').to_pylist())) == [
+        'Manufacturer 1', 'Manufacturer 2',
+    ]
+
+
+def test_stream_arrow_empty(test_products):
+    q = ProductQuery(lookup('released__year', 'lt', 1900))
+    table = pyarrow.ipc.open_stream(b''.join(q.stream_arrow())).read_all()
+    assert table.num_rows == 0
+
+
+def test_stream_arrow_closes_batches(test_products, monkeypatch):
+    closed = []
+
+    def iter_batches(*args):
+        try:
+            yield from batches(*args)
+        finally:
+            closed.append(True)
+
+    batches = arrow.iter_batches
+    monkeypatch.setattr(arrow, 'iter_batches', iter_batches)
+    stream = ProductQuery(QUERY).stream_arrow(chunk_size=1)
+    assert next(stream)
+    stream.close()
+    assert closed == [True]
+
+
+def test_write_parquet(test_products):
+    q = ProductQuery(QUERY)
+    sink = io.BytesIO()
+    assert q.write_parquet(sink, chunk_size=2) == 4
+    sink.seek(0)
+    parquet = pyarrow.parquet.ParquetFile(sink)
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert sorted(table.column('released__year').to_pylist()) == [
+        2016, 2017, 2017, 2017,
+    ]
@@ -0,0 +1,37 @@
+from asgiref.sync import async_to_sync
+
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+QUERY = lookup('released__year', 'exact', 2017)
+
+
+def test_aget_queryset(test_products):
+    q = ProductQuery(QUERY)
+    queryset = async_to_sync(q.aget_queryset)()
+    assert queryset.count() == 3
+
+
+def test_acount(test_products):
+    q = ProductQuery(QUERY)
+    assert async_to_sync(q.acount)() == 3
+
+
+def test_async_iteration(test_products):
+    async def collect(query):
+        return sorted([p.name async for p in query])
+
+    q = ProductQuery(QUERY)
+    assert async_to_sync(collect)(q) == [
+        'Blue pants', 'Green left sock', 'Red sock pair',
+    ]
+
+
+def test_astream(test_products):
+    async def collect(query):
+        return [p.pk async for p in query.astream(chunk_size=1)]
+
+    q = ProductQuery(QUERY)
+    pks = async_to_sync(collect)(q)
+    assert sorted(pks) == sorted(q.get_queryset().values_list('pk', flat=True))
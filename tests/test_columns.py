@@ -0,0 +1,65 @@
+import numpy
+import pytest
+
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+QUERY = lookup('released__year', 'gte', 2000)
+
+
+def test_fetch_columns(test_products):
+    q = ProductQuery(QUERY)
+    result = q.fetch_columns(['pk', 'released__year', 'price', 'released',
+                              'name'])
+    order = numpy.argsort(result['pk'])
+
+    assert result['pk'].dtype == numpy.int64
+    assert result['released__year'].dtype == numpy.int64
+    assert result['released__year'][order].tolist() == [2017, 2016, 2017, 2017]
+    assert result['price'].dtype == numpy.float64
+    assert sorted(result['price']) == [5.0, 5.0, 8.0, 30.0]
+    assert result['released'].dtype == numpy.dtype('datetime64[D]')
+    assert result['released'][order][0] == numpy.datetime64('2017-01-01')
+    assert result['name'].dtype == object
+    assert 'Green left sock' in result['name']
+
+
+def test_fetch_columns_chunks(test_products):
+    q = ProductQuery(QUERY)
+    chunked = q.fetch_columns(['pk', 'price'], chunk_size=1)
+    whole = q.fetch_columns(['pk', 'price'])
+    assert chunked['pk'].tolist() == whole['pk'].tolist()
+    assert chunked['price'].tolist() == whole['price'].tolist()
+
+
+def test_fetch_columns_nulls(test_products):
+    q = ProductQuery(QUERY)
+    ProductQuery(QUERY).get_queryset().filter(price=30.0).update(price=None)
+    price = q.fetch_columns(['price'])['price']
+    assert price.dtype == numpy.float64
+    assert numpy.isnan(price).sum() == 1
+
+
+def test_fetch_columns_empty(test_products):
+    q = ProductQuery(lookup('released__year', 'lt', 1900))
+    result = q.fetch_columns(['released__year', 'released'])
+    assert result['released__year'].shape == (0, )
+    assert result['released__year'].dtype == numpy.int64
+    assert result['released'].dtype == numpy.dtype('datetime64[D]')
+
+
+def test_fetch_columns_unknown_field(test_products):
+    with pytest.raises(ValueError):
+        ProductQuery(QUERY).fetch_columns(['weight'])
+
+
+def test_fetch_columns_converts_values(test_products):
+    from .test_json import AttributeQuery
+
+    # JSON values are decoded by the backend's converters, as with the ORM
+    q = AttributeQuery(lookup('name', 'exact', 'Blue pants'))
+    attributes = q.fetch_columns(['attributes'])['attributes']
+    assert attributes.tolist() == [
+        {'color': 'blue', 'sizes': [], 'material': {'denim': 100}},
+    ]
@@ -0,0 +1,88 @@
+import pytest
+
+from django_json_queries import Query
+
+from .models import Product
+from .queries import ProductQuery
+from .test_predicates import QUERIES, lookup
+
+
+OR_QUERIES = [
+    {'kind': 'or', 'conditions': [
+        lookup('name', 'exact', 'Blue pants'),
+        lookup('released', 'lt', '2017-01-01'),
+    ]},
+    {'kind': 'or', 'conditions': [
+        lookup('name', 'exact', 'Blue pants'),
+        lookup('name', 'exact', 'Red sock pair'),
+        lookup('manufacturer__name', 'exact', 'Manufacturer 2'),
+    ]},
+    {'kind': 'and', 'conditions': [
+        lookup('released__year', 'exact', 2017),
+        {'kind': 'or', 'conditions': [
+            lookup('name', 'icontains', 'sock'),
+            lookup('manufacturer__name', 'exact', 'Manufacturer 2'),
+        ]},
+    ]},
+]
+
+
+@pytest.mark.parametrize('query', OR_QUERIES + QUERIES)
+def test_union_strategy(test_products, query):
+    expected = set(ProductQuery(query).get_queryset())
+
+    q = ProductQuery(query, or_strategy='union')
+    queryset = q.get_queryset()
+    assert set(queryset) == expected
+    assert queryset.count() == len(expected)
+    if any(c.kind == 'or' for c in q.condition.walk()):
+        assert 'UNION ALL' in str(queryset.query)
+
+
+class OrderedProductQuery(Query):
+    class Meta:
+        model = Product
+        queryset = Product.objects.order_by('-name')
+        fields = [
+            'name', 'released', 'released__year', 'manufacturer__name',
+        ]
+
+
+@pytest.mark.parametrize('query', OR_QUERIES)
+def test_union_strategy_ordered_queryset(test_products, query):
+    expected = list(OrderedProductQuery(query).get_queryset())
+    q = OrderedProductQuery(query, or_strategy='union')
+    assert list(q.get_queryset()) == expected
+
+
+@pytest.mark.parametrize('query,use_union', [
+    # Different columns, but 'released' is not indexed
+    (OR_QUERIES[0], False),
+    # Same column in both branches
+    ({'kind': 'or', 'conditions': [
+        lookup('name', 'exact', 'Blue pants'),
+        lookup('name', 'startswith', 'Red'),
+    ]}, False),
+    # Different columns, and each branch uses an indexed column
+    ({'kind': 'or', 'conditions': [
+        lookup('name', 'exact', 'Blue pants'),
+        {'kind': 'and', 'conditions': [
+            lookup('name', 'startswith', 'Red'),
+            lookup('released', 'lt', '2017-01-01'),
+        ]},
+    ]}, True),
+])
+def test_auto_strategy(query, use_union):
+    q = ProductQuery(query, or_strategy='auto')
+    assert q.condition.use_union() == use_union
+
+
+def test_conditions_have_no_instance_dict():
+    q = ProductQuery({'kind': 'or', 'conditions': [
+        {'kind': 'and', 'conditions': [
+            {'kind': 'lookup', 'field': 'name', 'lookup': 'exact',
+             'value': 'Blue pants'},
+        ]},
+    ]})
+    for condition in q.condition.walk():
+        assert not hasattr(condition, '__dict__')
@@ -0,0 +1,98 @@
+import json
+
+import cbor2
+import msgpack
+import numpy
+import pytest
+
+from django_json_queries import decoders
+
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+QUERY = {'kind': 'and', 'conditions': [
+    lookup('released__year', 'exact', 2017),
+    lookup('name', 'in', ['Blue pants', 'Red sock pair']),
+]}
+
+ENCODERS = {
+    'application/json': lambda d: json.dumps(d).encode('utf-8'),
+    'application/json; charset=utf-8': lambda d: json.dumps(d).encode('utf-8'),
+    'application/msgpack': msgpack.packb,
+    'application/cbor': cbor2.dumps,
+}
+
+
+def names(query):
+    return sorted(query.get_queryset().values_list('name', flat=True))
+
+
+@pytest.mark.parametrize('content_type', sorted(ENCODERS))
+def test_from_bytes(test_products, content_type):
+    body = ENCODERS[content_type](QUERY)
+    q = ProductQuery.from_bytes(body, content_type)
+    assert q.is_valid
+    assert names(q) == ['Blue pants', 'Red sock pair']
+
+
+def test_from_bytes_unsupported_content_type():
+    with pytest.raises(ValueError):
+        ProductQuery.from_bytes(b'<query/>', 'application/xml')
+
+
+def test_from_bytes_malformed_body():
+    assert not ProductQuery.from_bytes(b'{"kind": ', 'application/json').is_valid
+    assert not ProductQuery.from_bytes(b'\xc1', 'application/msgpack').is_valid
+
+
+def test_copy_false_resolves_in_place():
+    document = json.loads(json.dumps(QUERY))
+    q = ProductQuery(document, copy=False)
+    assert q.is_valid
+    assert 'kind' not in document
+
+
+def test_register_decoder(test_products):
+    decoders.register_decoder(
+        'text/x-name', lambda body: lookup('name', 'exact', body.decode()),
+    )
+    q = ProductQuery.from_bytes(b'Blue pants', 'text/x-name')
+    assert names(q) == ['Blue pants']
+
+
+def typed_array(tag, values, dtype):
+    return cbor2.CBORTag(tag, numpy.asarray(values, dtype=dtype).tobytes())
+
+
+def test_cbor_typed_array(test_products):
+    body = cbor2.dumps(lookup(
+        'price', 'in', typed_array(86, [5.0, 8.0, 100.0], '<f8'),
+    ))
+    q = ProductQuery.from_bytes(body, 'application/cbor')
+    assert isinstance(q.condition.value, numpy.ndarray)
+    assert q.is_valid
+    assert names(q) == ['Blue right sock', 'Green left sock', 'Red sock pair']
+
+    predicate = q.compile_predicate()
+    assert predicate({'price': 8.0})
+    assert not predicate({'price': 30.0})
+
+    mask = q.compile_mask()({'price': numpy.array([5.0, 30.0, numpy.nan])})
+    assert mask.tolist() == [True, False, False]
+
+    # The normalized document only consists of JSON types
+    document = json.loads(json.dumps(q.to_dict()))
+    assert document == lookup('price', 'in', [5.0, 8.0, 100.0])
+
+
+def test_cbor_typed_array_big_endian():
+    decoded = decoders.decode(
+        cbor2.dumps(typed_array(74, [1, -2, 70000], '>i4')), 'application/cbor',
+    )
+    assert decoded.tolist() == [1, -2, 70000]
+
+
+def test_typed_array_of_wrong_type():
+    body = cbor2.dumps(lookup('name', 'in', typed_array(78, [1, 2], '<i4')))
+    assert not ProductQuery.from_bytes(body, 'application/cbor').is_valid
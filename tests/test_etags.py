@@ -0,0 +1,164 @@
+import datetime
+
+import pytest
+
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.test import RequestFactory
+
+from django_json_queries import Query, etags
+
+from .models import Manufacturer, Product
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+QUERY = lookup('price', 'lt', 10)
+
+
+def render(query):
+    names = sorted(query.get_queryset().values_list('name', flat=True))
+    return JsonResponse({'names': names})
+
+
+def get(etag=None):
+    headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+    return RequestFactory().get('/products', **headers)
+
+
+def test_fingerprint():
+    a = ProductQuery({'kind': 'and', 'conditions': [QUERY]})
+    b = ProductQuery(QUERY)
+    assert etags.get_fingerprint(a) == etags.get_fingerprint(b)
+    assert etags.get_fingerprint(a) != etags.get_fingerprint(
+        ProductQuery(lookup('price', 'lt', 11))
+    )
+    assert etags.get_fingerprint(a) != etags.get_fingerprint(a, {'page': 2})
+
+
+def test_fingerprint_typed_arrays():
+    cbor2 = pytest.importorskip('cbor2')
+    numpy = pytest.importorskip('numpy')
+
+    def from_array(values):
+        data = numpy.asarray(values, dtype='<f8').tobytes()
+        body = cbor2.dumps(lookup('price', 'in', cbor2.CBORTag(86, data)))
+        return ProductQuery.from_bytes(body, 'application/cbor')
+
+    # Large arrays differing in a single element, which are abbreviated the
+    # same way when converted to strings
+    values = numpy.arange(5000, dtype='float64')
+    changed = values.copy()
+    changed[2500] = -1
+    a, b = from_array(values), from_array(changed)
+    assert str(a.condition.value) == str(b.condition.value)
+    assert etags.get_fingerprint(a) != etags.get_fingerprint(b)
+    assert etags.get_fingerprint(a) == etags.get_fingerprint(
+        ProductQuery(lookup('price', 'in', values.tolist()))
+    )
+
+
+def test_conditional_response(test_products, django_assert_num_queries):
+    response = ProductQuery(QUERY).conditional_response(get(), render)
+    assert response.status_code == 200
+    assert response['Cache-Control'] in ('private, no-cache',
+                                         'no-cache, private')
+    etag = response['ETag']
+
+    # The query is not run when the data has not changed
+    with django_assert_num_queries(0):
+        response = ProductQuery(QUERY).conditional_response(get(etag), render)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+
+    response = ProductQuery(lookup('price', 'lt', 6)).conditional_response(
+        get(etag), render,
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('change', [
+    lambda: Product.objects.filter(name='Red sock pair').get().save(),
+    lambda: Product.objects.filter(name='Blue pants').delete(),
+    lambda: Manufacturer.objects.create(name='Manufacturer 3'),
+])
+def test_changes_update_etag(test_products, change):
+    etag = ProductQuery(QUERY).get_etag()
+    change()
+    assert ProductQuery(QUERY).get_etag() != etag
+
+
+def test_bump(test_products):
+    etag = ProductQuery(QUERY).get_etag()
+    Product.objects.update(price=1.0)
+    assert ProductQuery(QUERY).get_etag() == etag
+    etags.bump(Product)
+    assert ProductQuery(QUERY).get_etag() != etag
+
+
+class VersionedProductQuery(Query):
+    class Meta:
+        model = Product
+        fields = ['name', 'price']
+        etag_version_field = 'price'
+        cache_control = {'max_age': 5, 'public': True}
+
+
+def test_version_field(test_products):
+    q = VersionedProductQuery(QUERY)
+    response = q.conditional_response(get(), render)
+    assert 'max-age=5' in response['Cache-Control']
+    etag = response['ETag']
+
+    Product.objects.filter(name='Blue pants').update(price=50.0)
+    assert VersionedProductQuery(QUERY).get_etag() != etag
+
+
+def test_invalid_version_field():
+    meta = type('Meta', (), {'model': Product, 'etag_version_field': 'x'})
+    with pytest.raises(RuntimeError):
+        type('InvalidQuery', (Query, ), {'__module__': __name__, 'Meta': meta})
+
+
+class SharedCacheProductQuery(Query):
+    class Meta:
+        model = Product
+        fields = ['name', 'price']
+        etag_cache = 'shared'
+
+
+def test_shared_cache(test_products):
+    etag = SharedCacheProductQuery(QUERY).get_etag()
+    assert SharedCacheProductQuery(QUERY).get_etag() == etag
+
+    # Another process bumping the generation through its own instance of the
+    # shared cache
+    other = caches.create_connection('shared')
+    other.set(etags.CACHE_KEY % 'tests.product', 'other', None)
+    assert SharedCacheProductQuery(QUERY).get_etag() != etag
+
+
+def test_invalid_etag_cache():
+    meta = type('Meta', (), {'model': Product, 'etag_cache': 'missing'})
+    with pytest.raises(RuntimeError):
+        type('InvalidQuery', (Query, ), {'__module__': __name__, 'Meta': meta})
+
+
+@pytest.mark.parametrize('duration, moved, changed', [
+    ('P-30D', datetime.timedelta(hours=1), False),
+    ('P-30D', datetime.timedelta(days=1), True),
+    ('P-1M', datetime.timedelta(days=1), True),
+    ('PT-1H', datetime.timedelta(minutes=1), False),
+    ('PT-1H', datetime.timedelta(hours=1), True),
+])
+def test_relative_dates(test_products, monkeypatch, duration, moved, changed):
+    query = lookup('released', 'gte', duration)
+    now = datetime.datetime(2018, 1, 1, 0, 0, 30, tzinfo=datetime.timezone.utc)
+    monkeypatch.setattr(etags.timezone, 'now', lambda: now)
+    etag = ProductQuery(query).get_etag()
+    assert ProductQuery(query).get_etag() == etag
+
+    now += moved
+    assert (ProductQuery(query).get_etag() != etag) == changed
+    # Documents without relative dates do not depend on the time
+    assert etags.get_time_version(ProductQuery(QUERY)) is None
@@ -0,0 +1,83 @@
+import pytest
+
+from .queries import ProductQuery
+from .test_predicates import QUERIES, lookup
+
+
+def test_evaluate_many_matches_orm(test_products, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        results = ProductQuery.evaluate_many(QUERIES)
+
+    assert len(results) == len(QUERIES)
+    for document, objects in zip(QUERIES, results):
+        expected = list(ProductQuery(document).get_queryset())
+        assert sorted(p.pk for p in objects) == sorted(p.pk for p in expected)
+
+
+def test_evaluate_many_shares_instances(test_products):
+    a, b = ProductQuery.evaluate_many([
+        lookup('name', 'exact', 'Blue pants'),
+        lookup('price', 'gte', 30),
+    ])
+    assert [p.name for p in a] == ['Blue pants']
+    assert a[0] is b[0]
+
+
+def test_evaluate_many_batches(test_products, django_assert_num_queries):
+    documents = [lookup('released__year', 'exact', 2017)] * 5
+    with django_assert_num_queries(3):
+        results = ProductQuery.evaluate_many(documents, batch_size=2)
+    assert [len(r) for r in results] == [3] * 5
+
+
+def test_evaluate_many_reverse_relation(test_products):
+    from django_json_queries import Query
+    from .models import Manufacturer
+
+    class ManufacturerQuery(Query):
+        class Meta:
+            model = Manufacturer
+            fields = ['name', 'product__name']
+
+    results = ManufacturerQuery.evaluate_many([
+        lookup('product__name', 'icontains', 'sock'),
+        lookup('product__name', 'icontains', 'blue'),
+    ])
+    assert [[m.name for m in r] for r in results] == [
+        ['Manufacturer 1'],
+        ['Manufacturer 1', 'Manufacturer 2'],
+    ]
+
+
+def test_evaluate_many_validates_all_documents(test_products,
+                                               django_assert_num_queries):
+    with django_assert_num_queries(0):
+        with pytest.raises(ValueError):
+            ProductQuery.evaluate_many([
+                lookup('name', 'exact', 'Blue pants'),
+                lookup('name', 'exact', 1),
+            ])
+
+
+@pytest.mark.parametrize('batch_size', [0, -1, 51, 2.0])
+def test_evaluate_many_invalid_batch_size(batch_size):
+    with pytest.raises(ValueError):
+        ProductQuery.evaluate_many([], batch_size=batch_size)
+
+
+def test_evaluate_many_rejects_aggregates(test_products,
+                                          django_assert_num_queries):
+    document = dict(
+        lookup('name', 'exact', 'Blue pants'),
+        aggregate={'values': {'products': {'function': 'count'}}},
+    )
+    assert ProductQuery(document).is_valid
+    with django_assert_num_queries(0):
+        with pytest.raises(ValueError):
+            ProductQuery.evaluate_many([
+                lookup('name', 'exact', 'Blue pants'), document,
+            ])
+
+
+def test_evaluate_many_empty():
+    assert ProductQuery.evaluate_many([]) == []
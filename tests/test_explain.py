@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from django_json_queries import explain
+
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+def test_explain(test_products):
+    q = ProductQuery({'kind': 'and', 'conditions': [
+        {'kind': 'and', 'conditions': [
+            lookup('name', 'startswith', 'Blue'),
+            lookup('released', 'gte', '2017-01-01'),
+        ]},
+        {'kind': 'or', 'conditions': [
+            lookup('manufacturer__name', 'exact', 'Manufacturer 2'),
+        ]},
+    ]})
+    result = q.explain()
+
+    assert result['query'] == {'kind': 'and', 'conditions': [
+        lookup('name', 'startswith', 'Blue'),
+        lookup('released', 'gte', '2017-01-01'),
+        lookup('manufacturer__name', 'exact', 'Manufacturer 2'),
+    ]}
+    assert result['sql'].startswith('SELECT')
+    assert result['params'] == ['Blue%', '2017-01-01', 'Manufacturer 2']
+    assert result['annotations'] == []
+
+    plan = result['plan']
+    assert plan['vendor'] == 'sqlite'
+    assert plan['nodes']
+    assert plan['indexes']
+    json.dumps(result)
+
+
+def test_explain_aggregate(test_products):
+    block = {'group_by': ['released__year'],
+             'values': {'products': {'function': 'count'}}}
+    q = ProductQuery(dict(lookup('price', 'gt', 10), aggregate=block))
+    result = q.explain()
+    assert result['query'] == dict(lookup('price', 'gt', 10), aggregate=block)
+    # The grouped query is explained
+    assert 'GROUP BY' in result['sql']
+    assert 'COUNT(' in result['sql']
+    assert [a['name'] for a in result['annotations']] == [
+        '_group_0', 'products',
+    ]
+
+
+def test_explain_aggregate_without_group_by(test_products):
+    block = {'values': {'total': {'function': 'sum', 'field': 'price'}}}
+    q = ProductQuery(dict(lookup('price', 'gt', 10), aggregate=block))
+    sql = q.explain()['sql']
+    assert sql.startswith('SELECT SUM(')
+    assert 'GROUP BY' not in sql
+
+
+def test_explain_analyze_unsupported(test_products):
+    with pytest.raises(ValueError):
+        ProductQuery(lookup('price', 'gt', 10)).explain(analyze=True)
+
+
+def test_explain_sequential_scan(test_products):
+    result = ProductQuery(lookup('price', 'gt', 10)).explain()
+    assert result['plan']['sequential_scans'] == ['tests_product']
+
+
+def test_parse_sqlite():
+    nodes = explain.parse_sqlite(
+        '3 0 0 SCAN tests_product\n'
+        '5 0 0 SEARCH tests_manufacturer USING INTEGER PRIMARY KEY (rowid=?)\n'
+        '7 0 0 SEARCH tests_product USING COVERING INDEX idx_name (name>?)\n'
+    )
+    assert [(n['operation'], n['relation'], n['index']) for n in nodes] == [
+        ('SCAN', 'tests_product', None),
+        ('SEARCH', 'tests_manufacturer', 'INTEGER PRIMARY KEY'),
+        ('SEARCH', 'tests_product', 'idx_name'),
+    ]
+
+
+def test_parse_postgresql():
+    nodes = explain.parse_postgresql(json.dumps([{'Plan': {
+        'Node Type': 'Hash Join',
+        'Total Cost': 10.5,
+        'Plans': [
+            {'Node Type': 'Seq Scan', 'Relation Name': 'tests_product',
+             'Filter': '(price > 10)'},
+            {'Node Type': 'Index Scan', 'Relation Name': 'tests_manufacturer',
+             'Index Name': 'tests_manufacturer_pkey'},
+        ],
+    }}]))
+    assert len(nodes) == 1
+    root = nodes[0]
+    assert root['operation'] == 'Hash Join'
+    assert root['total_cost'] == 10.5
+    scan, index = root['children']
+    assert explain._is_sequential_scan(scan)
+    assert scan['detail'] == '(price > 10)'
+    assert index['index'] == 'tests_manufacturer_pkey'
+    assert not explain._is_sequential_scan(index)
@@ -0,0 +1,89 @@
+import pytest
+
+from django.db import connections
+
+from django_json_queries import facets
+
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+QUERY = lookup('released__year', 'gte', 2000)
+
+EXPECTED = {
+    'manufacturer__name': [
+        {'value': 'Manufacturer 1', 'count': 3},
+        {'value': 'Manufacturer 2', 'count': 1},
+    ],
+    'released__year': [
+        {'value': 2017, 'count': 3},
+        {'value': 2016, 'count': 1},
+    ],
+    'price': [
+        {'value': 5.0, 'count': 2},
+        {'value': 8.0, 'count': 1},
+        {'value': 30.0, 'count': 1},
+    ],
+}
+
+
+def test_facets(test_products):
+    q = ProductQuery(QUERY)
+    assert q.facets(list(EXPECTED)) == EXPECTED
+
+
+def test_facets_limit(test_products):
+    q = ProductQuery(QUERY)
+    result = q.facets(['price', 'released__year'], limit=1)
+    assert result == {
+        'price': [{'value': 5.0, 'count': 2}],
+        'released__year': [{'value': 2017, 'count': 3}],
+    }
+
+
+def test_facets_filtered(test_products):
+    q = ProductQuery(lookup('name', 'icontains', 'sock'))
+    assert q.facets(['manufacturer__name']) == {
+        'manufacturer__name': [{'value': 'Manufacturer 1', 'count': 3}],
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_facets_concurrently(test_products):
+    assert not connections['default'].in_atomic_block
+    q = ProductQuery(QUERY)
+    assert q.facets(list(EXPECTED)) == EXPECTED
+
+
+def test_facets_unknown_field(test_products):
+    q = ProductQuery(QUERY)
+    with pytest.raises(ValueError):
+        q.facets(['manufacturer'])
+
+
+def test_facets_grouping_sets_sql():
+    # SQLite does not support GROUPING SETS, so only check the statement
+    columns = facets._get_columns(
+        ProductQuery, ['manufacturer__name', 'released__year'],
+    )
+    queryset = ProductQuery(QUERY).get_queryset()
+    sql, params = facets._get_grouping_sets_sql(
+        queryset, columns, 5, 'default',
+    )
+    assert 'GROUPING("_facet_0") AS "_grouping_0"' in sql
+    assert 'GROUP BY GROUPING SETS (("_facet_0"), ("_facet_1"))' in sql
+    assert sql.endswith('WHERE "_rank" <= %s ORDER BY "_rank"')
+    assert params[-1] == 5
+
+
+@pytest.mark.skipif(connections['default'].vendor not in
+                    facets.GROUPING_SETS_VENDORS,
+                    reason='Requires GROUPING SETS')
+def test_facets_grouping_sets(test_products):
+    q = ProductQuery(QUERY)
+    assert q.facets(list(EXPECTED)) == EXPECTED
+    result = q.facets(['price', 'released__year'], limit=1)
+    assert result == {
+        'price': [{'value': 5.0, 'count': 2}],
+        'released__year': [{'value': 2017, 'count': 3}],
+    }
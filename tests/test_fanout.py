@@ -0,0 +1,115 @@
+import pytest
+import threading
+import time
+
+from datetime import date
+from time import monotonic
+
+from django_json_queries.fanout import FanOutResults
+
+from .models import Manufacturer, Product
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+QUERY = lookup('released__year', 'exact', 2017)
+
+fanout_db = pytest.mark.django_db(
+    transaction=True, databases=['default', 'other'],
+)
+
+
+@pytest.fixture()
+def other_products(test_products):
+    m = Manufacturer.objects.using('other').create(name='Manufacturer 3')
+    for name, released in [
+        ('Yellow hat', date(2017, 3, 1)),
+        ('Black hat', date(2016, 3, 1)),
+        ('White scarf', date(2017, 12, 1)),
+    ]:
+        Product.objects.using('other').create(
+            name=name, released=released, manufacturer=m,
+        )
+
+
+def test_get_results_single_alias(test_products):
+    q = ProductQuery(QUERY)
+    results = q.get_results(order_by=['-name'])
+    assert [p.name for p in results] == [
+        'Red sock pair', 'Green left sock', 'Blue pants',
+    ]
+
+
+@fanout_db
+def test_get_results_unordered(other_products):
+    q = ProductQuery(QUERY)
+    results = q.get_results(using=['default', 'other'], chunk_size=1)
+    assert sorted(p.name for p in results) == [
+        'Blue pants', 'Green left sock', 'Red sock pair', 'White scarf',
+        'Yellow hat',
+    ]
+    assert results.completed == {'default', 'other'}
+    assert results.errors == {}
+
+
+@fanout_db
+@pytest.mark.parametrize('order_by, key, reverse', [
+    (['name'], lambda p: p.name, False),
+    (['-name'], lambda p: p.name, True),
+    (['released', 'name'], lambda p: (p.released, p.name), False),
+])
+def test_get_results_ordered(other_products, order_by, key, reverse):
+    q = ProductQuery(QUERY)
+    results = q.get_results(
+        using=['default', 'other'], order_by=order_by, chunk_size=1,
+    )
+    products = list(q.get_queryset()) + list(q.get_queryset().using('other'))
+    expected = [p.name for p in sorted(products, key=key, reverse=reverse)]
+    assert [p.name for p in results] == expected
+
+
+@fanout_db
+def test_get_results_failing_alias(other_products):
+    q = ProductQuery(QUERY)
+    results = q.get_results(using=['default', 'missing'], order_by=['name'])
+    assert [p.name for p in results] == [
+        'Blue pants', 'Green left sock', 'Red sock pair',
+    ]
+    assert results.completed == {'default'}
+    assert set(results.errors) == {'missing'}
+
+
+@fanout_db
+def test_get_results_timeout(other_products):
+    q = ProductQuery(QUERY)
+    results = q.get_results(
+        using=['default', 'other'], timeout={'other': 1e-9},
+    )
+    names = {p.name for p in results}
+    assert {'Blue pants', 'Green left sock', 'Red sock pair'} <= names
+    assert 'default' in results.completed
+    assert isinstance(results.errors['other'], TimeoutError)
+
+
+@fanout_db
+def test_timeout_aborts_statement(other_products):
+    # A statement running for much longer than the timeout
+    slow = Product.objects.extra(where=[
+        '(WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c '
+        'WHERE x < 1000000000) SELECT COUNT(*) FROM c) > 0'
+    ])
+    results = FanOutResults(slow, ['other'], timeout=0.2)
+    start = monotonic()
+    assert list(results) == []
+    assert isinstance(results.errors['other'], TimeoutError)
+
+    # The worker thread finishes once the database aborts the statement
+    while any(t.name.startswith('ThreadPoolExecutor') and t.is_alive()
+              for t in threading.enumerate()):
+        assert monotonic() - start < 10
+        time.sleep(0.05)
+
+
+def test_no_aliases():
+    with pytest.raises(ValueError):
+        FanOutResults(Product.objects.all(), [])
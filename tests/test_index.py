@@ -0,0 +1,157 @@
+import random
+
+from datetime import date, timedelta
+
+import pytest
+
+from django_json_queries.index import QueryIndex, IntervalTree, Interval
+
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+NAMES = ['sock %d' % i for i in range(50)]
+MANUFACTURERS = ['Manufacturer %d' % i for i in range(10)]
+
+
+def random_date(rand):
+    return date(2015, 1, 1) + timedelta(days=rand.randint(0, 1000))
+
+
+def random_leaf(rand):
+    choice = rand.randint(0, 6)
+    if choice == 0:
+        return lookup('name', 'exact', rand.choice(NAMES))
+    if choice == 1:
+        return lookup('name', 'in', rand.sample(NAMES, 3))
+    if choice == 2:
+        return lookup(
+            'released', rand.choice(['gt', 'gte', 'lt', 'lte']),
+            random_date(rand).isoformat(),
+        )
+    if choice == 3:
+        return lookup('released__year', 'in', rand.sample(range(2015, 2019), 2))
+    if choice == 4:
+        return lookup('manufacturer__name', 'exact', rand.choice(MANUFACTURERS))
+    if choice == 5:
+        return lookup('name', 'icontains', str(rand.randint(0, 9)))
+    return lookup('released__year', 'gte', rand.randint(2015, 2018))
+
+
+def random_query(rand, depth=0):
+    if depth > 1 or rand.random() < 0.4:
+        return random_leaf(rand)
+    return {
+        'kind': rand.choice(['and', 'or']),
+        'conditions': [
+            random_query(rand, depth + 1) for i in range(rand.randint(1, 3))
+        ],
+    }
+
+
+def random_row(rand):
+    return {
+        'name': rand.choice(NAMES),
+        'released': random_date(rand),
+        'manufacturer': {'name': rand.choice(MANUFACTURERS)},
+    }
+
+
+def test_index_matches_brute_force():
+    rand = random.Random(42)
+    index = QueryIndex(ProductQuery)
+    predicates = {}
+    for i in range(300):
+        query = ProductQuery(random_query(rand))
+        index.add(i, query)
+        predicates[i] = query.compile_predicate()
+    assert len(index) == 300
+
+    for i in range(300):
+        row = random_row(rand)
+        expected = {key for key, p in predicates.items() if p(row)}
+        assert index.match(row) == expected
+
+
+def test_index_prunes_candidates():
+    rand = random.Random(1)
+    index = QueryIndex(ProductQuery)
+    for i in range(1000):
+        index.add(i, {'kind': 'and', 'conditions': [
+            lookup('name', 'exact', rand.choice(NAMES)),
+            lookup('released', 'gte', random_date(rand).isoformat()),
+        ]})
+
+    row = random_row(rand)
+    assert len(index.candidates(row)) < 100
+    assert index.match(row) <= index.candidates(row)
+
+
+def test_index_remove():
+    index = QueryIndex(ProductQuery)
+    index.add('a', lookup('name', 'exact', 'sock 1'))
+    index.add('b', lookup('released', 'gte', '2017-01-01'))
+    row = {'name': 'sock 1', 'released': date(2017, 6, 1)}
+    assert index.match(row) == {'a', 'b'}
+
+    index.remove('a')
+    index.remove('b')
+    assert index.match(row) == set()
+    assert len(index) == 0
+
+
+def test_index_relative_dates():
+    index = QueryIndex(ProductQuery)
+    # Relative dates are datetimes, absolute dates are dates
+    index.add('a', {'kind': 'and', 'conditions': [
+        lookup('released', 'gte', 'P-36500D'),
+        lookup('released', 'lt', '2017-01-01'),
+    ]})
+    index.add('b', lookup('released', 'gte', '2017-01-01'))
+
+    assert index.match({'released': date(2016, 6, 1)}) == {'a'}
+    assert index.match({'released': date(2017, 6, 1)}) == {'b'}
+
+
+def test_index_invalid_query():
+    with pytest.raises(ValueError):
+        QueryIndex(ProductQuery).add(1, {})
+
+
+def test_interval_tree():
+    rand = random.Random(7)
+    tree = IntervalTree()
+    intervals = []
+    for i in range(500):
+        low, high = sorted([rand.randint(0, 1000), rand.randint(0, 1000)])
+        interval = Interval(
+            low if rand.random() > 0.1 else Interval().low,
+            high if rand.random() > 0.1 else Interval().high,
+            rand.random() > 0.5, rand.random() > 0.5, i,
+        )
+        intervals.append(interval)
+        tree.add(interval)
+
+    for value in range(-10, 1010, 7):
+        expected = {
+            i.key for i in intervals
+            if i.above_low(value) and i.below_high(value)
+        }
+        assert tree.search(value) == expected
+
+
+def test_index_json_key_path():
+    from .test_json import AttributeQuery
+
+    index = QueryIndex(AttributeQuery)
+    index.add(1, lookup('attributes__color', 'exact', 'green'))
+    index.add(2, lookup('attributes__material__cotton', 'exact', 100))
+    index.add(3, lookup('attributes', 'has_key', 'pair'))
+
+    # Key path lookups are anchored on the value at the key path
+    assert index.candidates({'attributes': {'color': 'blue'}}) == {3}
+    assert index.match({'attributes': {'color': 'green'}}) == {1}
+    assert index.match({
+        'attributes': {'color': 'red', 'material': {'cotton': 100}},
+    }) == {2}
+    assert index.match({'attributes': {'pair': True, 'sizes': [38]}}) == {3}
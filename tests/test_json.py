@@ -0,0 +1,123 @@
+import pytest
+
+from django_json_queries import Query, fields
+from django_json_queries.lookups import JSONContains
+from django_json_queries.predicates import json_contains
+
+from .models import Product
+from .test_predicates import lookup
+
+
+class AttributeQuery(Query):
+    class Meta:
+        model = Product
+        fields = [
+            'name',
+            'attributes',
+            'attributes__color',
+            'attributes__material__cotton',
+        ]
+
+
+def names(document):
+    q = AttributeQuery(document)
+    assert q.is_valid
+    return sorted(q.get_queryset().values_list('name', flat=True))
+
+
+def test_json_field():
+    field = AttributeQuery.attributes__color
+    assert isinstance(field, fields.JSONField)
+    assert field.transforms == ('color', )
+    assert sorted(field.lookups) == [
+        'contains', 'exact', 'has_any_keys', 'has_key', 'has_keys', 'isnull',
+    ]
+
+
+@pytest.mark.parametrize('name', [
+    'attributes__0', 'attributes__has_key', 'attributes__color__contains',
+])
+def test_invalid_key_path(name):
+    with pytest.raises(ValueError):
+        AttributeQuery.get_field(name)
+
+
+@pytest.mark.parametrize('document, expected', [
+    (lookup('attributes', 'contains', {'color': 'blue'}),
+     ['Blue pants', 'Blue right sock']),
+    (lookup('attributes', 'contains', {'sizes': [42, 38]}),
+     ['Red sock pair']),
+    (lookup('attributes', 'contains', {'material': {'cotton': 100}}),
+     ['Blue right sock']),
+    (lookup('attributes', 'contains', {'pair': 1}), []),
+    (lookup('attributes__color', 'contains', 'red'), ['Red sock pair']),
+    (lookup('attributes__color', 'exact', 'green'), ['Green left sock']),
+    (lookup('attributes__material__cotton', 'exact', 80),
+     ['Green left sock']),
+    (lookup('attributes', 'has_key', 'pair'), ['Red sock pair']),
+    (lookup('attributes', 'has_keys', ['material', 'sizes']),
+     ['Blue pants', 'Blue right sock', 'Green left sock']),
+    (lookup('attributes', 'has_any_keys', ['pair', 'missing']),
+     ['Red sock pair']),
+    (lookup('attributes__material__cotton', 'isnull', True),
+     ['Blue pants', 'Red sock pair']),
+])
+def test_lookups(test_products, document, expected):
+    assert names(document) == expected
+
+
+@pytest.mark.parametrize('document, expected', [
+    (lookup('attributes', 'contains', {'sizes': [40]}),
+     ['Blue right sock', 'Green left sock', 'Red sock pair']),
+    (lookup('attributes__material__cotton', 'exact', 100),
+     ['Blue right sock']),
+    (lookup('attributes', 'has_any_keys', ['pair']), ['Red sock pair']),
+])
+def test_predicates(test_products, document, expected):
+    predicate = AttributeQuery(document).condition.get_predicate()
+    products = Product.objects.all()
+    assert sorted(p.name for p in products if predicate(p)) == expected
+
+
+def test_contains_key_path_uses_document():
+    q = AttributeQuery(lookup('attributes__material__cotton', 'contains', 80))
+    where = q.get_queryset().query.where.children[0]
+    assert where.lhs.target.name == 'attributes'
+    assert where.rhs == {'material': {'cotton': 80}}
+    assert isinstance(where, JSONContains)
+
+
+@pytest.mark.parametrize('document', [
+    lookup('attributes', 'contains', 'blue'),
+    lookup('attributes', 'contains', {1: 'blue'}),
+    lookup('attributes', 'contains', {'price': float('nan')}),
+    lookup('attributes', 'has_key', ''),
+    lookup('attributes', 'has_keys', []),
+    lookup('attributes', 'has_any_keys', ['color', 3]),
+    lookup('attributes', 'isnull', 'yes'),
+    lookup('attributes', 'icontains', 'blue'),
+])
+def test_invalid_values(document):
+    assert not AttributeQuery(document).is_valid
+
+
+@pytest.mark.parametrize('document, value, expected', [
+    ({'a': 1, 'b': 2}, {'a': 1}, True),
+    ({'a': [1, 2, 3]}, {'a': [3, 1]}, True),
+    ({'a': [1, 2]}, {'a': 1}, False),
+    ([1, 2], 1, True),
+    ([[1, 2]], [1], False),
+    ({'a': True}, {'a': 1}, False),
+    ('a', 'a', True),
+])
+def test_json_contains(document, value, expected):
+    assert json_contains(document, value) is expected
+
+
+def test_arrow_export(test_products):
+    q = AttributeQuery(lookup('attributes__color', 'exact', 'red'))
+    batch, = q.arrow_batches(['attributes', 'attributes__color'])
+    assert batch.column(0).to_pylist() == [
+        '{"color": "red", "sizes": [38, 40, 42], "pair": true}',
+    ]
+    assert batch.column(1).to_pylist() == ['"red"']
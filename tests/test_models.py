@@ -0,0 +1,85 @@
+import pytest
+
+from django_json_queries import etags
+from django_json_queries.models import SavedQuery, get_class_version
+
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+DOCUMENT = {
+    'kind': 'and',
+    'conditions': [lookup('price', 'lt', 10), lookup('name', 'icontains', 'sock')],
+}
+
+
+def test_create(db):
+    saved = SavedQuery.create(ProductQuery, DOCUMENT, name='cheap socks')
+    saved.refresh_from_db()
+
+    assert str(saved) == 'cheap socks'
+    assert saved.query_class == 'tests.queries.ProductQuery'
+    assert saved.document == DOCUMENT
+    assert saved.normalized == ProductQuery(DOCUMENT).to_dict()
+    assert saved.fingerprint == etags.get_fingerprint(ProductQuery(DOCUMENT))
+    assert saved.class_version == get_class_version(ProductQuery)
+    assert saved.execution_count == 0
+
+    # Saved queries of the same document can be found by fingerprint
+    SavedQuery.create(ProductQuery, DOCUMENT)
+    assert SavedQuery.objects.filter(fingerprint=saved.fingerprint).count() == 2
+
+
+@pytest.mark.parametrize('document', [
+    None,
+    lookup('price', 'lt', 'cheap'),
+    lookup('unknown', 'exact', 1),
+])
+def test_create_invalid(db, document):
+    with pytest.raises(ValueError):
+        SavedQuery.create(ProductQuery, document)
+    assert not SavedQuery.objects.exists()
+
+
+def test_get_query(db):
+    saved = SavedQuery.create(ProductQuery, DOCUMENT)
+    query = SavedQuery.objects.get(pk=saved.pk).get_query()
+
+    assert isinstance(query, ProductQuery)
+    assert query._trusted
+    assert query.is_valid
+
+    # Queries are validated again when their class has changed
+    saved.class_version = 'changed'
+    query = saved.get_query()
+    assert not query._trusted
+    assert query.is_valid
+
+
+def test_class_version():
+    class OtherQuery(ProductQuery):
+        class Meta:
+            model = ProductQuery._meta.model
+            lookups = {'string': ['exact']}
+
+    assert get_class_version(ProductQuery) == get_class_version(ProductQuery)
+    assert get_class_version(OtherQuery) != get_class_version(ProductQuery)
+
+
+def test_execute(test_products):
+    saved = SavedQuery.create(ProductQuery, lookup('price', 'lt', 10))
+    results = saved.execute()
+
+    expected = list(ProductQuery(lookup('price', 'lt', 10)).get_queryset())
+    assert results == expected
+    assert saved.execution_count == 1
+    assert saved.last_row_count == len(expected)
+    assert saved.last_executed is not None
+    assert saved.max_duration == saved.mean_duration > 0
+
+    duration = saved.mean_duration
+    saved.record_execution(duration + 2, 5)
+    assert saved.execution_count == 2
+    assert saved.last_row_count == 5
+    assert saved.mean_duration == pytest.approx(duration + 1)
+    assert saved.max_duration == pytest.approx(duration + 2)
@@ -0,0 +1,95 @@
+import warnings
+
+import pytest
+
+from django_json_queries import Query
+from django_json_queries.policy import (
+    ExpensiveLookupWarning, PREFIX, SCAN, get_cost,
+)
+
+from .models import Product
+from .test_predicates import lookup
+
+
+def make_query(**options):
+    meta = type('Meta', (), dict(model=Product, **options))
+    return type('PolicyQuery', (Query, ), {
+        '__module__': __name__,
+        'Meta': meta,
+    })
+
+
+FIELDS = ['name', 'price', 'released', 'released__year']
+
+
+def test_no_policy():
+    query = make_query(fields=FIELDS)
+    assert 'iregex' in query.name.lookups
+    assert query.name.rewrites == {}
+
+
+def test_lookups_by_value_type_and_field():
+    query = make_query(fields=FIELDS, lookups={
+        'string': ['exact', 'in', 'istartswith'],
+        'float': ['exact', 'lt', 'gt'],
+        'name': ['exact', 'istartswith'],
+    })
+    assert sorted(query.name.lookups) == ['exact', 'istartswith']
+    assert sorted(query.price.lookups) == ['exact', 'gt', 'lt']
+    assert 'iregex' in query.released.lookups
+
+    assert query(lookup('name', 'istartswith', 'blue')).is_valid
+    assert not query(lookup('name', 'icontains', 'blue')).is_valid
+    assert not query(lookup('price', 'gte', 5)).is_valid
+
+
+def test_rewrites(test_products):
+    query = make_query(
+        fields=FIELDS,
+        lookups={'name': ['exact', 'istartswith']},
+        lookup_rewrites={'name': {'icontains': 'istartswith'}},
+    )
+    q = query(lookup('name', 'icontains', 'blue'))
+    assert q.is_valid
+    assert q.condition.lookup == 'istartswith'
+    assert sorted(p.name for p in q.get_queryset()) == [
+        'Blue pants', 'Blue right sock',
+    ]
+
+
+@pytest.mark.parametrize('options', [
+    {'lookups': {'name': ['exact', 'unknown']}},
+    {'lookups': {'string': ['exact', 'unknown']}},
+    {'lookups': {'weight': ['exact']}},
+    {'lookups': {'colour': ['exact']}},
+    {'lookup_rewrites': {'name': {'icontains': 'unknown'}}},
+    {
+        'lookups': {'name': ['exact']},
+        'lookup_rewrites': {'name': {'icontains': 'istartswith'}},
+    },
+])
+def test_invalid_policy(options):
+    with pytest.raises(RuntimeError):
+        make_query(fields=FIELDS, **options)
+
+
+def test_expensive_lookup_warnings():
+    with pytest.warns(ExpensiveLookupWarning) as record:
+        make_query(fields=FIELDS, lookups={
+            'name': ['exact', 'icontains'],
+            'price': ['exact', 'istartswith'],
+        })
+    # Only the unindexed price field is reported
+    assert len(record) == 1
+    assert 'price: istartswith' in str(record[0].message)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        make_query(fields=FIELDS, lookups={'price': ['exact', 'lt']})
+
+
+def test_costs():
+    query = make_query(fields=FIELDS)
+    assert get_cost(query.name, 'exact') == 0
+    assert get_cost(query.name, 'istartswith') == PREFIX
+    assert get_cost(query.name, 'iregex') == SCAN
@@ -0,0 +1,72 @@
+import pytest
+
+from datetime import date
+
+from .models import Product
+from .queries import ProductQuery
+
+
+def lookup(field, lookup, value):
+    return {'kind': 'lookup', 'field': field, 'lookup': lookup, 'value': value}
+
+
+QUERIES = [
+    lookup('name', 'exact', 'Blue pants'),
+    lookup('name', 'iexact', 'blue PANTS'),
+    lookup('name', 'in', ['Blue pants', 'Red sock pair', 'Unknown']),
+    lookup('name', 'icontains', 'SOCK'),
+    lookup('name', 'contains', 'sock'),
+    lookup('name', 'startswith', 'Blue'),
+    lookup('name', 'iendswith', 'PAIR'),
+    lookup('name', 'regex', '^(Red|Green)'),
+    lookup('released', 'exact', '2017-06-01'),
+    lookup('released', 'gt', '2017-01-01'),
+    lookup('released', 'lte', '2017-01-01'),
+    lookup('released', 'in', ['2016-06-01', '2017-01-01']),
+    lookup('released__year', 'exact', 2017),
+    lookup('released__year', 'in', [2015, 2016]),
+    lookup('released__year', 'lt', 2017),
+    lookup('manufacturer__name', 'exact', 'Manufacturer 2'),
+    lookup('manufacturer__name', 'endswith', '1'),
+    {'kind': 'and', 'conditions': [
+        lookup('released__year', 'exact', 2017),
+        lookup('manufacturer__name', 'exact', 'Manufacturer 1'),
+    ]},
+    {'kind': 'or', 'conditions': [
+        lookup('name', 'icontains', 'pants'),
+        {'kind': 'and', 'conditions': [
+            lookup('released', 'lt', '2017-01-01'),
+            lookup('manufacturer__name', 'startswith', 'Manufacturer'),
+        ]},
+    ]},
+]
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_predicate_matches_orm(test_products, query):
+    q = ProductQuery(query)
+    assert q.is_valid
+
+    expected = set(q.get_queryset().values_list('pk', flat=True))
+    predicate = q.compile_predicate()
+
+    instances = Product.objects.select_related('manufacturer')
+    assert {p.pk for p in instances if predicate(p)} == expected
+
+    rows = Product.objects.values(
+        'pk', 'name', 'released', 'manufacturer__name',
+    )
+    assert {r['pk'] for r in rows if predicate(r)} == expected
+
+
+def test_predicate_nested_dict():
+    predicate = ProductQuery(QUERIES[-2]).compile_predicate()
+    assert predicate({
+        'released': date(2017, 3, 1),
+        'manufacturer': {'name': 'Manufacturer 1'},
+    })
+    assert not predicate({
+        'released': date(2016, 3, 1),
+        'manufacturer': {'name': 'Manufacturer 1'},
+    })
+    assert not predicate({'released': None, 'manufacturer': None})
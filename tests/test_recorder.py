@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from django.core.management import CommandError, call_command
+
+from django_json_queries import recorder
+
+from .queries import ProductQuery
+from .test_predicates import lookup
+
+
+QUERIES = [
+    lookup('price', 'lt', 10),
+    lookup('name', 'icontains', 'sock'),
+    {
+        'kind': 'lookup', 'field': 'price', 'lookup': 'gt', 'value': 0,
+        'aggregate': {'values': {'count': {'function': 'count'}}},
+    },
+]
+
+
+def record(path, sample_rate=1.0):
+    with recorder.Recorder(str(path), sample_rate=sample_rate) as r:
+        for document in QUERIES:
+            q = ProductQuery(document)
+            if q.aggregation is not None:
+                q.get_aggregates()
+            else:
+                list(q.get_queryset())
+    return r
+
+
+def test_recorder(test_products, tmp_path):
+    path = tmp_path / 'queries.jsonl.gz'
+    r = record(path)
+    records = list(recorder.read_records(str(path)))
+
+    assert r.recorded == len(records) == 3
+    assert records[0]['query'] == 'tests.queries.ProductQuery'
+    assert records[0]['document'] == QUERIES[0]
+    assert records[0]['duration'] >= 0
+    assert records[0]['rows'] == 3
+    # Aggregates are recorded with one row per group
+    assert records[2]['document']['aggregate']['values'] == {
+        'count': {'function': 'count'},
+    }
+    assert records[2]['rows'] == 1
+
+    # Queries are no longer recorded when stopped
+    list(ProductQuery(QUERIES[0]).get_queryset())
+    assert len(list(recorder.read_records(str(path)))) == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_replay(tmp_path):
+    path = tmp_path / 'queries.jsonl'
+    with open(str(path), 'w') as f:
+        for document in QUERIES:
+            f.write(json.dumps({
+                'query': 'tests.queries.ProductQuery',
+                'document': document,
+                'fingerprint': str(len(document)),
+            }) + '\n')
+        f.write(json.dumps({
+            'query': 'tests.queries.ProductQuery',
+            'document': lookup('price', 'lt', 'ten'),
+        }) + '\n')
+
+    results, elapsed = recorder.replay(
+        recorder.read_records(str(path)), concurrency=2,
+    )
+    summary = recorder.summarize(results, elapsed)
+    assert summary['queries'] == 4
+    assert summary['errors'] == 1
+    assert summary['error_messages'] == ['ValueError: Invalid query']
+    assert summary['latency']['p50'] <= summary['latency']['max']
+
+
+def test_compare():
+    baseline = {'fingerprints': {'a': 0.010, 'b': 0.010, 'c': 0.010}}
+    current = {'fingerprints': {'a': 0.030, 'b': 0.011, 'd': 1.0}}
+    assert recorder.compare(baseline, current, threshold=1.2) == [
+        ('a', 0.010, 0.030, pytest.approx(3.0)),
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_replay_queries_command(tmp_path, capsys):
+    path = tmp_path / 'queries.jsonl'
+    path.write_text(json.dumps({
+        'query': 'tests.queries.ProductQuery',
+        'document': QUERIES[0],
+        'fingerprint': 'abc',
+    }) + '\n')
+    baseline = tmp_path / 'baseline.json'
+    output = tmp_path / 'current.json'
+    baseline.write_text(json.dumps({'fingerprints': {'abc': 1e-9}}))
+
+    call_command('replay_queries', str(path), '--concurrency', '2',
+                 '--repeat', '3', '--output', str(output),
+                 '--baseline', str(baseline))
+    out = capsys.readouterr().out
+    assert 'Queries:    3' in out
+    assert 'Slowdowns:  1' in out
+    assert json.loads(output.read_text())['queries'] == 3
+
+
+@pytest.mark.parametrize('content', [None, '{"fingerprints":'])
+def test_replay_queries_invalid_baseline(tmp_path, content):
+    path = tmp_path / 'queries.jsonl'
+    path.write_text('')
+    baseline = tmp_path / 'baseline.json'
+    if content is not None:
+        baseline.write_text(content)
+
+    with pytest.raises(CommandError, match='Could not read'):
+        call_command('replay_queries', str(path), '--baseline', str(baseline))
@@ -0,0 +1,218 @@
+import pytest
+
+from django.db import models
+
+from django_json_queries import Query, replica
+from django_json_queries.signals import query_phase
+
+from .models import Manufacturer, Product
+from .test_predicates import QUERIES, lookup
+
+
+pytest.importorskip('numpy')
+
+
+def get_query_class(max_rows=100, ttl=None, **options):
+    class Meta:
+        model = Product
+        fields = ['name', 'released', 'released__year', 'price',
+                  'manufacturer__name']
+        replica_max_rows = max_rows
+        replica_ttl = ttl
+
+    for name, value in options.items():
+        setattr(Meta, name, value)
+    return type('ReplicatedProductQuery', (Query, ), {
+        '__module__': __name__, 'Meta': Meta,
+    })
+
+
+def pks(results):
+    return sorted(obj.pk for obj in results)
+
+
+@pytest.mark.parametrize('query', [
+    q for q in QUERIES if q.get('lookup') != 'regex'
+] + [
+    lookup('price', 'gt', 6),
+    lookup('price', 'in', [5, 30]),
+])
+def test_results_match_orm(test_products, django_assert_num_queries, query):
+    query_class = get_query_class()
+    q = query_class(query)
+    expected = pks(q.get_queryset())
+
+    # The snapshot is loaded with a single query, and used by later queries
+    with django_assert_num_queries(1):
+        assert pks(q.get_results()) == expected
+    with django_assert_num_queries(0):
+        results = query_class(query).get_results()
+    assert isinstance(results, list)
+    assert pks(results) == expected
+
+
+def test_objects(test_products, django_assert_num_queries):
+    q = get_query_class()(lookup('manufacturer__name', 'exact', 'Manufacturer 2'))
+    results = q.get_results()
+    assert results == list(q.get_queryset())
+    assert not hasattr(results[0], '_replica_0')
+
+
+def test_fallback(test_products, django_assert_num_queries):
+    query_class = get_query_class()
+    query_class(lookup('name', 'exact', 'x')).get_results()
+
+    # Lookups not supported by vectorized evaluation
+    results = query_class(lookup('name', 'regex', '^Red')).get_results()
+    assert isinstance(results, models.QuerySet)
+
+    # Ordered results, and results of other databases
+    results = query_class(lookup('name', 'exact', 'x')).get_results(
+        order_by=['name'],
+    )
+    assert isinstance(results, models.QuerySet)
+    results = query_class(lookup('name', 'exact', 'x')).get_results(
+        using='default',
+    )
+    assert isinstance(results, models.QuerySet)
+
+
+def test_too_large(test_products, django_assert_num_queries):
+    query_class = get_query_class(max_rows=3)
+    q = query_class(lookup('price', 'gt', 6))
+    results = q.get_results()
+    assert isinstance(results, models.QuerySet)
+    assert pks(results) == pks(q.get_queryset())
+
+    # The size is not checked again until the table changes
+    with django_assert_num_queries(0):
+        assert isinstance(q.get_results(), models.QuerySet)
+
+    Product.objects.filter(price__gt=10).delete()
+    assert isinstance(q.get_results(), list)
+
+
+def test_invalidated_on_change(test_products, django_assert_num_queries):
+    query_class = get_query_class()
+    q = query_class(lookup('manufacturer__name', 'exact', 'Manufacturer 3'))
+    assert q.get_results() == []
+
+    # Changes to the models of related fields invalidate the snapshot
+    Manufacturer.objects.filter(name='Manufacturer 2').update(
+        name='Manufacturer 3',
+    )
+    with django_assert_num_queries(0):
+        assert q.get_results() == []
+    replica.invalidate(Manufacturer)
+    with django_assert_num_queries(1):
+        assert [p.name for p in q.get_results()] == ['Blue pants']
+
+    manufacturer = Manufacturer.objects.create(name='Manufacturer 3')
+    product = Product.objects.create(
+        name='Scarf', released='2018-01-01', manufacturer=manufacturer,
+    )
+    assert pks(q.get_results()) == pks(q.get_queryset())
+    assert product.pk in pks(q.get_results())
+
+    # Nulls only match isnull lookups
+    q = query_class(lookup('price', 'lt', 10))
+    assert pks(q.get_results()) == pks(q.get_queryset())
+    assert product.pk not in pks(q.get_results())
+
+
+def test_ttl(test_products, monkeypatch):
+    query_class = get_query_class(ttl=10)
+    q = query_class(lookup('name', 'exact', 'Scarf'))
+    assert q.get_results() == []
+
+    Product.objects.filter(name='Blue pants').update(name='Scarf')
+    assert q.get_results() == []
+
+    now = replica.monotonic()
+    monkeypatch.setattr(replica, 'monotonic', lambda: now + 11)
+    assert [p.name for p in q.get_results()] == ['Scarf']
+
+
+def test_loading_elsewhere(test_products):
+    query_class = get_query_class()
+    query_class._meta.replica._lock.acquire()
+    try:
+        results = query_class(lookup('name', 'exact', 'x')).get_results()
+    finally:
+        query_class._meta.replica._lock.release()
+    assert isinstance(results, models.QuerySet)
+
+
+def test_scope(test_products):
+    query_class = get_query_class(scope=['manufacturer'])
+    manufacturer = Manufacturer.objects.get(name='Manufacturer 1')
+
+    q = query_class(lookup('price', 'lt', 6), scope={'manufacturer': manufacturer})
+    assert pks(q.get_results()) == pks(q.get_queryset())
+    assert len(q.get_results()) == 2
+
+    q = query_class(lookup('price', 'lt', 6), scope={
+        'manufacturer': manufacturer.pk + 1,
+    })
+    assert q.get_results() == []
+
+
+def test_results_are_copies(test_products, django_assert_num_queries):
+    query_class = get_query_class()
+    query = lookup('name', 'exact', 'Blue pants')
+    products = query_class(query).get_results()
+    products[0].name = 'Changed'
+
+    with django_assert_num_queries(0):
+        products = query_class(query).get_results()
+    assert [p.name for p in products] == ['Blue pants']
+    assert query_class(lookup('name', 'exact', 'Changed')).get_results() == []
+
+
+def test_instrumented(test_products, django_assert_num_queries):
+    received = []
+
+    def receiver(sender, query, phase, duration, nodes, **kwargs):
+        received.append((phase, nodes))
+
+    query_class = get_query_class()
+    query_class(lookup('name', 'exact', 'x')).get_results()
+    query_phase.connect(receiver)
+    try:
+        with django_assert_num_queries(0):
+            results = query_class(lookup('price', 'lt', 6)).get_results()
+    finally:
+        query_phase.disconnect(receiver)
+
+    # The replica is used while queries are instrumented
+    assert isinstance(results, list)
+    assert received == [('resolve', 1), ('validate', 1), ('execute', 2)]
+
+
+def test_not_enabled():
+    query_class = get_query_class(max_rows=None)
+    assert query_class._meta.replica is None
+
+
+@pytest.mark.parametrize('options, message', [
+    ({'replica_max_rows': 0}, 'invalid replica_max_rows'),
+    ({'replica_max_rows': '10'}, 'invalid replica_max_rows'),
+    ({'replica_ttl': -1}, 'invalid replica_ttl'),
+])
+def test_meta(options, message):
+    with pytest.raises(RuntimeError) as e:
+        get_query_class(**options)
+    assert message in str(e.value)
+
+
+def test_meta_multi_valued():
+    with pytest.raises(RuntimeError) as e:
+        type('ReplicatedManufacturerQuery', (Query, ), {
+            '__module__': __name__,
+            'Meta': type('Meta', (), {
+                'model': Manufacturer,
+                'fields': ['product__name'],
+                'replica_max_rows': 100,
+            }),
+        })
+    assert 'can not be replicated' in str(e.value)
@@ -0,0 +1,160 @@
+import datetime
+
+import pytest
+
+from django.db import connection, models
+
+from django_json_queries import Query
+
+from .models import Product
+from .test_predicates import lookup
+
+
+def and_(*conditions):
+    return {'kind': 'and', 'conditions': list(conditions)}
+
+
+def or_(*conditions):
+    return {'kind': 'or', 'conditions': list(conditions)}
+
+
+class ScopedProductQuery(Query):
+    class Meta:
+        model = Product
+        fields = ['name', 'released', 'price']
+        scope = ['manufacturer__name']
+        time_window = ('released', datetime.timedelta(days=366))
+
+
+WINDOW = [
+    lookup('released', 'gte', '2017-01-01'),
+    lookup('released', 'lt', '2018-01-01'),
+]
+
+SCOPE = {'manufacturer__name': 'Manufacturer 1'}
+
+
+def names(q):
+    return sorted(q.get_queryset().values_list('name', flat=True))
+
+
+def test_scope_is_injected(test_products):
+    q = ScopedProductQuery(and_(*WINDOW), scope=SCOPE)
+    assert q.is_valid
+    assert names(q) == ['Green left sock', 'Red sock pair']
+
+    q = ScopedProductQuery(
+        and_(*WINDOW), scope={'manufacturer__name': 'Manufacturer 2'},
+    )
+    assert names(q) == ['Blue pants']
+
+
+def test_missing_scope():
+    assert not ScopedProductQuery(and_(*WINDOW)).is_valid
+
+
+@pytest.mark.parametrize('document, valid', [
+    (and_(*WINDOW), True),
+    (lookup('released', 'exact', '2017-01-01'), True),
+    (and_(WINDOW[0], lookup('name', 'exact', 'Red sock pair'), WINDOW[1]),
+     True),
+    (and_(WINDOW[0], lookup('released', 'lte', '2018-01-03')), False),
+    (and_(lookup('released', 'gte', '2016-01-01'), WINDOW[1]), False),
+    (WINDOW[0], False),
+    (lookup('name', 'exact', 'Red sock pair'), False),
+    # Bounds nested in other conditions do not bound the whole query
+    (and_(or_(*WINDOW), WINDOW[0]), False),
+    (or_(and_(*WINDOW)), False),
+])
+def test_time_window(document, valid):
+    assert ScopedProductQuery(document, scope=SCOPE).is_valid == valid
+
+
+def test_scope_in_union_branches(test_products):
+    document = and_(*WINDOW, or_(
+        lookup('name', 'exact', 'Red sock pair'),
+        lookup('price', 'lt', 10),
+    ))
+    q = ScopedProductQuery(document, or_strategy='union', scope=SCOPE)
+    assert names(q) == ['Green left sock', 'Red sock pair']
+    # The outer query and both branches are scoped
+    assert q.explain()['params'].count('Manufacturer 1') == 3
+
+
+def test_evaluate_many_scope(test_products):
+    results = ScopedProductQuery.evaluate_many(
+        [and_(*WINDOW), and_(lookup('released', 'gte', '2016-01-01'),
+                             lookup('released', 'lt', '2017-01-01'))],
+        scope=SCOPE,
+    )
+    assert [sorted(p.name for p in r) for r in results] == [
+        ['Green left sock', 'Red sock pair'], ['Blue right sock'],
+    ]
+
+
+@pytest.mark.parametrize('options', [
+    {'scope': ['tenant']},
+    {'scope': ['name__tenant']},
+    {'time_window': ('name', datetime.timedelta(days=1))},
+    {'time_window': ('released', 1)},
+    {'time_window': 'released'},
+])
+def test_invalid_options(options):
+    meta = type('Meta', (), dict(model=Product, fields=['name', 'released'],
+                                 **options))
+    with pytest.raises(RuntimeError):
+        type('InvalidQuery', (Query, ), {'__module__': __name__, 'Meta': meta})
+
+
+class PartitionedEvent(models.Model):
+    tenant = models.IntegerField()
+    happened = models.DateTimeField()
+
+    class Meta:
+        app_label = 'tests'
+        managed = False
+        db_table = 'tests_partitioned_event'
+
+
+class PartitionedEventQuery(Query):
+    class Meta:
+        model = PartitionedEvent
+        fields = ['happened']
+        scope = ['tenant']
+        time_window = ('happened', datetime.timedelta(days=31))
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != 'postgresql',
+                    reason='Requires PostgreSQL partitioning')
+def test_partition_pruning():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TABLE tests_partitioned_event ('
+            'id serial, tenant integer NOT NULL, '
+            'happened timestamptz NOT NULL'
+            ') PARTITION BY LIST (tenant)'
+        )
+        for tenant in (1, 2):
+            cursor.execute(
+                'CREATE TABLE tests_partitioned_event_%d PARTITION OF '
+                'tests_partitioned_event FOR VALUES IN (%d)' % (tenant, tenant)
+            )
+
+    q = PartitionedEventQuery(
+        and_(lookup('happened', 'gte', '2018-01-01T00:00:00Z'),
+             lookup('happened', 'lt', '2018-01-31T00:00:00Z')),
+        scope={'tenant': 2},
+    )
+    assert q.is_valid
+    relations = {
+        n['relation'] for n in _walk(q.explain()['plan']['nodes'])
+        if n['relation']
+    }
+    assert relations == {'tests_partitioned_event_2'}
+
+
+def _walk(nodes):
+    for node in nodes:
+        yield node
+        yield from _walk(node['children'])
@@ -0,0 +1,63 @@
+import pytest
+
+from django_json_queries.signals import query_phase
+
+from .queries import ProductQuery
+
+
+QUERY = {
+    'kind': 'and',
+    'conditions': [
+        {
+            'kind': 'lookup',
+            'field': 'released__year',
+            'lookup': 'exact',
+            'value': 2017,
+        },
+        {
+            'kind': 'lookup',
+            'field': 'manufacturer__name',
+            'lookup': 'exact',
+            'value': 'Manufacturer 1',
+        },
+    ],
+}
+
+
+@pytest.fixture()
+def phases():
+    received = []
+
+    def receiver(sender, query, phase, duration, nodes, **kwargs):
+        received.append((sender, phase, duration, nodes))
+
+    query_phase.connect(receiver)
+    yield received
+    query_phase.disconnect(receiver)
+
+
+def test_query_phases(test_products, phases):
+    q = ProductQuery(QUERY)
+    results = list(q.get_queryset())
+    assert len(results) == 2
+
+    assert [p[1] for p in phases] == [
+        'resolve', 'validate', 'annotate', 'filter', 'execute',
+    ]
+    for sender, phase, duration, nodes in phases:
+        assert sender is ProductQuery
+        assert duration >= 0
+        assert nodes == (2 if phase == 'execute' else 3)
+
+
+def test_invalid_query_phases(phases):
+    q = ProductQuery({})
+    assert not q.is_valid
+    assert [(p[1], p[3]) for p in phases] == [('resolve', 0)]
+
+
+def test_no_listeners(test_products):
+    q = ProductQuery(QUERY)
+    queryset = q.get_queryset()
+    assert queryset._iterable_class.__name__ == 'ModelIterable'
+    assert queryset.count() == 2
@@ -0,0 +1,193 @@
+import pytest
+
+from django_json_queries import Query
+from django_json_queries.signals import query_phase
+
+from .models import Product
+from .queries import ProductQuery
+from .test_predicates import QUERIES, lookup
+
+
+class CachedProductQuery(Query):
+    class Meta:
+        model = Product
+        fields = [
+            'name',
+            'released',
+            'released__year',
+            'manufacturer__name',
+        ]
+        sql_cache_size = 64
+
+
+# Pairs of queries with the same shape, but different values
+VARIANTS = [
+    (lookup('name', 'exact', 'Blue pants'),
+     lookup('name', 'exact', 'Red sock pair')),
+    (lookup('name', 'icontains', 'SOCK'),
+     lookup('name', 'icontains', '%')),
+    (lookup('name', 'startswith', 'Blue'),
+     lookup('name', 'startswith', 'Green_')),
+    (lookup('name', 'in', ['Blue pants', 'Unknown']),
+     lookup('name', 'in', ['Red sock pair', 'Blue right sock'])),
+    (lookup('name', 'in', ['Blue pants', 'Blue pants', 'Unknown']),
+     lookup('name', 'in', ['Red sock pair', 'Blue right sock'])),
+    (lookup('released', 'gt', '2017-01-01'),
+     lookup('released', 'gt', '2016-01-01')),
+    (lookup('released__year', 'exact', 2017),
+     lookup('released__year', 'exact', 2016)),
+    (lookup('released__year', 'lt', 2017),
+     lookup('released__year', 'lt', 2018)),
+    ({'kind': 'or', 'conditions': [
+        lookup('name', 'icontains', 'pants'),
+        {'kind': 'and', 'conditions': [
+            lookup('released', 'lt', '2017-01-01'),
+            lookup('manufacturer__name', 'startswith', 'Manufacturer'),
+        ]},
+    ]}, {'kind': 'or', 'conditions': [
+        lookup('name', 'icontains', 'left'),
+        {'kind': 'and', 'conditions': [
+            lookup('released', 'lt', '2018-01-01'),
+            lookup('manufacturer__name', 'startswith', 'Manufacturer 2'),
+        ]},
+    ]}),
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    CachedProductQuery._meta.sql_cache.clear()
+
+
+def expected(query):
+    return sorted(ProductQuery(query).get_queryset().values_list('pk', flat=True))
+
+
+def results(query):
+    return sorted(p.pk for p in CachedProductQuery(query).get_results())
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_cached_results_match_orm(test_products, query):
+    # Both the first (compiling) and the second (cached) evaluation must match
+    assert results(query) == expected(query)
+    assert results(query) == expected(query)
+
+
+@pytest.mark.parametrize('first, second', VARIANTS)
+def test_bound_values_match_orm(test_products, first, second):
+    cache = CachedProductQuery._meta.sql_cache
+    assert results(first) == expected(first)
+    assert results(second) == expected(second)
+    assert cache.misses == 1
+    assert cache.hits == 1
+
+
+def test_different_shapes_are_cached_separately(test_products):
+    cache = CachedProductQuery._meta.sql_cache
+    results(lookup('name', 'in', ['Blue pants']))
+    results(lookup('name', 'in', ['Blue pants', 'Red sock pair']))
+    results(lookup('name', 'iexact', 'blue pants'))
+    assert cache.misses == 3
+    assert len(cache) == 3
+
+
+def test_cached_results_are_model_instances(test_products):
+    query = lookup('manufacturer__name', 'exact', 'Manufacturer 2')
+    results(query)
+    products = list(CachedProductQuery(query).get_results(order_by=['name']))
+    assert [p.name for p in products] == ['Blue pants']
+    assert products[0].manufacturer.name == 'Manufacturer 2'
+
+
+def test_ordering_is_part_of_shape(test_products):
+    query = lookup('released__year', 'exact', 2017)
+    names = [
+        [p.name for p in CachedProductQuery(query).get_results(order_by=o)]
+        for o in (['name'], ['-name'])
+    ]
+    assert names[0] == ['Blue pants', 'Green left sock', 'Red sock pair']
+    assert names[1] == list(reversed(names[0]))
+
+
+def test_invalid_sql_cache_size():
+    with pytest.raises(RuntimeError):
+        class InvalidQuery(Query):
+            class Meta:
+                model = Product
+                sql_cache_size = -1
+
+
+def test_instrumented(test_products):
+    received = []
+
+    def receiver(sender, query, phase, duration, nodes, **kwargs):
+        received.append((phase, nodes))
+
+    cache = CachedProductQuery._meta.sql_cache
+    query_phase.connect(receiver)
+    try:
+        for name in ['Blue pants', 'Red sock pair']:
+            assert [p.name for p in CachedProductQuery(
+                lookup('name', 'exact', name)
+            ).get_results()] == [name]
+    finally:
+        query_phase.disconnect(receiver)
+
+    # The cache is used while queries are instrumented, and the bound query
+    # reports its phases
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert received[-3:] == [('validate', 1), ('filter', 1), ('execute', 1)]
+
+
+def test_in_sizes_share_buckets(test_products, django_assert_num_queries):
+    cache = CachedProductQuery._meta.sql_cache
+    names = ['Blue pants', 'Red sock pair', 'Green left sock', 'Unknown']
+    for size in (3, 4, 3):
+        query = lookup('name', 'in', names[:size])
+        assert results(query) == expected(query)
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    # Lists of another bucket get their own template
+    results(lookup('name', 'in', names[:2]))
+    assert cache.misses == 2
+    assert len(cache) == 2
+
+
+class ScopedCachedProductQuery(Query):
+    class Meta:
+        model = Product
+        queryset = Product.objects.filter(price__gt=0)
+        fields = ['name', 'price']
+        scope = ['manufacturer__name']
+        sql_cache_size = 64
+
+
+def test_scope_is_bound(test_products):
+    cache = ScopedCachedProductQuery._meta.sql_cache
+    cache.clear()
+    query = lookup('price', 'lt', 100)
+    for manufacturer in ['Manufacturer 1', 'Manufacturer 2']:
+        q = ScopedCachedProductQuery(
+            query, scope={'manufacturer__name': manufacturer},
+        )
+        assert sorted(p.pk for p in q.get_results()) == sorted(
+            q.get_queryset().values_list('pk', flat=True)
+        )
+    assert (cache.hits, cache.misses, cache.uncacheable) == (1, 1, 0)
+
+
+@pytest.mark.parametrize('query', [
+    lookup('name', 'in', []),
+    {'kind': 'or', 'conditions': [
+        lookup('name', 'in', []),
+        lookup('name', 'exact', 'Blue pants'),
+    ]},
+])
+def test_empty_in_list(test_products, query):
+    cache = CachedProductQuery._meta.sql_cache
+    # Lookups that can never match are left out of the SQL, so the query is
+    # compiled normally
+    assert results(query) == expected(query)
+    assert results(query) == expected(query)
+    assert cache.uncacheable == 1
@@ -0,0 +1,170 @@
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from django_json_queries import Query
+from django_json_queries.models import get_class_version
+
+from .models import Manufacturer, Product
+from .test_predicates import lookup
+
+
+class ManufacturerQuery(Query):
+    class Meta:
+        model = Manufacturer
+        fields = ['name']
+
+
+class ProductQuery(Query):
+    class Meta:
+        model = Product
+        fields = ['name', 'price']
+        subqueries = {
+            'manufacturer': ManufacturerQuery,
+        }
+
+
+class ProductsQuery(Query):
+    class Meta:
+        model = Manufacturer
+        fields = ['name']
+        subqueries = {
+            'product': ProductQuery,
+        }
+
+
+def subquery(field, condition):
+    return {'kind': 'subquery', 'field': field, 'condition': condition}
+
+
+def names(q):
+    return sorted(q.get_queryset().values_list('name', flat=True))
+
+
+def test_in_subquery(test_products):
+    q = ProductQuery({
+        'kind': 'and',
+        'conditions': [
+            lookup('price', 'lt', 10),
+            subquery('manufacturer', lookup('name', 'exact', 'Manufacturer 1')),
+        ],
+    })
+    assert q.is_valid
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert names(q) == [
+            'Blue right sock', 'Green left sock', 'Red sock pair',
+        ]
+    assert len(ctx.captured_queries) == 1
+    sql = ctx.captured_queries[0]['sql']
+    assert '"manufacturer_id" IN (SELECT' in sql
+
+
+def test_exists_subquery(test_products):
+    q = ProductsQuery(subquery('product', lookup('price', 'gt', 10)))
+    assert q.is_valid
+    assert names(q) == ['Manufacturer 2']
+    assert 'EXISTS' in str(q.get_queryset().query)
+
+    # Rows are not duplicated when several related rows match
+    q = ProductsQuery(subquery('product', lookup('name', 'icontains', 's')))
+    assert names(q) == ['Manufacturer 1', 'Manufacturer 2']
+
+
+def test_nested_subquery(test_products):
+    q = ProductsQuery(subquery('product', subquery(
+        'manufacturer', lookup('name', 'exact', 'Manufacturer 1'),
+    )))
+    assert names(q) == ['Manufacturer 1']
+
+
+@pytest.mark.parametrize('document', [
+    subquery('manufacturer', lookup('unknown', 'exact', 1)),
+    subquery('manufacturer', lookup('name', 'exact', 1)),
+    subquery('manufacturer', {'kind': 'unknown'}),
+    subquery('manufacturer', None),
+    subquery('manufacturer', {
+        'kind': 'lookup', 'field': 'name', 'lookup': 'exact', 'value': 'x',
+        'aggregate': {'values': {'count': {'function': 'count'}}},
+    }),
+    subquery('unknown', lookup('name', 'exact', 'x')),
+    subquery(None, lookup('name', 'exact', 'x')),
+])
+def test_invalid(document):
+    assert not ProductQuery(document).is_valid
+
+
+def test_not_registered():
+    class OtherQuery(Query):
+        class Meta:
+            model = Product
+            fields = ['name']
+
+    assert OtherQuery.get_condition('subquery') is None
+    assert not OtherQuery(
+        subquery('manufacturer', lookup('name', 'exact', 'x'))
+    ).is_valid
+
+
+def test_to_dict():
+    document = subquery('manufacturer', {
+        'kind': 'and',
+        'conditions': [lookup('name', 'exact', 'x')],
+    })
+    assert ProductQuery(document).to_dict() == subquery(
+        'manufacturer', lookup('name', 'exact', 'x'),
+    )
+
+
+def test_scope(test_products):
+    class ScopedManufacturerQuery(Query):
+        class Meta:
+            model = Manufacturer
+            fields = ['name']
+            scope = ['name']
+
+    class ScopedProductQuery(Query):
+        class Meta:
+            model = Product
+            fields = ['name']
+            subqueries = {'manufacturer': ScopedManufacturerQuery}
+
+    document = subquery('manufacturer', lookup('name', 'startswith', 'Man'))
+    assert not ScopedProductQuery(document).is_valid
+
+    q = ScopedProductQuery(document, scope={'name': 'Manufacturer 2'})
+    assert q.is_valid
+    assert names(q) == ['Blue pants']
+
+
+def test_etag_models():
+    assert ProductQuery._meta.etag_models == [Manufacturer, Product]
+    assert ProductsQuery._meta.etag_models == [Manufacturer, Product]
+
+
+def test_class_version():
+    class OtherQuery(Query):
+        class Meta:
+            model = Product
+            fields = ['name', 'price']
+
+    assert get_class_version(OtherQuery) != get_class_version(ProductQuery)
+
+
+@pytest.mark.parametrize('subqueries, message', [
+    ({'unknown': ManufacturerQuery}, 'unknown relation'),
+    ({'name': ManufacturerQuery}, 'unknown relation'),
+    ({'manufacturer': object}, 'non-Query class'),
+    ({'manufacturer': ProductQuery}, 'Query of another model'),
+    ({'manufacturer__product': ProductQuery}, 'more than one relation'),
+])
+def test_meta(subqueries, message):
+    with pytest.raises(RuntimeError) as e:
+        type('InvalidQuery', (Query, ), {
+            '__module__': __name__,
+            'Meta': type('Meta', (), {
+                'model': Product, 'subqueries': subqueries,
+            }),
+        })
+    assert message in str(e.value)
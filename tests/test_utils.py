@@ -1,5 +1,7 @@
 import pytest
 
+from datetime import date, datetime
+
 from django_json_queries import utils
 
 
@@ -76,3 +78,15 @@ def test_is_datetime(value, is_valid):
     else:
         assert not utils.is_datetime(value), \
             '"%s" should not be a valid ISO8601 datetime' % value
+
+
+@pytest.mark.parametrize('value,duration,result', [
+    (date(2017, 1, 31), 'P1M', date(2017, 2, 28)),
+    (date(2016, 2, 29), 'P-1Y', date(2015, 2, 28)),
+    (date(2017, 1, 1), 'P-1D', date(2016, 12, 31)),
+    (date(2017, 1, 1), 'P1Y2M3D', date(2018, 3, 4)),
+    (datetime(2017, 1, 1), 'PT36H', datetime(2017, 1, 2, 12)),
+    (datetime(2017, 1, 1), 'P1WT-1M', datetime(2017, 1, 7, 23, 59)),
+])
+def test_add_duration(value, duration, result):
+    assert utils.add_duration(value, duration) == result
@@ -0,0 +1,109 @@
+import pytest
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import models
+from django.utils import timezone
+
+from django_json_queries import Query
+
+from .models import Product
+from .queries import ProductQuery
+from .test_predicates import QUERIES, lookup
+
+
+numpy = pytest.importorskip('numpy')
+
+
+def get_columns():
+    rows = list(Product.objects.values_list(
+        'pk', 'name', 'released', 'manufacturer__name',
+    ))
+    pks, names, released, manufacturers = zip(*rows)
+    return numpy.array(pks), {
+        'name': numpy.array(names, dtype=object),
+        'released': numpy.array(released, dtype=object),
+        'manufacturer__name': numpy.array(manufacturers, dtype=object),
+    }
+
+
+@pytest.mark.parametrize('query', [
+    q for q in QUERIES if q.get('lookup') != 'regex'
+])
+def test_mask_matches_orm(test_products, query):
+    q = ProductQuery(query)
+    expected = set(q.get_queryset().values_list('pk', flat=True))
+
+    pks, columns = get_columns()
+    mask = q.compile_mask()(columns)
+    assert mask.dtype == bool
+    assert set(pks[mask]) == expected
+
+
+class EventModel(models.Model):
+    name = models.CharField(max_length=32, null=True)
+    happened = models.DateTimeField(null=True)
+
+    class Meta:
+        app_label = 'tests'
+
+
+class EventQuery(Query):
+    class Meta:
+        model = EventModel
+        fields = [
+            'name',
+            'happened',
+            'happened__year',
+            'happened__month',
+            'happened__day',
+            'happened__week',
+            'happened__week_day',
+            'happened__hour',
+            'happened__minute',
+        ]
+
+
+EVENT_QUERIES = [
+    lookup('happened__year', 'exact', 2016),
+    lookup('happened__month', 'in', [1, 12]),
+    lookup('happened__day', 'gte', 28),
+    lookup('happened__week', 'in', [1, 52, 53]),
+    lookup('happened__week_day', 'exact', 1),
+    lookup('happened__hour', 'lt', 2),
+    lookup('happened__minute', 'exact', 30),
+    lookup('happened', 'gte', '2016-12-31T23:00:00Z'),
+    lookup('name', 'istartswith', 'EVENT 1'),
+    lookup('name', 'gt', 'event 5'),
+    {'kind': 'or', 'conditions': [
+        lookup('name', 'exact', 'event 3'),
+        lookup('happened__hour', 'exact', 23),
+    ]},
+]
+
+
+@pytest.mark.parametrize('tz', ['UTC', 'Europe/Oslo', 'America/New_York'])
+@pytest.mark.parametrize('query', EVENT_QUERIES)
+def test_mask_matches_predicate(query, tz):
+    pandas = pytest.importorskip('pandas')
+
+    start = datetime(2016, 12, 25, tzinfo=dt_timezone.utc)
+    events = [
+        {
+            'name': 'event %d' % i if i % 7 else None,
+            'happened': start + timedelta(minutes=97 * i) if i % 5 else None,
+        }
+        for i in range(200)
+    ]
+    frame = pandas.DataFrame({
+        'name': [e['name'] for e in events],
+        'happened': pandas.to_datetime(
+            [e['happened'] for e in events], utc=True,
+        ),
+    })
+
+    with timezone.override(tz):
+        q = EventQuery(query)
+        mask = q.compile_mask()(frame)
+        predicate = q.compile_predicate()
+        assert list(mask) == [predicate(e) for e in events]